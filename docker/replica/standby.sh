@@ -0,0 +1,26 @@
+#!/usr/bin/env bash
+#
+# Entrypoint of the streaming replica in the docker-compose read replica profile.
+#
+# On the first start the data directory is cloned from the `database` service
+# with pg_basebackup, whose -R option makes the copy a standby that streams
+# the WAL of the primary. Later starts resume streaming. The replica runs with
+# `pgstac.readonly` on, so pgstac searches don't try to cache search
+# statistics, which a hot standby can't write.
+
+set -euo pipefail
+
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+    # the primary only listens on the network once its first boot is done
+    until pg_isready -h database -p 5432 -U "$PGUSER" > /dev/null 2>&1; do
+        sleep 1
+    done
+    mkdir -p "$PGDATA"
+    chown postgres:postgres "$PGDATA"
+    chmod 700 "$PGDATA"
+    gosu postgres pg_basebackup -h database -p 5432 -U "$PGUSER" -D "$PGDATA" \
+        --wal-method=stream --write-recovery-conf --checkpoint=fast
+    echo "cloned the primary into $PGDATA"
+fi
+
+exec docker-entrypoint.sh postgres -N 500 -c pgstac.readonly=true
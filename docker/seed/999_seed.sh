@@ -0,0 +1,15 @@
+#!/usr/bin/env bash
+#
+# Restores the seed snapshot on the first start of the docker-compose database,
+# after the image has installed pgstac (990_pgstac.sh). Build the snapshot with
+# `docker compose run --rm seed-snapshot`; set SEED_SNAPSHOT=none to start
+# with an empty pgstac instead.
+#
+# Init scripts that aren't executable are sourced by the postgres entrypoint,
+# so this one doesn't exit.
+
+if [ -f "$SEED_SNAPSHOT" ]; then
+    bash /scripts/seed_snapshot.sh restore "$SEED_SNAPSHOT"
+else
+    echo "No seed snapshot at $SEED_SNAPSHOT, starting with an empty pgstac"
+fi
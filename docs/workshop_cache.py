@@ -0,0 +1,301 @@
+"""
+Record/replay cache for upstream STAC API traffic.
+
+Usage in notebooks:
+    from workshop_cache import open_client
+
+    source_client = open_client("https://earth-search.aws.element84.com/v1")
+    search = source_client.search(collections="sentinel-2-c1-l2a", bbox=bbox)
+
+Responses are stored in a SQLite file keyed on the request method, URL and
+normalized search body, so repeated and overlapping searches are answered
+locally. The file is bounded in size and evicts the least recently used
+responses first.
+
+The cache mode is one of:
+- "record" (default): serve cached responses, fetch and store misses
+- "replay": only serve cached responses and fail on a miss, which lets the
+  ingestion flow run offline from a recorded cache file (a "cassette")
+- "off": bypass the cache
+
+The location, size and mode default to the `WORKSHOP_HTTP_CACHE`,
+`WORKSHOP_HTTP_CACHE_SIZE` and `WORKSHOP_HTTP_CACHE_MODE` environment variables.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+import pystac_client
+from pystac_client.stac_api_io import StacApiIO
+
+from workshop_setup import cache_dir
+
+DEFAULT_CACHE_PATH = cache_dir() / "http-cache.sqlite"
+DEFAULT_CACHE_SIZE = 512 * 1024 * 1024
+
+CACHE_MODES = ("record", "replay", "off")
+
+# list-valued search parameters whose order doesn't change the result
+UNORDERED_PARAMETERS = {"collections", "ids"}
+
+
+class CacheMiss(LookupError):
+    """Raised in replay mode when a request is not in the cache."""
+
+
+def normalize_body(body: dict | None) -> dict:
+    """
+    Normalize a search body so equivalent searches share a cache key.
+
+    Keys are sorted on serialization, `None` values are dropped and the order
+    of `collections` and `ids` is ignored.
+    """
+    normalized = {}
+    for key, value in (body or {}).items():
+        if value is None:
+            continue
+        if key in UNORDERED_PARAMETERS:
+            value = sorted([value] if isinstance(value, str) else value)
+        normalized[key] = value
+    return normalized
+
+
+def cache_key(method: str, url: str, body: dict | None = None) -> str:
+    """Cache key for a request; query string parameters are sorted."""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    url = urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, query, ""))
+    payload = json.dumps(
+        [method.upper(), url, normalize_body(body)],
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed, size-bounded LRU store of HTTP responses.
+
+    Safe to share between threads of one process and between processes using
+    the same file.
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        max_size: int | None = None,
+        mode: str | None = None,
+    ):
+        self.path = Path(
+            path or os.environ.get("WORKSHOP_HTTP_CACHE") or DEFAULT_CACHE_PATH
+        )
+        self.max_size = int(
+            max_size or os.environ.get("WORKSHOP_HTTP_CACHE_SIZE") or DEFAULT_CACHE_SIZE
+        )
+        self.mode = mode or os.environ.get("WORKSHOP_HTTP_CACHE_MODE", "record")
+        if self.mode not in CACHE_MODES:
+            raise ValueError(
+                f"Cache mode must be one of {CACHE_MODES}, not {self.mode}"
+            )
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_access "
+            "ON responses (last_access)"
+        )
+        self._conn.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def get(self, key: str) -> tuple[int, dict, bytes] | None:
+        """Return (status, headers, body) for `key`, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, headers, body FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                if self.mode == "replay":
+                    raise CacheMiss(f"No recorded response for request {key}")
+                return None
+
+            self.hits += 1
+            if self.mode == "record":
+                self._conn.execute(
+                    "UPDATE responses SET last_access = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+                self._conn.commit()
+
+        status, headers, body = row
+        return status, json.loads(headers), body
+
+    def put(self, key: str, status: int, headers: dict, body: bytes):
+        """Store a response and evict the least recently used ones over budget."""
+        if self.mode != "record" or len(body) > self.max_size:
+            return
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, status, json.dumps(headers), body, len(body), time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (total,) = self._conn.execute(
+            "SELECT coalesce(sum(size), 0) FROM responses"
+        ).fetchone()
+        if total <= self.max_size:
+            return
+
+        excess = total - self.max_size
+        freed = 0
+        stale = []
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY last_access"
+        ):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def __str__(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return (
+            f"{self.path} ({self.mode}): {self.hits} hits, {self.misses} misses "
+            f"({rate:.0%} hit rate)"
+        )
+
+
+class CachingStacApiIO(StacApiIO):
+    """`StacApiIO` that answers GET and POST requests from a `ResponseCache`."""
+
+    def __init__(self, *args, cache: ResponseCache | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache = cache or ResponseCache()
+
+    def request(
+        self,
+        href: str,
+        method: str | None = None,
+        headers: dict[str, str] | None = None,
+        parameters: dict | None = None,
+    ) -> str:
+        if not self.cache.enabled:
+            return super().request(href, method, headers, parameters)
+
+        key = cache_key(method or "GET", href, parameters)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached[2].decode("utf-8")
+
+        text = super().request(href, method, headers, parameters)
+        self.cache.put(key, 200, {"content-type": "application/json"}, text.encode())
+        return text
+
+
+class CachingTransport(httpx.BaseTransport):
+    """httpx transport that serves successful GET/POST responses from a cache."""
+
+    def __init__(
+        self,
+        cache: ResponseCache | None = None,
+        transport: httpx.BaseTransport | None = None,
+    ):
+        self.cache = cache or ResponseCache()
+        self.transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if not self.cache.enabled or request.method not in ("GET", "POST"):
+            return self.transport.handle_request(request)
+
+        body = None
+        if request.method == "POST":
+            content = request.read()
+            try:
+                body = json.loads(content) if content else None
+            except ValueError:
+                body = {"content": hashlib.sha256(content).hexdigest()}
+
+        key = cache_key(request.method, str(request.url), body)
+        cached = self.cache.get(key)
+        if cached is not None:
+            status, headers, content = cached
+            return httpx.Response(
+                status, headers=headers, content=content, request=request
+            )
+
+        response = self.transport.handle_request(request)
+        if response.status_code == 200:
+            content = response.read()
+            headers = {
+                name: value
+                for name, value in response.headers.items()
+                if name.lower() not in ("content-encoding", "content-length")
+            }
+            self.cache.put(key, response.status_code, headers, content)
+            return httpx.Response(
+                response.status_code, headers=headers, content=content, request=request
+            )
+        return response
+
+    def close(self):
+        self.transport.close()
+
+
+def open_client(
+    url: str, cache: ResponseCache | None = None, **kwargs
+) -> pystac_client.Client:
+    """
+    Open a `pystac_client.Client` whose requests go through the response cache.
+
+    Args:
+        url: STAC API root URL.
+        cache: Cache to use; by default one configured from the environment.
+        **kwargs: Passed to `pystac_client.Client.open`.
+
+    Returns:
+        pystac_client.Client: The client
+    """
+    stac_io = CachingStacApiIO(cache=cache)
+    return pystac_client.Client.open(url, stac_io=stac_io, **kwargs)
@@ -0,0 +1,245 @@
+"""
+Harvest STAC items from prefixes of Cloud Optimized GeoTIFFs.
+
+Usage in notebooks:
+    from workshop_cogs import harvest_cogs, list_s3_hrefs
+    from workshop_ingest import ingest_items
+
+    hrefs = list_s3_hrefs("sentinel-cogs", "sentinel-s2-l2a-cogs/28/G/GV/2025/4/")
+    for item in harvest_cogs(hrefs):
+        print(item.id, list(item.assets))
+
+    # or stream the items straight into pgstac
+    items = harvest_cogs(hrefs, collection_id=my_collection.id)
+    stats = ingest_items(item.to_dict() for item in items)
+
+Only the header of each COG is read: a thread pool opens the files with GDAL
+settings that fetch the first bytes of the file in one request and skip
+listing the directory next to it. Files are grouped into items by their
+directory (one directory per scene, as in the sentinel-cogs bucket), and each
+item is yielded as soon as the headers of all its files have been read.
+"""
+
+import re
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from itertools import groupby
+from pathlib import PurePosixPath
+from urllib.parse import urlsplit
+
+import boto3
+import pystac
+import rasterio
+from botocore import UNSIGNED
+from botocore.client import Config
+from rasterio.warp import transform_bounds
+from shapely.geometry import box, mapping
+
+# GDAL settings for reading only the header of each COG
+HEADER_ONLY_ENV = {
+    # don't list the directory of every file to look for sidecar files
+    "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+    # the header and tile index of a COG are at the start of the file, so
+    # one 32 KB request at open usually covers them
+    "GDAL_INGESTED_BYTES_AT_OPEN": 32768,
+    "CPL_VSIL_CURL_ALLOWED_EXTENSIONS": ".tif,.tiff",
+    "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES",
+    "GDAL_HTTP_MULTIPLEX": "YES",
+}
+
+# Files opened at once; header reads are latency bound, not CPU bound
+HARVEST_WORKERS = 32
+
+COG_SUFFIXES = (".tif", ".tiff")
+
+DATE_PATTERN = re.compile(r"(\d{4})-?(\d{2})-?(\d{2})(?:T(\d{2}):?(\d{2}):?(\d{2}))?")
+
+
+@dataclass(frozen=True)
+class CogHeader:
+    """What a STAC item needs to know about one COG."""
+
+    href: str
+    epsg: int | None
+    bounds: tuple[float, float, float, float]
+    shape: tuple[int, int]
+    transform: tuple[float, ...]
+    dtype: str
+    count: int
+    nodata: float | None
+
+    @property
+    def bbox(self) -> tuple[float, float, float, float]:
+        """`bounds` in EPSG:4326."""
+        if self.epsg == 4326:
+            return self.bounds
+        return transform_bounds(f"EPSG:{self.epsg}", "EPSG:4326", *self.bounds)
+
+
+def list_s3_hrefs(
+    bucket: str,
+    prefix: str,
+    region: str = "us-west-2",
+    suffixes: tuple[str, ...] = COG_SUFFIXES,
+    s3=None,
+) -> Iterator[str]:
+    """
+    Stream the https URLs of the COGs under an S3 prefix, in key order.
+
+    Args:
+        bucket: Bucket name.
+        prefix: Key prefix to list.
+        region: Region of the bucket.
+        suffixes: Only keys ending with one of these are yielded.
+        s3: boto3 S3 client; by default an unsigned client for public buckets.
+
+    Yields:
+        str: URL of each file
+    """
+    if s3 is None:
+        s3 = boto3.client(
+            "s3", region_name=region, config=Config(signature_version=UNSIGNED)
+        )
+    pages = s3.get_paginator("list_objects_v2").paginate(
+        Bucket=bucket, Prefix=prefix, PaginationConfig={"PageSize": 1000}
+    )
+    for page in pages:
+        for obj in page.get("Contents", []):
+            if obj["Key"].endswith(suffixes):
+                yield f"https://{bucket}.s3.{region}.amazonaws.com/{obj['Key']}"
+
+
+def read_header(href: str, gdal_env: dict | None = None) -> CogHeader:
+    """Open a COG and read its georeferencing, without reading any pixels."""
+    with rasterio.Env(**(HEADER_ONLY_ENV if gdal_env is None else gdal_env)):
+        with rasterio.open(href) as src:
+            return CogHeader(
+                href=href,
+                epsg=src.crs.to_epsg() if src.crs else None,
+                bounds=tuple(src.bounds),
+                shape=src.shape,
+                transform=tuple(src.transform)[:6],
+                dtype=src.dtypes[0],
+                count=src.count,
+                nodata=src.nodata,
+            )
+
+
+def scene_id(href: str) -> str:
+    """Item id of a file: the name of its directory."""
+    return PurePosixPath(urlsplit(href).path).parent.name
+
+
+def asset_key(href: str) -> str:
+    """Asset key of a file: its name without the extension."""
+    return PurePosixPath(urlsplit(href).path).stem
+
+
+def scene_datetime(item_id: str) -> datetime:
+    """The first `YYYYMMDD` or `YYYY-MM-DDTHH:MM:SS` date in an item id, in UTC."""
+    match = DATE_PATTERN.search(item_id)
+    if match is None:
+        raise ValueError(f"no date in {item_id}; pass item_datetime to harvest_cogs")
+    return datetime(*(int(part) for part in match.groups() if part), tzinfo=UTC)
+
+
+def build_item(
+    item_id: str,
+    headers: dict[str, CogHeader],
+    item_datetime: datetime,
+    collection_id: str | None = None,
+) -> pystac.Item:
+    """A STAC item with one COG asset per header and the `proj` extension."""
+    bboxes = [header.bbox for header in headers.values()]
+    bbox = (
+        min(b[0] for b in bboxes),
+        min(b[1] for b in bboxes),
+        max(b[2] for b in bboxes),
+        max(b[3] for b in bboxes),
+    )
+    item = pystac.Item(
+        id=item_id,
+        geometry=mapping(box(*bbox)),
+        bbox=list(bbox),
+        datetime=item_datetime,
+        properties={},
+        collection=collection_id,
+    )
+    item.ext.add("proj")
+    for key, header in headers.items():
+        asset = pystac.Asset(
+            href=header.href, media_type=pystac.MediaType.COG, roles=["data"]
+        )
+        item.add_asset(key, asset)
+        asset.ext.proj.apply(
+            epsg=header.epsg,
+            bbox=list(header.bounds),
+            shape=list(header.shape),
+            transform=list(header.transform),
+        )
+    return item
+
+
+def harvest_cogs(
+    hrefs: Iterable[str],
+    collection_id: str | None = None,
+    item_id: Callable[[str], str] = scene_id,
+    asset_key: Callable[[str], str] = asset_key,
+    item_datetime: Callable[[str], datetime] = scene_datetime,
+    workers: int = HARVEST_WORKERS,
+    gdal_env: dict | None = None,
+) -> Iterator[pystac.Item]:
+    """
+    Stream STAC items for a listing of COGs, reading headers in parallel.
+
+    `hrefs` must list the files of an item next to each other, which an S3
+    listing or a sorted directory listing does. Items are yielded in the order
+    of `hrefs`, and at most about `4 * workers` headers are read ahead of the
+    item being yielded, so memory stays bounded for any number of files.
+
+    Args:
+        hrefs: URLs or paths of the COGs, e.g. from `list_s3_hrefs`.
+        collection_id: Collection to assign the items to.
+        item_id: Item id of a file; its directory name by default.
+        asset_key: Asset key of a file; its name without extension by default.
+        item_datetime: Datetime of an item from its id.
+        workers: Number of files opened at once.
+        gdal_env: GDAL settings for opening the files (`HEADER_ONLY_ENV`).
+
+    Yields:
+        pystac.Item: One item per group of files
+    """
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending: deque[tuple[str, dict[str, Future]]] = deque()
+    in_flight = 0
+
+    def next_item() -> pystac.Item:
+        nonlocal in_flight
+        group_id, futures = pending.popleft()
+        in_flight -= len(futures)
+        headers = {key: future.result() for key, future in futures.items()}
+        return build_item(group_id, headers, item_datetime(group_id), collection_id)
+
+    try:
+        for group_id, group in groupby(hrefs, key=item_id):
+            futures = {
+                asset_key(href): executor.submit(read_header, href, gdal_env)
+                for href in group
+            }
+            pending.append((group_id, futures))
+            in_flight += len(futures)
+
+            # yield finished items right away and wait when too far ahead
+            while pending and (
+                in_flight > 4 * workers
+                or all(future.done() for future in pending[0][1].values())
+            ):
+                yield next_item()
+
+        while pending:
+            yield next_item()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
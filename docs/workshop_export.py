@@ -0,0 +1,266 @@
+"""
+Export rendered titiler-pgstac mosaics into NumPy arrays and GeoTIFFs.
+
+Usage in notebooks:
+    from workshop_export import export_search
+
+    mosaic = export_search(search_id, bbox, zoom=10, params=params)
+    print(mosaic.stats)
+    mosaic.data  # (bands, height, width), mosaic.mask is 255 where there is data
+
+    # write a Cloud Optimized GeoTIFF (needs rasterio)
+    mosaic.write_cog("mosaic.tif")
+
+The WebMercatorQuad tiles covering `bbox` are requested as `.npy` tiles on
+the shared raster API client (see `workshop_setup.get_async_client`), so they
+are fetched with bounded concurrency and throttled or unavailable responses
+are retried. Each tile is read in place from the response body and copied
+once, straight into its window of an array allocated when the first tile
+arrives.
+"""
+
+import asyncio
+import io
+import time
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+from workshop_setup import get_async_client
+
+# Half the width of the WebMercatorQuad tile matrix set, in meters
+WEB_MERCATOR_EXTENT = 20037508.342789244
+MAX_LATITUDE = 85.0511287798066
+
+# Tiles in flight at once and the most tiles a single export may request
+EXPORT_CONCURRENCY = 16
+EXPORT_MAX_TILES = 1024
+
+NPY_HEADER_READERS = {
+    (1, 0): np.lib.format.read_array_header_1_0,
+    (2, 0): np.lib.format.read_array_header_2_0,
+}
+
+
+@dataclass
+class ExportStats:
+    """Throughput statistics for a tile export."""
+
+    tiles: int = 0
+    empty: int = 0
+    bytes: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def tiles_per_second(self) -> float:
+        return self.tiles / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"fetched {self.tiles} tiles ({self.empty} empty, "
+            f"{self.bytes / 1e6:.1f} MB) in {self.elapsed:.1f}s: "
+            f"{self.tiles_per_second:.1f} tiles/s, "
+            f"{self.bytes_per_second / 1e6:.2f} MB/s"
+        )
+
+
+@dataclass
+class TileMosaic:
+    """Tiles stitched into one array, in WebMercatorQuad (EPSG:3857)."""
+
+    data: np.ndarray
+    mask: np.ndarray
+    bounds: tuple[float, float, float, float]
+    stats: ExportStats = field(default_factory=ExportStats)
+    crs: str = "EPSG:3857"
+
+    @property
+    def transform(self) -> tuple[float, float, float, float, float, float]:
+        """Affine transform coefficients (a, b, c, d, e, f) of the array."""
+        minx, miny, maxx, maxy = self.bounds
+        height, width = self.mask.shape
+        return ((maxx - minx) / width, 0.0, minx, 0.0, -(maxy - miny) / height, maxy)
+
+    def write_cog(self, path: str, **options) -> str:
+        """
+        Write the mosaic as a Cloud Optimized GeoTIFF with an internal mask.
+
+        Args:
+            path: File to write.
+            options: Creation options for the GDAL COG driver, e.g.
+                `compress="zstd"` (default: deflate).
+
+        Returns:
+            str: `path`
+        """
+        import rasterio
+        from affine import Affine
+
+        count, height, width = self.data.shape
+        profile = {
+            "driver": "COG",
+            "width": width,
+            "height": height,
+            "count": count,
+            "dtype": self.data.dtype.name,
+            "crs": self.crs,
+            "transform": Affine(*self.transform),
+            "compress": "deflate",
+            **options,
+        }
+        with rasterio.open(path, "w", **profile) as dst:
+            dst.write(self.data)
+            dst.write_mask(self.mask)
+        return path
+
+
+def tile_range(bbox: Sequence[float], zoom: int) -> tuple[range, range]:
+    """
+    Columns and rows of the WebMercatorQuad tiles covering `bbox` at `zoom`.
+
+    Args:
+        bbox: (west, south, east, north) in degrees. Boxes crossing the
+            antimeridian are not supported.
+        zoom: Tile matrix zoom level.
+
+    Returns:
+        tuple[range, range]: The tile columns (x) and rows (y)
+    """
+    west, south, east, north = bbox
+    if west > east or south > north:
+        raise ValueError(f"bbox must be (west, south, east, north), not {bbox}")
+
+    n = 2**zoom
+    lon = np.array([west, east])
+    lat = np.clip([north, south], -MAX_LATITUDE, MAX_LATITUDE)
+    x = np.floor((lon + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.arcsinh(np.tan(np.radians(lat))) / np.pi) / 2.0 * n)
+    (xmin, xmax), (ymin, ymax) = np.clip(x, 0, n - 1), np.clip(y, 0, n - 1)
+    return range(int(xmin), int(xmax) + 1), range(int(ymin), int(ymax) + 1)
+
+
+def tile_bounds(x: range, y: range, zoom: int) -> tuple[float, float, float, float]:
+    """EPSG:3857 bounds of a block of WebMercatorQuad tiles."""
+    size = 2 * WEB_MERCATOR_EXTENT / 2**zoom
+    return (
+        -WEB_MERCATOR_EXTENT + x.start * size,
+        WEB_MERCATOR_EXTENT - y.stop * size,
+        -WEB_MERCATOR_EXTENT + x.stop * size,
+        WEB_MERCATOR_EXTENT - y.start * size,
+    )
+
+
+def npy_view(content: bytes) -> np.ndarray:
+    """Read-only array over the body of a `.npy` response, without copying it."""
+    header = io.BytesIO(content)
+    version = np.lib.format.read_magic(header)
+    shape, fortran_order, dtype = NPY_HEADER_READERS[version](header)
+    array = np.frombuffer(
+        content, dtype=dtype, count=int(np.prod(shape)), offset=header.tell()
+    )
+    return array.reshape(shape, order="F" if fortran_order else "C")
+
+
+async def aexport_search(
+    search_id: str,
+    bbox: Sequence[float],
+    zoom: int,
+    params: Sequence[tuple[str, str]] | dict | None = None,
+    concurrency: int = EXPORT_CONCURRENCY,
+    max_tiles: int = EXPORT_MAX_TILES,
+) -> TileMosaic:
+    """`export_search` for async code."""
+    xs, ys = tile_range(bbox, zoom)
+    if len(xs) * len(ys) > max_tiles:
+        raise ValueError(
+            f"{len(xs) * len(ys)} tiles cover {bbox} at zoom {zoom}, more than "
+            f"max_tiles={max_tiles}; use a lower zoom or a smaller bbox"
+        )
+
+    client = get_async_client("raster")
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = ExportStats()
+    # allocated once the first tile tells us the band count, dtype and size
+    buffer = None
+
+    async def fetch(x: int, y: int):
+        nonlocal buffer
+        async with semaphore:
+            response = await client.get(
+                f"/searches/{search_id}/tiles/WebMercatorQuad/{zoom}/{x}/{y}.npy",
+                params=params,
+            )
+        stats.tiles += 1
+        stats.bytes += len(response.content)
+        # titiler answers 204/404 for tiles without any items
+        if response.status_code in (204, 404):
+            stats.empty += 1
+            return
+        response.raise_for_status()
+
+        # data bands followed by the mask band
+        tile = npy_view(response.content)
+        if buffer is None:
+            bands, size = tile.shape[0], tile.shape[-1]
+            buffer = np.zeros((bands, len(ys) * size, len(xs) * size), dtype=tile.dtype)
+        size = buffer.shape[1] // len(ys)
+        if tile.shape != (buffer.shape[0], size, size):
+            raise ValueError(f"tile {zoom}/{x}/{y} has shape {tile.shape}")
+
+        row, col = (y - ys.start) * size, (x - xs.start) * size
+        buffer[:, row : row + size, col : col + size] = tile
+
+    start = time.perf_counter()
+    await asyncio.gather(*[fetch(x, y) for y in ys for x in xs])
+    stats.elapsed = time.perf_counter() - start
+
+    if buffer is None:
+        raise ValueError(f"search {search_id} has no data in {bbox} at zoom {zoom}")
+
+    return TileMosaic(
+        data=buffer[:-1],
+        mask=buffer[-1].astype(np.uint8, copy=False),
+        bounds=tile_bounds(xs, ys, zoom),
+        stats=stats,
+    )
+
+
+def export_search(
+    search_id: str,
+    bbox: Sequence[float],
+    zoom: int,
+    params: Sequence[tuple[str, str]] | dict | None = None,
+    concurrency: int = EXPORT_CONCURRENCY,
+    max_tiles: int = EXPORT_MAX_TILES,
+) -> TileMosaic:
+    """
+    Fetch the tiles of a registered search covering `bbox` into one array.
+
+    Works in notebooks: when an event loop is already running, the export
+    runs on its own loop in a worker thread.
+
+    Args:
+        search_id: Id returned by `/searches/register`.
+        bbox: (west, south, east, north) in degrees.
+        zoom: WebMercatorQuad zoom level; each zoom level doubles the
+            resolution and quadruples the number of tiles.
+        params: Render parameters of the tile endpoint, e.g. `assets`,
+            `expression` or `rescale`.
+        concurrency: Maximum number of tile requests in flight.
+        max_tiles: Refuse exports that would request more tiles than this.
+
+    Returns:
+        TileMosaic: The stitched bands, their mask, bounds and fetch statistics
+    """
+    export = aexport_search(search_id, bbox, zoom, params, concurrency, max_tiles)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(export)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, export).result()
@@ -0,0 +1,201 @@
+"""
+Stream tipg collections into Arrow record batches or GeoDataFrames.
+
+Usage in notebooks:
+    from workshop_features import read_features, iter_geodataframes
+
+    # the whole collection as one Arrow table
+    table = read_features("features.ecoregions")
+
+    # or chunk by chunk, e.g. to aggregate without holding every feature
+    for gdf in iter_geodataframes("features.ecoregions", bbox="-125,32,-114,42"):
+        print(len(gdf), gdf.area.sum())
+
+Features are requested as GeoJSON sequences (`f=geojsonseq`), `page_size` at
+a time with `offset` paging, on the shared vector API client. While a page is
+parsed, the next `prefetch` pages are already being downloaded. Each page
+is parsed in bulk into one record batch with an `id` column, one column per
+property and the geometry as WKB, so memory use is bounded by
+`page_size * (prefetch + 2)` features whatever the size of the collection.
+"""
+
+import io
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
+import pyarrow as pa
+import pyarrow.json
+import shapely
+from workshop_setup import get_client
+
+# tipg caps `limit` at TIPG_MAX_FEATURES_PER_QUERY (10000 by default)
+FEATURES_PAGE_SIZE = 2000
+FEATURES_PREFETCH = 1
+
+
+def page_lines(content: bytes) -> list[bytes]:
+    """The features of a `geojsonseq` response, one per line."""
+    # RFC 8142 sequences start each feature with a record separator
+    return [line.lstrip(b"\x1e") for line in content.splitlines() if line.strip()]
+
+
+def infer_schema(lines: list[bytes]) -> pa.Schema:
+    """Arrow schema of the `id` and `properties` of GeoJSON features."""
+    features = [orjson.loads(line) for line in lines]
+    return pa.RecordBatch.from_pylist(
+        [
+            {"id": feature.get("id"), "properties": feature.get("properties") or {}}
+            for feature in features
+        ]
+    ).schema
+
+
+def parse_page(lines: list[bytes], schema: pa.Schema) -> pa.RecordBatch:
+    """
+    Parse GeoJSON features, one per line, into a record batch.
+
+    Both steps are vectorized: Arrow's JSON reader reads the ids and
+    properties into columns, skipping the geometries, and GEOS reads the
+    geometries, which are stored as WKB in the `geometry` column.
+
+    Args:
+        lines: GeoJSON features.
+        schema: Schema of the `id` and `properties` members, see
+            `infer_schema`. Properties missing from a feature are null.
+
+    Returns:
+        pa.RecordBatch: One row per feature
+    """
+    # a block must hold at least one whole feature
+    block_size = max(1 << 20, max(map(len, lines)) + 1)
+    table = pyarrow.json.read_json(
+        io.BytesIO(b"\n".join(lines)),
+        read_options=pyarrow.json.ReadOptions(block_size=block_size),
+        parse_options=pyarrow.json.ParseOptions(
+            explicit_schema=schema, unexpected_field_behavior="ignore"
+        ),
+    )
+    properties = table.column("properties").combine_chunks()
+    geometry = shapely.to_wkb(shapely.from_geojson(lines))
+    return pa.RecordBatch.from_arrays(
+        [
+            table.column("id").combine_chunks(),
+            *properties.flatten(),
+            pa.array(geometry, pa.binary()),
+        ],
+        names=["id", *(field.name for field in properties.type), "geometry"],
+    )
+
+
+def iter_pages(
+    collection_id: str,
+    page_size: int = FEATURES_PAGE_SIZE,
+    prefetch: int = FEATURES_PREFETCH,
+    **params,
+) -> Iterator[list[bytes]]:
+    """
+    Stream the features of a tipg collection page by page, as GeoJSON lines.
+
+    Args:
+        collection_id: tipg collection, e.g. "features.ecoregions".
+        page_size: Features per request.
+        prefetch: Pages downloaded ahead of the page being consumed.
+        **params: Query parameters of the items endpoint, e.g. `bbox`, a
+            queryable or `sortby`.
+
+    Yields:
+        list[bytes]: The features of one page
+    """
+    client = get_client("vector")
+    url = f"/collections/{collection_id}/items"
+
+    def fetch(offset: int) -> list[bytes]:
+        response = client.get(
+            url,
+            params={**params, "f": "geojsonseq", "limit": page_size, "offset": offset},
+        )
+        response.raise_for_status()
+        return page_lines(response.content)
+
+    with ThreadPoolExecutor(max_workers=max(prefetch, 1)) as executor:
+        pending = deque()
+        offset = 0
+        while True:
+            while len(pending) <= prefetch:
+                pending.append(executor.submit(fetch, offset))
+                offset += page_size
+            lines = pending.popleft().result()
+            if lines:
+                yield lines
+            if len(lines) < page_size:
+                for future in pending:
+                    future.cancel()
+                return
+
+
+def iter_record_batches(
+    collection_id: str,
+    page_size: int = FEATURES_PAGE_SIZE,
+    prefetch: int = FEATURES_PREFETCH,
+    **params,
+) -> Iterator[pa.RecordBatch]:
+    """
+    Stream a tipg collection as Arrow record batches, one per page.
+
+    The property types of each page are inferred and unified with those of
+    the earlier pages, so a batch has every property seen so far and a type
+    can be promoted from one batch to the next: a property that was always
+    null gets the type of its first values, and integers become floats once a
+    page has fractional values. See `iter_pages` for the arguments.
+    """
+    schema = None
+    for lines in iter_pages(collection_id, page_size, prefetch, **params):
+        page_schema = infer_schema(lines)
+        schema = (
+            page_schema
+            if schema is None
+            else pa.unify_schemas([schema, page_schema], promote_options="permissive")
+        )
+        yield parse_page(lines, schema)
+
+
+def read_features(
+    collection_id: str,
+    page_size: int = FEATURES_PAGE_SIZE,
+    prefetch: int = FEATURES_PREFETCH,
+    **params,
+) -> pa.Table:
+    """All features of a tipg collection matching `params`, as an Arrow table."""
+    batches = list(iter_record_batches(collection_id, page_size, prefetch, **params))
+    if not batches:
+        return pa.table({"id": [], "geometry": pa.array([], pa.binary())})
+    # the last batch has the unified schema; promote the earlier ones to it
+    table = pa.concat_tables(
+        [pa.Table.from_batches([batch]) for batch in batches],
+        promote_options="permissive",
+    )
+    return table.select(batches[-1].schema.names)
+
+
+def to_geodataframe(batch: pa.RecordBatch | pa.Table):
+    """GeoDataFrame in EPSG:4326 from a batch or table with WKB geometries."""
+    import geopandas
+
+    frame = batch.drop_columns(["geometry"]).to_pandas()
+    geometry = geopandas.GeoSeries.from_wkb(
+        batch.column("geometry").to_numpy(zero_copy_only=False), crs="EPSG:4326"
+    )
+    return geopandas.GeoDataFrame(frame, geometry=geometry)
+
+
+def iter_geodataframes(
+    collection_id: str,
+    page_size: int = FEATURES_PAGE_SIZE,
+    prefetch: int = FEATURES_PREFETCH,
+    **params,
+):
+    """`iter_record_batches` as GeoDataFrames (needs geopandas)."""
+    for batch in iter_record_batches(collection_id, page_size, prefetch, **params):
+        yield to_geodataframe(batch)
@@ -0,0 +1,420 @@
+"""
+Streaming STAC ingestion helpers for loading search results into pgstac.
+
+Usage in notebooks:
+    from workshop_ingest import harvest, sync
+
+    stats = harvest(search, collection_id=my_collection.id)
+    print(stats)
+
+    # later: only fetch and load what changed since the last run
+    stats = sync(source_client, my_collection.id, collections="sentinel-2-c1-l2a")
+
+Items are streamed page by page from a `pystac_client` search as plain
+dictionaries, re-assigned to the target collection and loaded with pypgstac's
+`Loader` in fixed-size batches. The next pages are fetched while earlier
+batches are being loaded, and at most `concurrency + prefetch` batches are
+held in memory at any time.
+
+`sync` runs the same pipeline incrementally: it only asks the upstream API
+for items newer than the collection's watermark in pgstac and skips items
+whose content did not change, so re-running it costs O(new items).
+"""
+
+import hashlib
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from itertools import batched
+
+import orjson
+from pypgstac.db import PgstacDB
+from pypgstac.load import Loader, Methods
+
+# links that point at the upstream catalog; the STAC API regenerates them
+UPSTREAM_LINK_RELS = {"self", "root", "parent", "collection"}
+
+
+@dataclass
+class IngestStats:
+    """Throughput statistics for an ingestion run."""
+
+    items: int = 0
+    bytes: int = 0
+    batches: int = 0
+    elapsed: float = 0.0
+    load_seconds: float = 0.0
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+    def add_batch(
+        self,
+        items: int,
+        nbytes: int,
+        seconds: float,
+        inserted: int = 0,
+        updated: int = 0,
+        skipped: int = 0,
+    ):
+        with self._lock:
+            self.items += items
+            self.bytes += nbytes
+            self.batches += 1
+            self.load_seconds += seconds
+            self.inserted += inserted
+            self.updated += updated
+            self.skipped += skipped
+
+    def __str__(self) -> str:
+        summary = (
+            f"loaded {self.items} items ({self.bytes / 1e6:.1f} MB) in "
+            f"{self.batches} batches in {self.elapsed:.1f}s: "
+            f"{self.items_per_second:.1f} items/s, "
+            f"{self.bytes_per_second / 1e6:.2f} MB/s"
+        )
+        if self.inserted or self.updated or self.skipped:
+            summary += (
+                f" ({self.inserted} inserted, {self.updated} updated, "
+                f"{self.skipped} unchanged)"
+            )
+        return summary
+
+
+def close_db(db: PgstacDB):
+    """Return the connection of `db` to its pool and close the pool."""
+    pool = db.pool
+    db.disconnect()
+    if pool is not None:
+        pool.close()
+
+
+def set_item_collection(item: dict, collection_id: str) -> dict:
+    """Assign a STAC item dictionary to `collection_id`, in place."""
+    item["collection"] = collection_id
+    item["links"] = [
+        link
+        for link in item.get("links", [])
+        if link.get("rel") not in UPSTREAM_LINK_RELS
+    ]
+    return item
+
+
+def utc_timestamp(value: str | None) -> str | None:
+    """RFC 3339 timestamp normalized to UTC, so "Z" and "+00:00" compare equal."""
+    if not value:
+        return None
+    return as_utc(datetime.fromisoformat(value)).isoformat()
+
+
+def as_utc(value: datetime) -> datetime:
+    """Timezone-aware UTC datetime; naive datetimes are taken to be UTC."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=UTC)
+    return value.astimezone(UTC)
+
+
+def item_hash(item: dict) -> str:
+    """
+    Hash of the parts of a STAC item dictionary that identify its content.
+
+    Only the id, `datetime` and `updated` properties and asset hrefs are
+    hashed: pgstac's `get_item` hydrates items from the collection's base item
+    and re-serializes the geometry, so the full document it returns never
+    matches the upstream one byte for byte.
+    """
+    properties = item.get("properties") or {}
+    content = {
+        "id": item["id"],
+        "datetime": utc_timestamp(properties.get("datetime")),
+        "updated": utc_timestamp(properties.get("updated")),
+        "assets": {
+            key: asset.get("href") for key, asset in (item.get("assets") or {}).items()
+        },
+    }
+    return hashlib.sha256(
+        orjson.dumps(content, option=orjson.OPT_SORT_KEYS)
+    ).hexdigest()
+
+
+def stored_item_hashes(db: PgstacDB, collection_id: str, ids: list[str]) -> dict:
+    """Content hashes of the items with `ids` that already exist in pgstac."""
+    rows = db.query(
+        "SELECT id, get_item(id, %s) FROM unnest(%s::text[]) AS id;",
+        [collection_id, ids],
+    )
+    return {id: item_hash(item) for id, item in rows if item is not None}
+
+
+def changed_items(db: PgstacDB, batch: tuple[dict, ...]) -> tuple[list, int, int]:
+    """
+    Drop the items of `batch` that are already stored with the same content.
+
+    Returns:
+        tuple: (items to load, number of new items, number of changed items)
+    """
+    to_load = []
+    inserted = updated = 0
+    by_collection: dict[str, list[dict]] = {}
+    for item in batch:
+        by_collection.setdefault(item["collection"], []).append(item)
+
+    for collection_id, items in by_collection.items():
+        stored = stored_item_hashes(db, collection_id, [item["id"] for item in items])
+        for item in items:
+            stored_hash = stored.get(item["id"])
+            if stored_hash is None:
+                inserted += 1
+            elif stored_hash != item_hash(item):
+                updated += 1
+            else:
+                continue
+            to_load.append(item)
+
+    return to_load, inserted, updated
+
+
+def get_watermark(
+    collection_id: str, field: str = "datetime", dsn: str = ""
+) -> datetime | None:
+    """
+    Latest `datetime` (or `updated`) of the items stored in a collection.
+
+    Args:
+        collection_id: pgstac collection id.
+        field: Either "datetime" or "updated".
+        dsn: Database connection string; the PG* environment variables are used
+            if empty.
+
+    Returns:
+        datetime: The watermark, or None if the collection has no items
+    """
+    queries = {
+        "datetime": "SELECT max(datetime) FROM items WHERE collection = %s;",
+        "updated": (
+            "SELECT max((content->'properties'->>'updated')::timestamptz) "
+            "FROM items WHERE collection = %s;"
+        ),
+    }
+    db = PgstacDB(dsn=dsn)
+    try:
+        return db.query_one(queries[field], [collection_id])
+    finally:
+        close_db(db)
+
+
+def iter_search_items(search, collection_id: str | None = None) -> Iterator[dict]:
+    """
+    Stream the items of a `pystac_client.ItemSearch` page by page.
+
+    Items are yielded as dictionaries straight from the API response, without
+    building pystac objects or materializing the full result.
+
+    Args:
+        search: A `pystac_client` item search.
+        collection_id: If set, re-assign every item to this collection.
+
+    Yields:
+        dict: STAC item
+    """
+    for page in search.pages_as_dicts():
+        for item in page.get("features", []):
+            if collection_id is not None:
+                set_item_collection(item, collection_id)
+            yield item
+
+
+def ingest_items(
+    items: Iterable[dict],
+    batch_size: int = 500,
+    concurrency: int = 1,
+    prefetch: int = 2,
+    insert_mode: Methods = Methods.insert_ignore,
+    dsn: str = "",
+    skip_unchanged: bool = False,
+) -> IngestStats:
+    """
+    Load a stream of STAC item dictionaries into pgstac in batches.
+
+    The calling thread keeps pulling items from `items` (e.g. fetching the
+    next page from the upstream API) while up to `concurrency` worker threads
+    load the previous batches, each through its own database connection.
+
+    Args:
+        items: STAC item dictionaries, e.g. from `iter_search_items`.
+        batch_size: Number of items per `Loader.load_items` call.
+        concurrency: Number of batches loaded in parallel.
+        prefetch: Number of extra batches fetched ahead of the loaders.
+        insert_mode: pypgstac insert method.
+        dsn: Database connection string; the PG* environment variables are used
+            if empty.
+        skip_unchanged: Compare each batch with the stored items and only load
+            new or changed ones, counting inserted/updated/unchanged items.
+
+    Returns:
+        IngestStats: Item count, bytes and timing of the run
+    """
+    stats = IngestStats()
+    local = threading.local()
+    databases = []
+    databases_lock = threading.Lock()
+
+    def get_loader() -> Loader:
+        if not hasattr(local, "loader"):
+            db = PgstacDB(dsn=dsn)
+            with databases_lock:
+                databases.append(db)
+            local.loader = Loader(db)
+        return local.loader
+
+    def load_batch(batch: tuple[dict, ...]):
+        nbytes = sum(len(orjson.dumps(item)) for item in batch)
+        start = time.perf_counter()
+        loader = get_loader()
+        counts = {}
+        if skip_unchanged:
+            to_load, inserted, updated = changed_items(loader.db, batch)
+            counts = {
+                "inserted": inserted,
+                "updated": updated,
+                "skipped": len(batch) - len(to_load),
+            }
+        else:
+            to_load = batch
+        if to_load:
+            loader.load_items(iter(to_load), insert_mode=insert_mode)
+        stats.add_batch(len(batch), nbytes, time.perf_counter() - start, **counts)
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pending = set()
+            for batch in batched(items, batch_size):
+                pending.add(executor.submit(load_batch, batch))
+                if len(pending) >= concurrency + prefetch:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+
+            for future in pending:
+                future.result()
+    finally:
+        for db in databases:
+            close_db(db)
+        stats.elapsed = time.perf_counter() - start
+
+    return stats
+
+
+def harvest(
+    search,
+    collection_id: str,
+    batch_size: int = 500,
+    concurrency: int = 1,
+    prefetch: int = 2,
+    insert_mode: Methods = Methods.insert_ignore,
+    dsn: str = "",
+) -> IngestStats:
+    """
+    Stream the results of `search` into the pgstac collection `collection_id`.
+
+    See `ingest_items` for the meaning of the remaining arguments.
+    """
+    return ingest_items(
+        iter_search_items(search, collection_id),
+        batch_size=batch_size,
+        concurrency=concurrency,
+        prefetch=prefetch,
+        insert_mode=insert_mode,
+        dsn=dsn,
+    )
+
+
+def sync(
+    client,
+    collection_id: str,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    watermark_field: str = "datetime",
+    batch_size: int = 500,
+    concurrency: int = 1,
+    prefetch: int = 2,
+    dsn: str = "",
+    **search_kwargs,
+) -> IngestStats:
+    """
+    Incrementally sync a pgstac collection from an upstream STAC API.
+
+    Only items at or after the collection's watermark are requested upstream
+    (by `datetime`, or with a CQL2 filter on `updated`), and items that are
+    already stored with identical content are skipped before they reach
+    `Loader.load_items`. New and changed items are upserted.
+
+    Args:
+        client: `pystac_client.Client` for the upstream API.
+        collection_id: Target pgstac collection.
+        start: Start of the time range to sync when the collection is empty;
+            naive datetimes are taken to be UTC.
+        end: End of the time range to sync (open ended if None).
+        watermark_field: "datetime" or "updated".
+        batch_size: Number of items per `Loader.load_items` call.
+        concurrency: Number of batches loaded in parallel.
+        prefetch: Number of extra batches fetched ahead of the loaders.
+        dsn: Database connection string; the PG* environment variables are used
+            if empty.
+        **search_kwargs: Passed to `client.search`, e.g. `collections`, `bbox`.
+
+    Returns:
+        IngestStats: Counts of inserted, updated and unchanged items and timing
+    """
+    watermark = get_watermark(collection_id, field=watermark_field, dsn=dsn)
+    if watermark is not None:
+        watermark = as_utc(watermark)
+
+    if start is not None:
+        start = as_utc(start)
+    if end is not None:
+        end = as_utc(end)
+
+    if watermark is not None and watermark_field == "datetime":
+        # inclusive, since several items can share the watermark timestamp
+        start = max(start, watermark) if start else watermark
+    elif watermark is not None:
+        updated_filter = {
+            "op": ">=",
+            "args": [{"property": "updated"}, {"timestamp": watermark.isoformat()}],
+        }
+        if "filter" in search_kwargs:
+            updated_filter = {
+                "op": "and",
+                "args": [search_kwargs["filter"], updated_filter],
+            }
+        search_kwargs["filter"] = updated_filter
+
+    if start or end:
+        search_kwargs["datetime"] = [start, end]
+    search = client.search(**search_kwargs)
+
+    return ingest_items(
+        iter_search_items(search, collection_id),
+        batch_size=batch_size,
+        concurrency=concurrency,
+        prefetch=prefetch,
+        insert_mode=Methods.upsert,
+        dsn=dsn,
+        skip_unchanged=True,
+    )
@@ -0,0 +1,369 @@
+"""
+Export pgstac collections to stac-geoparquet and load them back.
+
+Usage in notebooks:
+    import pyarrow.compute as pc
+    from workshop_parquet import export_collection, load_parquet, open_dataset
+
+    # straight from the database, or through the STAC API with `client=`
+    stats = export_collection(my_collection.id, "exports")
+    print(stats)
+
+    # filters run on Arrow columns instead of item by item in Python
+    dataset = open_dataset("exports")
+    clear = dataset.to_table(filter=pc.field("eo:cloud_cover") < 10)
+
+    # bulk-load the export into pgstac again, e.g. in another stack
+    stats = load_parquet("exports")
+
+Items are streamed out of pgstac through a server-side cursor (or page by page
+from a STAC API) and converted to Arrow `chunk_size` items at a time with
+stac-geoparquet, so `properties` become columns, `bbox` a struct column and
+`datetime` a timestamp column. Each chunk is written as one file per
+collection and month:
+
+    {root}/{collection}/year={yyyy}/month={mm}/part-{chunk}.parquet
+
+The collection itself is stored in the metadata of every file, so
+`load_parquet` can recreate it before loading the items with pypgstac.
+"""
+
+import shutil
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import batched
+from pathlib import Path
+
+import orjson
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pypgstac.db import PgstacDB
+from pypgstac.load import Loader, Methods
+from stac_geoparquet.arrow import (
+    parse_stac_items_to_arrow,
+    stac_table_to_items,
+    to_parquet,
+)
+from workshop_ingest import (
+    IngestStats,
+    close_db,
+    ingest_items,
+    iter_search_items,
+    set_item_collection,
+)
+
+# Items converted and written at a time; bounds memory use of an export
+EXPORT_CHUNK_SIZE = 5000
+
+# Items fetched from the server-side cursor per round trip
+EXPORT_FETCH_SIZE = 1000
+
+# Parquet file metadata key of the stac-geoparquet spec
+METADATA_KEY = b"stac-geoparquet"
+
+
+@dataclass
+class ParquetStats:
+    """Size and timing of a stac-geoparquet export."""
+
+    items: int = 0
+    files: int = 0
+    bytes: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"exported {self.items} items to {self.files} files "
+            f"({self.bytes / 1e6:.1f} MB) in {self.elapsed:.1f}s: "
+            f"{self.items_per_second:.1f} items/s"
+        )
+
+
+def iter_pgstac_items(
+    collection_id: str,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    fetch_size: int = EXPORT_FETCH_SIZE,
+    dsn: str = "",
+) -> Iterator[dict]:
+    """
+    Stream the items of a pgstac collection in `datetime` order.
+
+    Items are hydrated in the database and read through a server-side cursor
+    `fetch_size` rows at a time, so the collection is never held in memory.
+
+    Args:
+        collection_id: pgstac collection id.
+        start: Only items ending at or after this time.
+        end: Only items starting at or before this time.
+        fetch_size: Rows fetched per round trip.
+        dsn: Database connection string; the PG* environment variables are used
+            if empty.
+
+    Yields:
+        dict: STAC item
+    """
+    conditions = ["items.collection = %s"]
+    params: list = [collection_id]
+    if start is not None:
+        conditions.append("items.end_datetime >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append("items.datetime <= %s")
+        params.append(end)
+    query = (
+        "SELECT content_hydrate(items, collections) FROM items "
+        "JOIN collections ON items.collection = collections.id "
+        f"WHERE {' AND '.join(conditions)} ORDER BY items.datetime, items.id;"
+    )
+
+    db = PgstacDB(dsn=dsn)
+    try:
+        conn = db.connect()
+        # server-side cursors only live inside a transaction
+        with conn.transaction(), conn.cursor(name="export_items") as cursor:
+            cursor.itersize = fetch_size
+            cursor.execute(query, params)
+            for (item,) in cursor:
+                yield item
+    finally:
+        close_db(db)
+
+
+def get_pgstac_collection(collection_id: str, dsn: str = "") -> dict:
+    """The JSON of a pgstac collection."""
+    db = PgstacDB(dsn=dsn)
+    try:
+        collection = db.query_one(
+            "SELECT content FROM collections WHERE id = %s;", [collection_id]
+        )
+    finally:
+        close_db(db)
+    if collection is None:
+        raise ValueError(f"collection {collection_id} is not in pgstac")
+    return collection
+
+
+def partition_keys(table: pa.Table) -> pa.Table:
+    """The collection, year and month of every row of a stac-geoparquet table."""
+    when = table["datetime"]
+    if "start_datetime" in table.column_names:
+        # items with a time range have a null datetime
+        when = pc.coalesce(when, table["start_datetime"])
+    return pa.table(
+        {
+            "collection": table["collection"],
+            "year": pc.year(when),
+            "month": pc.month(when),
+        }
+    )
+
+
+def write_partitions(
+    table: pa.Table, root: Path, part: int, collections: dict[str, dict]
+) -> list[Path]:
+    """Write the rows of `table` to one file per collection and month."""
+    keys = partition_keys(table)
+    paths = []
+    groups = keys.group_by(keys.column_names).aggregate([])
+    for collection_id, year, month in zip(
+        *(column.to_pylist() for column in groups.columns)
+    ):
+        mask = pc.and_(
+            pc.and_(
+                pc.equal(keys["collection"], collection_id),
+                pc.equal(keys["year"], year),
+            ),
+            pc.equal(keys["month"], month),
+        )
+        path = (
+            root
+            / collection_id
+            / f"year={year}"
+            / f"month={month:02d}"
+            / f"part-{part:05d}.parquet"
+        )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        to_parquet(
+            table.filter(mask),
+            path,
+            collections={collection_id: collections[collection_id]}
+            if collection_id in collections
+            else None,
+        )
+        paths.append(path)
+    return paths
+
+
+def export_items(
+    items: Iterable[dict],
+    root: str | Path,
+    collections: dict[str, dict] | None = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> ParquetStats:
+    """
+    Write a stream of STAC items as partitioned stac-geoparquet.
+
+    Items sorted by `datetime` (as `iter_pgstac_items` yields them) give one
+    file per month and chunk; any order works, with more, smaller files.
+
+    Args:
+        items: STAC item dictionaries.
+        root: Directory of the export.
+        collections: Collection JSON by id, stored in the file metadata.
+        chunk_size: Items converted and written at a time.
+
+    Returns:
+        ParquetStats: Item and file counts, size and timing of the export
+    """
+    root = Path(root)
+    collections = collections or {}
+    stats = ParquetStats()
+    start = time.perf_counter()
+    for part, chunk in enumerate(batched(items, chunk_size)):
+        table = parse_stac_items_to_arrow(chunk).read_all()
+        for path in write_partitions(table, root, part, collections):
+            stats.files += 1
+            stats.bytes += path.stat().st_size
+        stats.items += len(chunk)
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def export_collection(
+    collection_id: str,
+    root: str | Path,
+    client=None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+    dsn: str = "",
+    **search_kwargs,
+) -> ParquetStats:
+    """
+    Export a collection and its items to `{root}/{collection_id}`.
+
+    An earlier export of the collection under `root` is replaced.
+
+    Args:
+        collection_id: Collection to export.
+        root: Directory of the export.
+        client: `pystac_client.Client` to read through the STAC API; the items
+            are read from pgstac directly if None.
+        chunk_size: Items converted and written at a time.
+        dsn: Database connection string when reading from pgstac; the PG*
+            environment variables are used if empty.
+        **search_kwargs: Passed to `client.search`, e.g. `datetime` or
+            `filter`, when reading through the STAC API.
+
+    Returns:
+        ParquetStats: Item and file counts, size and timing of the export
+    """
+    if client is None:
+        collection = get_pgstac_collection(collection_id, dsn=dsn)
+        items = iter_pgstac_items(collection_id, dsn=dsn)
+    else:
+        collection = client.get_collection(collection_id).to_dict()
+        search_kwargs.setdefault("sortby", "+datetime")
+        items = iter_search_items(
+            client.search(collections=[collection_id], **search_kwargs)
+        )
+
+    shutil.rmtree(Path(root) / collection_id, ignore_errors=True)
+    return export_items(items, root, {collection_id: collection}, chunk_size)
+
+
+def open_dataset(root: str | Path) -> ds.Dataset:
+    """
+    The files under `root` as one pyarrow dataset, for DuckDB or pyarrow.
+
+    Files written from different chunks can have different columns (e.g. a
+    property that only later items have); the dataset has all of them.
+    """
+    dataset = ds.dataset(root, format="parquet", partitioning="hive")
+    schema = pa.unify_schemas(
+        [dataset.schema]
+        + [fragment.physical_schema for fragment in dataset.get_fragments()],
+        promote_options="permissive",
+    )
+    return ds.dataset(root, schema=schema, format="parquet", partitioning="hive")
+
+
+def read_collections(paths: Iterable[Path]) -> dict[str, dict]:
+    """The collections stored in the metadata of stac-geoparquet files."""
+    collections = {}
+    for path in paths:
+        metadata = pq.read_schema(path).metadata or {}
+        if METADATA_KEY in metadata:
+            collections.update(
+                orjson.loads(metadata[METADATA_KEY]).get("collections") or {}
+            )
+    return collections
+
+
+def iter_parquet_items(paths: Iterable[Path], batch_size: int = 500) -> Iterator[dict]:
+    """Stream the items of stac-geoparquet files, `batch_size` rows at a time."""
+    for path in paths:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            yield from stac_table_to_items(pa.Table.from_batches([batch]))
+
+
+def load_parquet(
+    root: str | Path,
+    collection_id: str | None = None,
+    batch_size: int = 500,
+    concurrency: int = 1,
+    insert_mode: Methods = Methods.insert_ignore,
+    dsn: str = "",
+) -> IngestStats:
+    """
+    Bulk-load a stac-geoparquet export into pgstac.
+
+    The collections stored in the files are upserted first, then the items
+    are streamed through `ingest_items`.
+
+    Args:
+        root: Directory of the export, or of one collection in it.
+        collection_id: Load everything into this collection instead of the
+            collections the items belong to.
+        batch_size: Number of items per `Loader.load_items` call.
+        concurrency: Number of batches loaded in parallel.
+        insert_mode: pypgstac insert method for the items.
+        dsn: Database connection string; the PG* environment variables are used
+            if empty.
+
+    Returns:
+        IngestStats: Item count, bytes and timing of the load
+    """
+    paths = sorted(Path(root).rglob("*.parquet"))
+    collections = read_collections(paths)
+    if collection_id is not None and collections:
+        # the collection of the export, renamed
+        collection = next(iter(collections.values()))
+        collections = {collection_id: {**collection, "id": collection_id}}
+
+    if collections:
+        db = PgstacDB(dsn=dsn)
+        try:
+            Loader(db).load_collections(
+                iter(collections.values()), insert_mode=Methods.upsert
+            )
+        finally:
+            close_db(db)
+
+    items = iter_parquet_items(paths, batch_size)
+    if collection_id is not None:
+        items = (set_item_collection(item, collection_id) for item in items)
+    return ingest_items(
+        items,
+        batch_size=batch_size,
+        concurrency=concurrency,
+        insert_mode=insert_mode,
+        dsn=dsn,
+    )
@@ -5,16 +5,220 @@ Usage in notebooks:
     from workshop_setup import setup
     config = setup()
 
+    # fetch fresh credentials instead of the cached ones
+    config = setup(refresh=True)
+
+    # spread attendees over well-separated areas with Sentinel-2 coverage
+    from workshop_setup import sample_land_points
+    points = sample_land_points(5)
+
+    # shared, pooled clients for the workshop APIs
+    from workshop_setup import fetch_many, get_client
+    stac = get_client("stac")
+    stac.get("/collections")
+    responses = fetch_many("stac", [f"/collections/{cid}" for cid in collection_ids])
+
 Note: API endpoints are already configured in the environment via the start script.
 """
 
+import asyncio
+import functools
+import importlib.util
+import json
 import os
 import random
+import re
+import tempfile
+import threading
+import time
+import warnings
+import weakref
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 import httpx
+import numpy as np
+
+# How long fetched credentials are reused across notebooks and kernel restarts
+CONFIG_CACHE_TTL = float(os.environ.get("WORKSHOP_CONFIG_CACHE_TTL", 8 * 60 * 60))
+
+# Retry policy for the config endpoint (5xx responses and timeouts)
+CONFIG_FETCH_RETRIES = 4
+CONFIG_FETCH_BACKOFF = 0.5
+
+# Environment variables with the endpoint of each workshop API
+SERVICE_ENDPOINT_VARIABLES = {
+    "stac": "STAC_API_ENDPOINT",
+    "raster": "TITILER_PGSTAC_API_ENDPOINT",
+    "vector": "TIPG_API_ENDPOINT",
+}
+
+# Shared API clients: keep-alive connections per endpoint, HTTP/2 when the h2
+# package is installed, and retries of throttled or unavailable responses
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+HTTP_LIMITS = httpx.Limits(
+    max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0
+)
+HTTP_RETRIES = 3
+HTTP_BACKOFF = 0.25
+HTTP_RETRY_STATUS = {429, 502, 503, 504}
+# titiler-pgstac answers 404 for a search a read replica hasn't replayed yet.
+# With read replicas (PGREADER_HOSTS), such 404s are retried for this many
+# seconds after a search is registered; later ones are tiles outside the
+# mosaic's bounds.
+REPLICA_LAG_WINDOW = 10.0
+REGISTER_SEARCH_PATH = re.compile(r"/searches/register$")
+REGISTERED_SEARCH_PATH = re.compile(r"/searches/[^/]+/")
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+# Requests in flight at once in `fetch_many`
+FETCH_CONCURRENCY = 8
+
+
+def cache_dir() -> Path:
+    """Per-user cache directory of the workshop helpers."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "eoapi-workshop"
+
+
+def config_cache_path() -> Path:
+    """Location of the per-user workshop config cache."""
+    return cache_dir() / "config.json"
+
+
+def read_cached_config(config_url: str) -> dict | None:
+    """
+    Return the cached configuration for `config_url` if it has not expired.
+
+    Unreadable or corrupt cache files are treated as a cache miss.
+    """
+    try:
+        entries = json.loads(config_cache_path().read_text())
+        entry = entries[config_url]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+    if entry.get("expires_at", 0) <= time.time():
+        return None
+
+    return entry.get("config")
+
+
+def write_cached_config(config_url: str, config: dict, ttl: float = CONFIG_CACHE_TTL):
+    """
+    Store `config` in the per-user cache.
+
+    The file holds database credentials, so it is only readable by the current
+    user. It is written to a temporary file and renamed into place, so
+    notebooks starting at the same time never read a partially written cache.
+    """
+    path = config_cache_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        entries = json.loads(path.read_text())
+        if not isinstance(entries, dict):
+            entries = {}
+    except (OSError, ValueError):
+        entries = {}
+
+    entries[config_url] = {"expires_at": time.time() + ttl, "config": config}
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".config-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(entries, f)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def fetch_config(
+    config_url: str,
+    token: str,
+    refresh: bool = False,
+    retries: int = CONFIG_FETCH_RETRIES,
+    backoff: float = CONFIG_FETCH_BACKOFF,
+) -> dict:
+    """
+    Request the workshop configuration, retrying 5xx responses and timeouts.
+
+    Retries use exponential backoff with jitter so that a room full of
+    notebooks retrying at once doesn't hit the endpoint in lockstep.
+
+    Args:
+        config_url: Workshop config endpoint.
+        token: Workshop access token.
+        refresh: Ask the endpoint to re-read the database secret.
+        retries: Number of attempts before giving up.
+        backoff: Base delay in seconds between attempts.
+
+    Returns:
+        dict: Configuration returned by the endpoint
+    """
+    params = {"refresh": "true"} if refresh else None
+
+    for attempt in range(retries):
+        try:
+            response = httpx.get(
+                config_url,
+                headers={"Authorization": f"Bearer {token}"},
+                params=params,
+                timeout=10.0,
+            )
+            response.raise_for_status()
+            return response.json()
+
+        except (httpx.HTTPStatusError, httpx.TimeoutException) as e:
+            retryable = (
+                isinstance(e, httpx.TimeoutException) or e.response.status_code >= 500
+            )
+            if not retryable or attempt == retries - 1:
+                raise
+
+        time.sleep(backoff_delay(attempt, backoff))
 
 
-def setup(token: str | None = None):
+def backoff_delay(attempt: int, backoff: float) -> float:
+    """Exponential backoff with jitter, so retrying clients don't align."""
+    return backoff * 2**attempt * random.uniform(0.5, 1.5)
+
+
+def apply_pool_hints(config: dict):
+    """
+    Apply the per-client connection hints from the workshop config.
+
+    The `DB_*_CONN_SIZE` variables cap the connection pool of each pypgstac
+    `PgstacDB`. Every `PgstacDB` opens a pool of its own, so a kernel holds
+    `db_max_conn_size` connections per `PgstacDB` that is open; close them, or
+    use them as context managers, when a cell is done. Values already set in
+    the environment are left alone. Must run before `pypgstac` is imported,
+    which reads them once.
+    """
+    hints = {
+        "DB_MIN_CONN_SIZE": "0" if config.get("db_max_conn_size") else None,
+        "DB_MAX_CONN_SIZE": config.get("db_max_conn_size"),
+    }
+    for var, value in hints.items():
+        if value is not None:
+            os.environ.setdefault(var, str(value))
+
+
+def apply_config(config: dict):
+    """Set the PG* environment variables and pool hints from `config`."""
+    os.environ["PGHOST"] = config["pghost"]
+    os.environ["PGPORT"] = config["pgport"]
+    os.environ["PGDATABASE"] = config["pgdatabase"]
+    os.environ["PGUSER"] = config["pguser"]
+    os.environ["PGPASSWORD"] = config["pgpassword"]
+    os.environ["PGREADER_HOSTS"] = ",".join(config.get("pgreader_hosts") or [])
+    apply_pool_hints(config)
+
+
+def setup(token: str | None = None, refresh: bool = False):
     """
     Fetch database credentials from workshop config endpoint.
 
@@ -24,16 +228,28 @@ def setup(token: str | None = None):
     If running in docker-compose (detected by existing PG* env vars), skips fetching
     and returns the existing configuration.
 
+    Fetched credentials are cached on disk (see `config_cache_path`) for
+    `WORKSHOP_CONFIG_CACHE_TTL` seconds, so other notebooks and restarted
+    kernels reuse them without another request or token prompt.
+
     Args:
         token: Workshop access token. If None, prompts user.
+        refresh: Ignore cached credentials and fetch them again, e.g. after the
+            database rejected the cached password.
 
     Returns:
         dict: Configuration including database credentials
     """
 
+    # Construct config URL
+    config_url = os.environ.get(
+        "CONFIG_API_ENDPOINT", "https://workshop-config.eoapi.dev"
+    )
+
     # Check if we're in docker-compose runtime (all PG* vars already set)
     pg_vars = ["PGHOST", "PGPORT", "PGDATABASE", "PGUSER", "PGPASSWORD"]
-    if all(var in os.environ for var in pg_vars):
+    forced = refresh and "CONFIG_API_ENDPOINT" in os.environ
+    if all(var in os.environ for var in pg_vars) and not forced:
         print("✓ Database credentials already configured")
 
         # Return existing configuration
@@ -45,10 +261,12 @@ def setup(token: str | None = None):
             "pgpassword": os.environ["PGPASSWORD"],
         }
 
-    # Construct config URL
-    config_url = os.environ.get(
-        "CONFIG_API_ENDPOINT", "https://workshop-config.eoapi.dev"
-    )
+    if not refresh:
+        config = read_cached_config(config_url)
+        if config is not None:
+            apply_config(config)
+            print("✓ Database credentials configured from cache")
+            return config
 
     # Get token
     if token is None:
@@ -61,22 +279,19 @@ def setup(token: str | None = None):
 
     # Fetch configuration
     try:
-        response = httpx.get(
-            config_url,
-            headers={"Authorization": f"Bearer {token}"},
-            timeout=10.0,
-        )
-        response.raise_for_status()
-        config = response.json()
+        config = fetch_config(config_url, token, refresh=refresh)
 
         # Set database environment variables
-        os.environ["PGHOST"] = config["pghost"]
-        os.environ["PGPORT"] = config["pgport"]
-        os.environ["PGDATABASE"] = config["pgdatabase"]
-        os.environ["PGUSER"] = config["pguser"]
-        os.environ["PGPASSWORD"] = config["pgpassword"]
+        apply_config(config)
+
+        try:
+            write_cached_config(config_url, config)
+        except OSError as e:
+            print(f"Could not cache credentials ({e}), continuing without cache")
 
         print("\n✓ Database credentials configured successfully!")
+        if config.get("pgbouncer"):
+            print(f"  (connecting through PgBouncer, {config['pool_mode']} pooling)")
 
         return config
 
@@ -95,6 +310,247 @@ def setup(token: str | None = None):
         raise RuntimeError(f"Unexpected error during configuration: {str(e)}")
 
 
+def service_endpoint(service: str) -> str:
+    """
+    Base URL of a workshop API.
+
+    Args:
+        service: "stac", "raster" or "vector", or a URL that is returned as is.
+
+    Returns:
+        str: The endpoint, without a trailing slash
+    """
+    if service in SERVICE_ENDPOINT_VARIABLES:
+        endpoint = os.environ.get(SERVICE_ENDPOINT_VARIABLES[service])
+        if not endpoint:
+            raise ValueError(
+                f"{SERVICE_ENDPOINT_VARIABLES[service]} is not set; run setup() "
+                f"or set the endpoint of the {service} API"
+            )
+        return endpoint.rstrip("/")
+    return service.rstrip("/")
+
+
+# monotonic time of the last search registration seen by the shared clients
+_registered_at = -float("inf")
+
+
+def record_registration(request: httpx.Request, response: httpx.Response):
+    global _registered_at
+    if (
+        request.method == "POST"
+        and response.status_code == 200
+        and REGISTER_SEARCH_PATH.search(request.url.path)
+    ):
+        _registered_at = time.monotonic()
+
+
+def should_retry(request: httpx.Request, response: httpx.Response) -> bool:
+    if response.status_code == 404:
+        # with read replicas, a search that was just registered on the primary
+        # can be requested before the replica has it
+        return (
+            bool(os.environ.get("PGREADER_HOSTS"))
+            and time.monotonic() - _registered_at < REPLICA_LAG_WINDOW
+            and bool(REGISTERED_SEARCH_PATH.search(request.url.path))
+        )
+    return response.status_code in HTTP_RETRY_STATUS
+
+
+class RetryTransport(httpx.BaseTransport):
+    """
+    Retries timeouts, network errors and 429/502/503/504 responses, and 404s
+    for a search registered less than `REPLICA_LAG_WINDOW` seconds ago.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.BaseTransport,
+        retries: int = HTTP_RETRIES,
+        backoff: float = HTTP_BACKOFF,
+    ):
+        self.transport = transport
+        self.retries = retries
+        self.backoff = backoff
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                response = self.transport.handle_request(request)
+            except (httpx.TimeoutException, httpx.NetworkError):
+                if last:
+                    raise
+            else:
+                record_registration(request, response)
+                if last or not should_retry(request, response):
+                    return response
+                response.close()
+            time.sleep(backoff_delay(attempt, self.backoff))
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncRetryTransport(httpx.AsyncBaseTransport):
+    """`RetryTransport` for `httpx.AsyncClient`."""
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        retries: int = HTTP_RETRIES,
+        backoff: float = HTTP_BACKOFF,
+    ):
+        self.transport = transport
+        self.retries = retries
+        self.backoff = backoff
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                response = await self.transport.handle_async_request(request)
+            except (httpx.TimeoutException, httpx.NetworkError):
+                if last:
+                    raise
+            else:
+                record_registration(request, response)
+                if last or not should_retry(request, response):
+                    return response
+                await response.aclose()
+            await asyncio.sleep(backoff_delay(attempt, self.backoff))
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+_clients: dict[str, httpx.Client] = {}
+# async clients are bound to the event loop they were created in
+_async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+
+def get_client(
+    service: str, transport: httpx.BaseTransport | None = None
+) -> httpx.Client:
+    """
+    Process-wide `httpx.Client` for a workshop API.
+
+    Every call with the same endpoint returns the same client, so notebook
+    cells reuse its keep-alive connections instead of opening a new TCP and
+    TLS connection per request. Relative URLs are resolved against the
+    endpoint; absolute URLs work as well.
+
+    Args:
+        service: "stac", "raster", "vector" or an endpoint URL.
+        transport: Transport to send requests with, e.g. a
+            `workshop_cache.CachingTransport`, wrapped in the retry policy.
+            Only used when the client is created.
+
+    Returns:
+        httpx.Client: The shared client
+    """
+    endpoint = service_endpoint(service)
+    with _clients_lock:
+        client = _clients.get(endpoint)
+        if client is None or client.is_closed:
+            transport = transport or httpx.HTTPTransport(
+                http2=HTTP2, limits=HTTP_LIMITS
+            )
+            client = httpx.Client(
+                base_url=endpoint,
+                timeout=HTTP_TIMEOUT,
+                transport=RetryTransport(transport),
+            )
+            _clients[endpoint] = client
+        return client
+
+
+def get_async_client(
+    service: str, transport: httpx.AsyncBaseTransport | None = None
+) -> httpx.AsyncClient:
+    """
+    `httpx.AsyncClient` for a workshop API, shared within the running event loop.
+
+    Must be called from a coroutine. See `get_client` for the arguments.
+    """
+    endpoint = service_endpoint(service)
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(endpoint)
+    if client is None or client.is_closed:
+        transport = transport or httpx.AsyncHTTPTransport(
+            http2=HTTP2, limits=HTTP_LIMITS
+        )
+        client = httpx.AsyncClient(
+            base_url=endpoint,
+            timeout=HTTP_TIMEOUT,
+            transport=AsyncRetryTransport(transport),
+        )
+        clients[endpoint] = client
+    return client
+
+
+def close_clients():
+    """Close the shared synchronous clients."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+def as_request(request: str | dict) -> dict:
+    """A URL or a dict of `httpx.Client.request` arguments, as arguments."""
+    if isinstance(request, str):
+        return {"method": "GET", "url": request}
+    return {"method": "GET", **request}
+
+
+def fetch_many(
+    service: str,
+    requests: Iterable[str | dict],
+    concurrency: int = FETCH_CONCURRENCY,
+) -> list[httpx.Response]:
+    """
+    Send a batch of requests to a workshop API, `concurrency` at a time.
+
+    Runs in a thread pool on the shared client, so it works in notebooks
+    whose event loop is already running.
+
+    Args:
+        service: "stac", "raster", "vector" or an endpoint URL.
+        requests: URLs to GET, or dicts of `httpx.Client.request` arguments
+            such as `{"method": "POST", "url": "/search", "json": {...}}`.
+        concurrency: Maximum number of requests in flight.
+
+    Returns:
+        list[httpx.Response]: The responses, in the order of `requests`.
+            Error statuses are returned, not raised.
+    """
+    client = get_client(service)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(
+            executor.map(
+                lambda request: client.request(**as_request(request)), requests
+            )
+        )
+
+
+async def afetch_many(
+    service: str,
+    requests: Iterable[str | dict],
+    concurrency: int = FETCH_CONCURRENCY,
+) -> list[httpx.Response]:
+    """`fetch_many` for async code, on the shared `httpx.AsyncClient`."""
+    client = get_async_client(service)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(request):
+        async with semaphore:
+            return await client.request(**as_request(request))
+
+    return await asyncio.gather(*[send(request) for request in requests])
+
+
 # random set of 100 points from continental land masses
 random_land_points = [
     [51.85, 22.78],
@@ -200,6 +656,145 @@ random_land_points = [
 ]
 
 
+# Sentinel-2 acquires land between 56°S and 84°N
+SENTINEL2_LATITUDES = (-56.0, 84.0)
+
+EARTH_RADIUS_KM = 6371.0
+
+# grid cells that lie entirely on land, built by scripts/land_mask.py from
+# Natural Earth
+LAND_MASK = Path(__file__).parent / "land_mask.npz"
+
+# smallest number of candidate points drawn per call
+MIN_CANDIDATES = 4096
+
+# points already handed out in this session, as [lon, lat]
+_issued_points = np.empty((0, 2))
+
+
+def haversine_km(lon1, lat1, lon2, lat2):
+    """Great-circle distance in kilometers between (arrays of) coordinates."""
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+@functools.cache
+def land_cells() -> tuple[np.ndarray, float]:
+    """The [lon, lat] south-west corners of the land cells, and their size."""
+    with np.load(LAND_MASK) as data:
+        rows, columns = data["shape"]
+        resolution = float(data["resolution"])
+        mask = np.unpackbits(data["bits"], count=rows * columns).reshape(rows, columns)
+    row, column = np.nonzero(mask)
+    return np.column_stack([column * resolution - 180, row * resolution - 90]), (
+        resolution
+    )
+
+
+def sample_land_points(
+    n: int = 1,
+    min_distance: float = 400.0,
+    latitudes: tuple[float, float] = SENTINEL2_LATITUDES,
+    cell_size: float = 15.0,
+    oversample: int = 64,
+    unique: bool = True,
+    rng: np.random.Generator | None = None,
+) -> np.ndarray:
+    """
+    Draw `n` well-separated points on land.
+
+    Candidates are drawn uniformly over the land area inside `latitudes`, from
+    the cells of the land mask that lie entirely on land, so every candidate
+    is on land. They are visited round-robin across `cell_size` degree grid
+    cells (so the first picks come from different regions) and accepted
+    Poisson-disk style: each accepted point rules out, in one vectorized
+    distance computation, every candidate closer than `min_distance` km. If
+    the land can't fit `n` points that far apart, a warning is issued and the
+    spacing halved until it can.
+
+    Args:
+        n: Number of points to return.
+        min_distance: Minimum great-circle distance between points, in km.
+        latitudes: (south, north) band to sample from. The default excludes
+            latitudes without Sentinel-2 coverage, e.g. Antarctica.
+        cell_size: Size of the stratification grid cells, in degrees.
+        oversample: Number of candidates drawn per requested point.
+        unique: Keep away from (and remember) the points already returned in
+            this session, so repeated calls never hand out the same area.
+        rng: Random generator, e.g. `np.random.default_rng(seed)`.
+
+    Returns:
+        np.ndarray: Array of shape (n, 2) with [lon, lat] rows
+    """
+    global _issued_points
+
+    rng = rng or np.random.default_rng()
+    south, north = latitudes
+
+    corners, resolution = land_cells()
+    corners = corners[(corners[:, 1] >= south) & (corners[:, 1] + resolution <= north)]
+    if not len(corners):
+        raise ValueError(f"No land points between latitudes {south} and {north}")
+
+    # cells shrink towards the poles; weight them by area
+    weights = np.cos(np.radians(corners[:, 1] + resolution / 2))
+    count = max(oversample * n, MIN_CANDIDATES)
+    cells = corners[rng.choice(len(corners), size=count, p=weights / weights.sum())]
+    candidates = cells + rng.random((count, 2)) * resolution
+    # round without leaving the cell
+    candidates = np.clip(candidates.round(2), cells, cells + resolution)
+
+    # rank candidates within their grid cell, then visit all rank-0 candidates
+    # (one per cell) before any rank-1 candidate, and so on
+    strata = np.floor((candidates + [180, 90]) / cell_size).astype(int)
+    strata_ids = np.unique(strata, axis=0, return_inverse=True)[1].ravel()
+    priority = rng.random(count)
+    by_stratum = np.lexsort((priority, strata_ids))
+    first = np.r_[0, np.flatnonzero(np.diff(strata_ids[by_stratum])) + 1]
+    rank = np.empty(count, dtype=int)
+    rank[by_stratum] = np.arange(count) - np.repeat(first, np.diff(np.r_[first, count]))
+    candidates = candidates[np.lexsort((priority, rank))]
+    lons, lats = candidates[:, 0], candidates[:, 1]
+
+    # distance of every candidate to the closest point handed out earlier
+    issued_distance = np.full(count, np.inf)
+    for lon, lat in _issued_points if unique else []:
+        issued_distance = np.minimum(
+            issued_distance, haversine_km(lon, lat, lons, lats)
+        )
+
+    spacing = min_distance
+    while True:
+        # candidates still far enough from every accepted point, in order
+        remaining = np.flatnonzero(issued_distance >= spacing)
+        selected = []
+        while len(selected) < n and len(remaining):
+            i = remaining[0]
+            selected.append(i)
+            distances = haversine_km(lons[i], lats[i], lons[remaining], lats[remaining])
+            remaining = remaining[distances >= spacing]
+        if len(selected) == n:
+            break
+        if spacing / 2 < 1:
+            raise ValueError(f"Could not find {n} distinct land points")
+        warnings.warn(
+            f"Only {len(selected)} of {n} land points fit {spacing:.0f} km apart; "
+            f"sampling them {spacing / 2:.0f} km apart",
+            stacklevel=2,
+        )
+        spacing /= 2
+
+    points = candidates[selected]
+    if unique:
+        _issued_points = np.vstack([_issued_points, points])
+
+    return points
+
+
 def get_random_point():
     """Get a random pair of coordinates from the set of random points"""
-    return random.sample(random_land_points, 1)[0]
+    return sample_land_points(1)[0].tolist()
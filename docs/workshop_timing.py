@@ -0,0 +1,185 @@
+"""
+Timing hooks for the HTTP and database calls the notebooks make.
+
+Usage (run by `scripts/notebook_benchmark.py` before the first cell):
+    import workshop_timing
+
+    workshop_timing.instrument()
+
+Patches httpx, pystac-client and pypgstac so every request to the APIs and
+every pgstac query or load is timed. Each call is appended as a JSON line to
+the file named by the `WORKSHOP_TIMING_LOG` environment variable:
+
+    {"kind": "http", "name": "GET http://localhost:8081/search", "start": ...,
+     "elapsed_ms": ...}
+
+Only the outermost call is recorded, so e.g. the queries `Loader.load_items`
+runs are part of its time rather than separate entries.
+
+When `upstream_cache` is set, `pystac_client.Client.open` serves catalogs that
+are not one of the workshop APIs (e.g. earth-search) through a
+`workshop_cache.ResponseCache`, so the notebooks can run from recorded
+fixtures.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import httpx
+import psycopg
+import pystac_client
+from pypgstac.db import PgstacDB
+from pypgstac.load import Loader
+from pystac_client.stac_api_io import StacApiIO
+from workshop_cache import CachingStacApiIO, ResponseCache
+
+LOCAL_ENDPOINT_VARIABLES = (
+    "STAC_API_ENDPOINT",
+    "TITILER_PGSTAC_API_ENDPOINT",
+    "TIPG_API_ENDPOINT",
+)
+
+_state = threading.local()
+_log_lock = threading.Lock()
+_log_path = None
+
+
+def record(kind: str, name: str, start: float, elapsed: float):
+    """Append a timed call to the timing log."""
+    if _log_path is None:
+        return
+    event = {
+        "kind": kind,
+        "name": name,
+        "start": start,
+        "elapsed_ms": round(elapsed * 1000, 2),
+    }
+    with _log_lock, open(_log_path, "a") as f:
+        f.write(json.dumps(event) + "\n")
+
+
+@contextmanager
+def timed(kind: str, name: str):
+    """Record the wrapped call, unless it runs inside another timed call."""
+    outermost = not getattr(_state, "active", False)
+    _state.active = True
+    start = time.time()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if outermost:
+            _state.active = False
+            record(kind, name, start, time.perf_counter() - started)
+
+
+def request_name(method: str, url: str) -> str:
+    """`METHOD scheme://host/path`; query strings are left out."""
+    parts = urlsplit(str(url))
+    return f"{(method or 'GET').upper()} {parts.scheme}://{parts.netloc}{parts.path}"
+
+
+def sql_name(query, conn=None) -> str:
+    """A query on one line, shortened; `psycopg.sql` statements are rendered."""
+    if not isinstance(query, str):
+        try:
+            query = query.as_string(conn)
+        except (AttributeError, TypeError, psycopg.Error):
+            query = repr(query)
+    return " ".join(query.split())[:80]
+
+
+def _instrument_httpx():
+    send = httpx.Client.send
+
+    @functools.wraps(send)
+    def timed_send(self, request, *args, **kwargs):
+        with timed("http", request_name(request.method, request.url)):
+            return send(self, request, *args, **kwargs)
+
+    httpx.Client.send = timed_send
+
+
+def _instrument_pystac_client(upstream_cache: ResponseCache | None):
+    stac_request = StacApiIO.request
+
+    @functools.wraps(stac_request)
+    def timed_request(self, href, method=None, *args, **kwargs):
+        with timed("http", request_name(method, href)):
+            return stac_request(self, href, method, *args, **kwargs)
+
+    StacApiIO.request = timed_request
+
+    if upstream_cache is None:
+        return
+
+    local = tuple(
+        os.environ[variable].rstrip("/")
+        for variable in LOCAL_ENDPOINT_VARIABLES
+        if os.environ.get(variable)
+    )
+    client_open = pystac_client.Client.open.__func__
+
+    def cached_open(cls, url, *args, **kwargs):
+        if not url.rstrip("/").startswith(local) and "stac_io" not in kwargs:
+            kwargs["stac_io"] = CachingStacApiIO(cache=upstream_cache)
+        return client_open(cls, url, *args, **kwargs)
+
+    pystac_client.Client.open = classmethod(cached_open)
+
+
+def _instrument_pypgstac():
+    query = PgstacDB.query
+
+    @functools.wraps(query)
+    def timed_query(self, sql, *args, **kwargs):
+        # query is a generator; time it until it is exhausted or closed
+        with timed("db", sql_name(sql, self.connection)):
+            yield from query(self, sql, *args, **kwargs)
+
+    PgstacDB.query = timed_query
+
+    for method in ("load_collections", "load_items"):
+        setattr(Loader, method, _timed_method(getattr(Loader, method), "db"))
+
+
+def _timed_method(method, kind: str):
+    name = method.__qualname__
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with timed(kind, name):
+            return method(*args, **kwargs)
+
+    return wrapper
+
+
+def instrument(
+    log_path: str | None = None, upstream_cache: ResponseCache | None = None
+):
+    """
+    Time httpx, pystac-client and pypgstac calls in this process.
+
+    Args:
+        log_path: JSON lines file to append calls to; defaults to the
+            `WORKSHOP_TIMING_LOG` environment variable.
+        upstream_cache: Cache that serves STAC APIs other than the workshop
+            APIs. By default one is opened when `WORKSHOP_HTTP_CACHE` is set.
+    """
+    global _log_path
+    if getattr(instrument, "done", False):
+        return
+    instrument.done = True
+
+    _log_path = log_path or os.environ.get("WORKSHOP_TIMING_LOG")
+    if upstream_cache is None and os.environ.get("WORKSHOP_HTTP_CACHE"):
+        upstream_cache = ResponseCache()
+
+    _instrument_httpx()
+    _instrument_pystac_client(upstream_cache)
+    _instrument_pypgstac()
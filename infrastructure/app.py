@@ -1,14 +1,32 @@
+import hashlib
+import json
 from pathlib import Path
 
 from aws_cdk import (
     App,
+    BundlingOptions,
     CfnOutput,
+    CustomResource,
     Duration,
     RemovalPolicy,
+    SecretValue,
     Stack,
+    aws_cloudwatch,
     aws_ec2,
+    aws_events,
     aws_lambda,
     aws_rds,
+    aws_secretsmanager,
+    custom_resources,
+)
+from aws_cdk import (
+    aws_cloudfront as cloudfront,
+)
+from aws_cdk import (
+    aws_events_targets as events_targets,
+)
+from aws_cdk import (
+    aws_cloudfront_origins as origins,
 )
 from aws_cdk import (
     aws_certificatemanager as acm,
@@ -16,18 +34,37 @@ from aws_cdk import (
 from aws_cdk import (
     aws_route53 as route53,
 )
-from aws_cdk.aws_apigatewayv2 import ApiMapping, DomainName, HttpApi
+from aws_cdk.aws_apigatewayv2 import (
+    ApiMapping,
+    DomainName,
+    HttpApi,
+    HttpMethod,
+    MappingValue,
+    ParameterMapping,
+)
 from aws_cdk.aws_apigatewayv2_integrations import HttpLambdaIntegration
-from aws_cdk.aws_route53_targets import ApiGatewayv2DomainProperties
+from aws_cdk.aws_route53_targets import (
+    ApiGatewayv2DomainProperties,
+    CloudFrontTarget,
+)
+from capacity import RASTER_WRITER
 from config import AppConfig
 from constructs import Construct
 from eoapi_cdk import (
+    LambdaApiGateway,
     PgStacApiLambda,
     PgStacDatabase,
     TiPgApiLambda,
     TitilerPgstacApiLambda,
+    TitilerPgstacApiLambdaRuntime,
 )
 
+# CloudWatch namespace of the metrics the workshop config Lambda emits
+WORKSHOP_METRICS_NAMESPACE = "EoapiWorkshop"
+
+# Read-only login role of the read replicas, see pgstac_readers/handler.py
+PGSTAC_READER_ROLE = "pgstac_reader"
+
 
 class VpcStack(Stack):
     def __init__(
@@ -98,6 +135,25 @@ class eoAPIStack(Stack):
             **kwargs,
         )
 
+        #######################################################################
+        # Capacity plan; fails synth with a sizing report if the deployment
+        # can't serve expected_attendees
+        capacity = app_config.capacity_plan()
+        if capacity:
+            capacity.check()
+
+        def service_env(service: str) -> dict[str, str]:
+            return capacity.services[service].api_env if capacity else {}
+
+        def service_lambda_options(service: str) -> dict | None:
+            if not capacity:
+                return None
+            return {
+                "reservedConcurrentExecutions": capacity.services[
+                    service
+                ].reserved_concurrency
+            }
+
         #######################################################################
         # Route53 Hosted Zone and Certificate
         hosted_zone = route53.HostedZone.from_hosted_zone_attributes(
@@ -146,6 +202,16 @@ class eoAPIStack(Stack):
 
         #######################################################################
         # PG database
+        db_instance_type = (
+            capacity.db_instance_type if capacity else app_config.db_instance_type
+        )
+        db_subnets = aws_ec2.SubnetSelection(
+            subnet_type=(
+                aws_ec2.SubnetType.PUBLIC
+                if app_config.public_db_subnet
+                else aws_ec2.SubnetType.PRIVATE_ISOLATED
+            )
+        )
         pgstac_db = PgStacDatabase(
             self,
             "pgstac-db",
@@ -154,15 +220,13 @@ class eoAPIStack(Stack):
             engine=aws_rds.DatabaseInstanceEngine.postgres(
                 version=aws_rds.PostgresEngineVersion.VER_17
             ),
-            vpc_subnets=aws_ec2.SubnetSelection(
-                subnet_type=(
-                    aws_ec2.SubnetType.PUBLIC
-                    if app_config.public_db_subnet
-                    else aws_ec2.SubnetType.PRIVATE_ISOLATED
-                )
+            vpc_subnets=db_subnets,
+            allocated_storage=(
+                capacity.db_allocated_storage
+                if capacity
+                else app_config.db_allocated_storage
             ),
-            allocated_storage=app_config.db_allocated_storage,
-            instance_type=aws_ec2.InstanceType(app_config.db_instance_type),
+            instance_type=aws_ec2.InstanceType(db_instance_type),
             removal_policy=RemovalPolicy.DESTROY,
             pgstac_version=app_config.pgstac_version,
         )
@@ -179,6 +243,146 @@ class eoAPIStack(Stack):
             description="ARN of the pgstac secret",
         )
 
+        def admin_sql_function(
+            id: str, directory: Path, environment: dict[str, str]
+        ) -> aws_lambda.Function:
+            """Lambda that runs `directory/handler.py` as the database admin."""
+            function = aws_lambda.Function(
+                self,
+                id,
+                runtime=aws_lambda.Runtime.PYTHON_3_12,
+                handler="handler.handler",
+                code=aws_lambda.Code.from_asset(
+                    str(directory),
+                    bundling=BundlingOptions(
+                        image=aws_lambda.Runtime.PYTHON_3_12.bundling_image,
+                        command=[
+                            "bash",
+                            "-c",
+                            "pip install -r requirements.txt -t /asset-output "
+                            "&& cp -r . /asset-output",
+                        ],
+                    ),
+                ),
+                timeout=Duration.minutes(15),
+                environment={
+                    "ADMIN_SECRET_ARN": pgstac_db.db.secret.secret_arn,
+                    "PGSTAC_SECRET_ARN": pgstac_db.pgstac_secret.secret_arn,
+                    **environment,
+                },
+                vpc=vpc if not app_config.public_db_subnet else None,
+                vpc_subnets=aws_ec2.SubnetSelection(
+                    subnet_type=aws_ec2.SubnetType.PRIVATE_WITH_EGRESS
+                )
+                if not app_config.public_db_subnet
+                else None,
+            )
+            pgstac_db.db.secret.grant_read(function)
+            pgstac_db.pgstac_secret.grant_read(function)
+            return function
+
+        #######################################################################
+        # Read replicas. The STAC API and raster tiles read from them through a
+        # read-only role (see pgstac_readers/handler.py); notebooks, search
+        # registration and tipg, which creates functions on every connection,
+        # stay on the primary
+        replicas: list[aws_rds.DatabaseInstanceReadReplica] = []
+        reader_secrets: list[aws_secretsmanager.Secret] = []
+        if app_config.db_read_replicas:
+            replica_security_group = aws_ec2.SecurityGroup(
+                self,
+                "pgstac-db-replica-sg",
+                vpc=vpc,
+                description="pgstac read replicas",
+            )
+            replica_security_group.add_ingress_rule(
+                aws_ec2.Peer.any_ipv4()
+                if app_config.public_db_subnet
+                else aws_ec2.Peer.ipv4(vpc.vpc_cidr_block),
+                aws_ec2.Port.tcp(5432),
+            )
+
+            reader_credentials = aws_secretsmanager.Secret(
+                self,
+                "pgstac-reader-credentials",
+                description="Login of the read-only pgstac role of the read replicas",
+                generate_secret_string=aws_secretsmanager.SecretStringGenerator(
+                    secret_string_template=json.dumps({"username": PGSTAC_READER_ROLE}),
+                    generate_string_key="password",
+                    exclude_punctuation=True,
+                ),
+            )
+            readers_lambda = admin_sql_function(
+                "pgstac-readers",
+                Path(__file__).parent / "pgstac_readers",
+                {"READER_SECRET_ARN": reader_credentials.secret_arn},
+            )
+            reader_credentials.grant_read(readers_lambda)
+            readers = CustomResource(
+                self,
+                "pgstac-readers-resource",
+                service_token=custom_resources.Provider(
+                    self,
+                    "pgstac-readers-provider",
+                    on_event_handler=readers_lambda,
+                ).service_token,
+                properties={"role": PGSTAC_READER_ROLE},
+            )
+            readers.node.add_dependency(pgstac_db.secret_bootstrapper)
+
+            for index in range(app_config.db_read_replicas):
+                replica = aws_rds.DatabaseInstanceReadReplica(
+                    self,
+                    f"pgstac-db-replica-{index}",
+                    source_database_instance=pgstac_db.db,
+                    instance_type=aws_ec2.InstanceType(
+                        app_config.db_replica_instance_type or db_instance_type
+                    ),
+                    vpc=vpc,
+                    vpc_subnets=db_subnets,
+                    publicly_accessible=app_config.public_db_subnet,
+                    security_groups=[replica_security_group],
+                    removal_policy=RemovalPolicy.DESTROY,
+                )
+                replica.node.add_dependency(readers)
+                replicas.append(replica)
+                # the connection secret the eoapi-cdk Lambdas read, for the replica
+                reader_secrets.append(
+                    aws_secretsmanager.Secret(
+                        self,
+                        f"pgstac-reader-secret-{index}",
+                        description=f"Read-only connection to pgstac replica {index}",
+                        secret_object_value={
+                            "host": SecretValue.unsafe_plain_text(
+                                replica.db_instance_endpoint_address
+                            ),
+                            "port": SecretValue.unsafe_plain_text(
+                                replica.db_instance_endpoint_port
+                            ),
+                            "dbname": pgstac_db.pgstac_secret.secret_value_from_json(
+                                "dbname"
+                            ),
+                            "username": reader_credentials.secret_value_from_json(
+                                "username"
+                            ),
+                            "password": reader_credentials.secret_value_from_json(
+                                "password"
+                            ),
+                        },
+                    )
+                )
+
+        def read_target(service_index: int) -> dict:
+            """`db` and `db_secret` of a reading API: a replica, if there are any."""
+            if not replicas:
+                return {
+                    "db": pgstac_db.connection_target,
+                    "db_secret": pgstac_db.pgstac_secret,
+                }
+            # spread the reading APIs over the replicas
+            index = service_index % len(replicas)
+            return {"db": replicas[index], "db_secret": reader_secrets[index]}
+
         #######################################################################
         # STAC API service
         stac_api = PgStacApiLambda(
@@ -187,9 +391,9 @@ class eoAPIStack(Stack):
             api_env={
                 "NAME": app_config.build_service_name("stac"),
                 "description": f"{app_config.project} STAC API",
+                **service_env("stac"),
             },
-            db=pgstac_db.connection_target,
-            db_secret=pgstac_db.pgstac_secret,
+            **read_target(0),
             # If the db is not in the public subnet then we need to put
             # the lambda within the VPC
             vpc=vpc if not app_config.public_db_subnet else None,
@@ -200,32 +404,108 @@ class eoAPIStack(Stack):
             else None,
             enable_snap_start=True,
             domain_name=stac_domain,
+            lambda_function_options=service_lambda_options("stac"),
         )
 
         #######################################################################
         # Raster service
-        titiler_pgstac_api = TitilerPgstacApiLambda(
-            self,
-            "raster-api",
-            api_env={
+        raster_options = {
+            "api_env": {
                 "NAME": app_config.build_service_name("raster"),
                 "description": f"{app_config.project} Raster API",
                 "TITILER_PGSTAC_API_ENABLE_EXTERNAL_DATASET_ENDPOINTS": "True",
+                **app_config.raster_api_env,
+                **service_env("raster"),
             },
-            db=pgstac_db.connection_target,
-            db_secret=pgstac_db.pgstac_secret,
             # If the db is not in the public subnet then we need to put
             # the lambda within the VPC
-            vpc=vpc if not app_config.public_db_subnet else None,
-            subnet_selection=aws_ec2.SubnetSelection(
+            "vpc": vpc if not app_config.public_db_subnet else None,
+            "subnet_selection": aws_ec2.SubnetSelection(
                 subnet_type=aws_ec2.SubnetType.PRIVATE_WITH_EGRESS
             )
             if not app_config.public_db_subnet
             else None,
-            enable_snap_start=True,
-            buckets=["*"],
-            domain_name=raster_domain,
-        )
+            "enable_snap_start": True,
+            "buckets": ["*"],
+            "lambda_function_options": service_lambda_options("raster"),
+        }
+        if replicas:
+            # tiles of registered searches are read from a replica, while
+            # search registration and the collection mosaics (which register
+            # a search per request) go to a second function on the primary
+            raster_reader = TitilerPgstacApiLambdaRuntime(
+                self, "raster-api-reader", **read_target(1), **raster_options
+            )
+            # the writer has its own share of the Lambda concurrency and of
+            # the PgBouncer connections in the capacity plan
+            raster_writer = TitilerPgstacApiLambdaRuntime(
+                self,
+                "raster-api-writer",
+                db=pgstac_db.connection_target,
+                db_secret=pgstac_db.pgstac_secret,
+                **{
+                    **raster_options,
+                    "api_env": {
+                        **raster_options["api_env"],
+                        **service_env(RASTER_WRITER),
+                    },
+                    "lambda_function_options": service_lambda_options(RASTER_WRITER),
+                },
+            )
+            raster_api = LambdaApiGateway(
+                self,
+                "raster-api",
+                lambda_function=raster_reader.lambda_function.current_version,
+                domain_name=raster_domain,
+            ).api
+
+            def raster_integration(id: str, runtime) -> HttpLambdaIntegration:
+                # keep the custom domain in the links, like LambdaApiGateway
+                return HttpLambdaIntegration(
+                    id,
+                    runtime.lambda_function.current_version,
+                    parameter_mapping=ParameterMapping().overwrite_header(
+                        "host", MappingValue.custom(raster_domain.name)
+                    ),
+                )
+
+            writer_integration = raster_integration(
+                "raster-writer-integration", raster_writer
+            )
+            # the tilejson, info and viewer of a search are the first requests
+            # after its registration, so they are read from the primary; a
+            # tile requested before the replica has replayed the registration
+            # is a 404 that clients retry (see workshop_setup.should_retry)
+            for path in (
+                "/searches/register",
+                "/searches/{search_id}/info",
+                "/searches/{search_id}/{tileMatrixSetId}/tilejson.json",
+                "/searches/{search_id}/{tileMatrixSetId}/map.html",
+                "/collections/{proxy+}",
+            ):
+                raster_api.add_routes(
+                    path=path, methods=[HttpMethod.ANY], integration=writer_integration
+                )
+            # single items are only read
+            raster_api.add_routes(
+                path="/collections/{collection_id}/items/{proxy+}",
+                methods=[HttpMethod.ANY],
+                integration=raster_integration(
+                    "raster-reader-integration", raster_reader
+                ),
+            )
+            raster_functions = [raster_reader, raster_writer]
+        else:
+            raster_functions = [
+                TitilerPgstacApiLambda(
+                    self,
+                    "raster-api",
+                    db=pgstac_db.connection_target,
+                    db_secret=pgstac_db.pgstac_secret,
+                    domain_name=raster_domain,
+                    **raster_options,
+                )
+            ]
 
         #######################################################################
         # Vector Service
@@ -240,6 +520,7 @@ class eoAPIStack(Stack):
                 "TIPG_DB_SCHEMAS": '["features"]',
                 "TIPG_DB_SPATIAL_EXTENT": "FALSE",
                 "TIPG_DB_DATETIME_EXTENT": "FALSE",
+                **service_env("vector"),
             },
             # If the db is not in the public subnet then we need to put
             # the lambda within the VPC
@@ -251,10 +532,256 @@ class eoAPIStack(Stack):
             else None,
             enable_snap_start=True,
             domain_name=vector_domain,
+            lambda_function_options=service_lambda_options("vector"),
         )
 
-        for api in [stac_api, titiler_pgstac_api, tipg_api]:
+        for api in [stac_api, *raster_functions, tipg_api]:
             api.node.add_dependency(pgstac_db.secret_bootstrapper)
+            if replicas:
+                api.node.add_dependency(readers)
+
+        #######################################################################
+        # pgstac tuning for the notebook searches, applied once pgstac is
+        # installed; see pgstac_tuning/tuning.sql
+        if app_config.pgstac_tuning:
+            tuning_dir = Path(__file__).parent / "pgstac_tuning"
+            tuning_lambda = admin_sql_function("pgstac-tuning", tuning_dir, {})
+
+            tuning = CustomResource(
+                self,
+                "pgstac-tuning-resource",
+                service_token=custom_resources.Provider(
+                    self,
+                    "pgstac-tuning-provider",
+                    on_event_handler=tuning_lambda,
+                ).service_token,
+                properties={
+                    # re-apply whenever the SQL changes
+                    "sql_hash": hashlib.sha256(
+                        (tuning_dir / "tuning.sql").read_bytes()
+                    ).hexdigest(),
+                },
+            )
+            tuning.node.add_dependency(pgstac_db.secret_bootstrapper)
+
+        #######################################################################
+        # Scheduled purge of the attendee collections; see pgstac_purge/purge.py
+        if app_config.collection_ttl_days:
+            purge_lambda = admin_sql_function(
+                "pgstac-purge",
+                Path(__file__).parent / "pgstac_purge",
+                {
+                    "MAX_AGE_DAYS": str(app_config.collection_ttl_days),
+                    "ID_PATTERN": app_config.collection_ttl_pattern,
+                    "KEYWORD": app_config.collection_ttl_keyword,
+                },
+            )
+            aws_events.Rule(
+                self,
+                "pgstac-purge-schedule",
+                schedule=aws_events.Schedule.expression(
+                    app_config.collection_purge_schedule
+                ),
+                targets=[events_targets.LambdaFunction(purge_lambda)],
+            )
+
+        #######################################################################
+        # CDN caching tier
+        api_domains = {
+            "stac": stac_domain,
+            "raster": raster_domain,
+            "vector": vector_domain,
+        }
+        dns_targets = {
+            service: route53.RecordTarget.from_alias(
+                ApiGatewayv2DomainProperties(
+                    domain.regional_domain_name,
+                    domain.regional_hosted_zone_id,
+                )
+            )
+            for service, domain in api_domains.items()
+        }
+
+        if app_config.cdn_enabled:
+            # CloudFront needs a certificate in us-east-1
+            cdn_certificate = acm.Certificate.from_certificate_arn(
+                self,
+                "CdnCertificate",
+                certificate_arn=app_config.cdn_certificate_arn
+                or app_config.certificate_arn,
+            )
+
+            # sort query parameters by name so the same request always has the
+            # same cache key; repeated parameters keep their order since e.g.
+            # the order of `assets=` sets the band order of a tile
+            normalize_query = cloudfront.Function(
+                self,
+                "cdn-normalize-query",
+                runtime=cloudfront.FunctionRuntime.JS_2_0,
+                code=cloudfront.FunctionCode.from_inline(
+                    """
+function handler(event) {
+    var request = event.request;
+    var names = Object.keys(request.querystring).sort();
+    var querystring = {};
+    for (var i = 0; i < names.length; i++) {
+        querystring[names[i]] = request.querystring[names[i]];
+    }
+    request.querystring = querystring;
+    return request;
+}
+"""
+                ),
+            )
+            function_associations = [
+                cloudfront.FunctionAssociation(
+                    function=normalize_query,
+                    event_type=cloudfront.FunctionEventType.VIEWER_REQUEST,
+                )
+            ]
+
+            tile_cache_policy = cloudfront.CachePolicy(
+                self,
+                "cdn-tile-cache-policy",
+                comment="Tiles and tilejson",
+                min_ttl=Duration.seconds(app_config.cdn_tile_ttl),
+                default_ttl=Duration.seconds(app_config.cdn_tile_ttl),
+                max_ttl=Duration.seconds(app_config.cdn_tile_ttl),
+                query_string_behavior=cloudfront.CacheQueryStringBehavior.all(),
+                enable_accept_encoding_gzip=True,
+                enable_accept_encoding_brotli=True,
+            )
+            metadata_cache_policy = cloudfront.CachePolicy(
+                self,
+                "cdn-metadata-cache-policy",
+                comment="Searches and collections",
+                min_ttl=Duration.seconds(0),
+                default_ttl=Duration.seconds(app_config.cdn_metadata_ttl),
+                max_ttl=Duration.seconds(app_config.cdn_metadata_ttl),
+                query_string_behavior=cloudfront.CacheQueryStringBehavior.all(),
+                # JSON and HTML responses are negotiated with the Accept header
+                header_behavior=cloudfront.CacheHeaderBehavior.allow_list("Accept"),
+                enable_accept_encoding_gzip=True,
+                enable_accept_encoding_brotli=True,
+            )
+
+            def cdn_behavior(
+                cache_policy: cloudfront.ICachePolicy,
+                origin: origins.HttpOrigin,
+                allowed_methods: cloudfront.AllowedMethods,
+            ) -> cloudfront.BehaviorOptions:
+                return cloudfront.BehaviorOptions(
+                    origin=origin,
+                    cache_policy=cache_policy,
+                    # the Host header routes the request to the API Gateway
+                    # custom domain behind the distribution
+                    origin_request_policy=cloudfront.OriginRequestPolicy.ALL_VIEWER,
+                    allowed_methods=allowed_methods,
+                    viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+                    function_associations=function_associations,
+                )
+
+            hit_rate_metrics = []
+            for service, domain in api_domains.items():
+                origin = origins.HttpOrigin(domain.regional_domain_name)
+                tiles = cdn_behavior(
+                    tile_cache_policy,
+                    origin,
+                    cloudfront.AllowedMethods.ALLOW_GET_HEAD_OPTIONS,
+                )
+                metadata = cdn_behavior(
+                    metadata_cache_policy, origin, cloudfront.AllowedMethods.ALLOW_ALL
+                )
+                distribution = cloudfront.Distribution(
+                    self,
+                    f"{service}-cdn",
+                    comment=f"{app_config.project} {service} API",
+                    domain_names=[domain.name],
+                    certificate=cdn_certificate,
+                    # landing pages, search registration and anything else
+                    # goes straight to the API
+                    default_behavior=cdn_behavior(
+                        cloudfront.CachePolicy.CACHING_DISABLED,
+                        origin,
+                        cloudfront.AllowedMethods.ALLOW_ALL,
+                    ),
+                    additional_behaviors={
+                        "*/tiles/*": tiles,
+                        "*/tilejson.json": tiles,
+                        "/search*": metadata,
+                        "/collections*": metadata,
+                    },
+                    # don't keep serving a missing tile once attendees have
+                    # loaded the items for it
+                    error_responses=[
+                        cloudfront.ErrorResponse(
+                            http_status=status, ttl=Duration.seconds(0)
+                        )
+                        for status in (404, 500, 502, 503, 504)
+                    ],
+                )
+                dns_targets[service] = route53.RecordTarget.from_alias(
+                    CloudFrontTarget(distribution)
+                )
+
+                # CacheHitRate is one of the additional CloudFront metrics
+                cloudfront.CfnMonitoringSubscription(
+                    self,
+                    f"{service}-cdn-metrics",
+                    distribution_id=distribution.distribution_id,
+                    monitoring_subscription=cloudfront.CfnMonitoringSubscription.MonitoringSubscriptionProperty(
+                        realtime_metrics_subscription_config=cloudfront.CfnMonitoringSubscription.RealtimeMetricsSubscriptionConfigProperty(
+                            realtime_metrics_subscription_status="Enabled"
+                        )
+                    ),
+                )
+                hit_rate_metrics.append(
+                    aws_cloudwatch.Metric(
+                        namespace="AWS/CloudFront",
+                        metric_name="CacheHitRate",
+                        dimensions_map={
+                            "DistributionId": distribution.distribution_id,
+                            "Region": "Global",
+                        },
+                        label=service,
+                        region="us-east-1",
+                        period=Duration.minutes(1),
+                    )
+                )
+
+                CfnOutput(
+                    self,
+                    f"{service.capitalize()}CdnDistributionId",
+                    value=distribution.distribution_id,
+                    description=f"CloudFront distribution of the {service} API",
+                )
+
+            cdn_dashboard = aws_cloudwatch.Dashboard(
+                self,
+                "cdn-dashboard",
+                dashboard_name=f"{app_config.project}-cdn",
+                widgets=[
+                    [
+                        aws_cloudwatch.GraphWidget(
+                            title="CDN cache hit rate (%)",
+                            left=hit_rate_metrics,
+                            left_y_axis=aws_cloudwatch.YAxisProps(min=0, max=100),
+                            width=24,
+                        )
+                    ]
+                ],
+            )
+
+            CfnOutput(
+                self,
+                "CdnHitRateDashboardUrl",
+                value=(
+                    f"https://{self.region}.console.aws.amazon.com/cloudwatch/home"
+                    f"?region={self.region}#dashboards:name="
+                    f"{cdn_dashboard.dashboard_name}"
+                ),
+                description="CloudWatch dashboard with the CDN cache hit rate",
+            )
 
         #######################################################################
         # DNS Records for API custom domains
@@ -263,12 +790,7 @@ class eoAPIStack(Stack):
             "StacDnsRecord",
             zone=hosted_zone,
             record_name=f"{app_config.project}-stac",
-            target=route53.RecordTarget.from_alias(
-                ApiGatewayv2DomainProperties(
-                    stac_domain.regional_domain_name,
-                    stac_domain.regional_hosted_zone_id,
-                )
-            ),
+            target=dns_targets["stac"],
         )
 
         route53.ARecord(
@@ -276,12 +798,7 @@ class eoAPIStack(Stack):
             "RasterDnsRecord",
             zone=hosted_zone,
             record_name=f"{app_config.project}-raster",
-            target=route53.RecordTarget.from_alias(
-                ApiGatewayv2DomainProperties(
-                    raster_domain.regional_domain_name,
-                    raster_domain.regional_hosted_zone_id,
-                )
-            ),
+            target=dns_targets["raster"],
         )
 
         route53.ARecord(
@@ -289,16 +806,32 @@ class eoAPIStack(Stack):
             "VectorDnsRecord",
             zone=hosted_zone,
             record_name=f"{app_config.project}-vector",
-            target=route53.RecordTarget.from_alias(
-                ApiGatewayv2DomainProperties(
-                    vector_domain.regional_domain_name,
-                    vector_domain.regional_hosted_zone_id,
-                )
-            ),
+            target=dns_targets["vector"],
         )
 
         #######################################################################
         # Workshop Config Lambda - provides credentials and endpoints to workshop users
+        # with add_pgbouncer=True the connection target is the PgBouncer
+        # instance; hand notebooks that endpoint explicitly (it is the same
+        # address eoapi-cdk writes into the pgbouncer secret)
+        pgbouncer_instance = pgstac_db.connection_target
+        pool_environment = {
+            "PGBOUNCER_HOST": (
+                pgbouncer_instance.instance_public_ip
+                if app_config.public_db_subnet
+                else pgbouncer_instance.instance_private_ip
+            ),
+            "PGBOUNCER_PORT": "5432",
+            # eoapi-cdk configures PgBouncer with transaction pooling
+            "PGBOUNCER_POOL_MODE": "transaction",
+            "CLIENT_MAX_CONNECTIONS": str(app_config.notebook_db_max_conn_size),
+            # notebooks write, so they get the primary; the replicas are
+            # listed for read-only sessions
+            "READER_HOSTS": ",".join(
+                replica.db_instance_endpoint_address for replica in replicas
+            ),
+        }
+
         workshop_config_lambda = aws_lambda.Function(
             self,
             "workshop-config",
@@ -314,6 +847,12 @@ class eoAPIStack(Stack):
                 "STAC_API_ENDPOINT": app_config.build_service_url("stac"),
                 "TITILER_PGSTAC_API_ENDPOINT": app_config.build_service_url("raster"),
                 "TIPG_API_ENDPOINT": app_config.build_service_url("vector"),
+                # keep the secret in memory between invocations so the login
+                # burst at the start of a workshop doesn't hit Secrets Manager
+                "SECRET_CACHE_TTL_SECONDS": str(app_config.config_secret_cache_ttl),
+                "METRICS_NAMESPACE": WORKSHOP_METRICS_NAMESPACE,
+                "METRICS_SERVICE": app_config.build_service_name("config"),
+                **pool_environment,
             },
         )
 
@@ -356,6 +895,112 @@ class eoAPIStack(Stack):
             ),
         )
 
+        #######################################################################
+        # Workshop config monitoring, from the embedded metric format records
+        # the Lambda writes (see lambda/metrics.py)
+        def config_metric(
+            name: str, statistic: str, label: str | None = None
+        ) -> aws_cloudwatch.Metric:
+            return aws_cloudwatch.Metric(
+                namespace=WORKSHOP_METRICS_NAMESPACE,
+                metric_name=name,
+                dimensions_map={"Service": app_config.build_service_name("config")},
+                statistic=statistic,
+                label=label or f"{name} {statistic}",
+                period=Duration.minutes(1),
+            )
+
+        config_latency_p99 = config_metric("Latency", "p99")
+        config_throttles = workshop_config_lambda.metric_throttles(
+            period=Duration.minutes(1), statistic="Sum"
+        )
+
+        aws_cloudwatch.Alarm(
+            self,
+            "workshop-config-latency-alarm",
+            alarm_description=(
+                "p99 latency of the workshop config endpoint is above "
+                f"{app_config.config_latency_alarm_ms} ms"
+            ),
+            metric=config_latency_p99,
+            threshold=app_config.config_latency_alarm_ms,
+            evaluation_periods=3,
+            datapoints_to_alarm=2,
+            comparison_operator=aws_cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+            treat_missing_data=aws_cloudwatch.TreatMissingData.NOT_BREACHING,
+        )
+        aws_cloudwatch.Alarm(
+            self,
+            "workshop-config-throttles-alarm",
+            alarm_description="The workshop config Lambda is being throttled",
+            metric=config_throttles,
+            threshold=1,
+            evaluation_periods=1,
+            comparison_operator=aws_cloudwatch.ComparisonOperator.GREATER_THAN_OR_EQUAL_TO_THRESHOLD,
+            treat_missing_data=aws_cloudwatch.TreatMissingData.NOT_BREACHING,
+        )
+
+        config_dashboard = aws_cloudwatch.Dashboard(
+            self,
+            "workshop-config-dashboard",
+            dashboard_name=f"{app_config.project}-workshop-config",
+            widgets=[
+                [
+                    aws_cloudwatch.GraphWidget(
+                        title="Latency (ms)",
+                        left=[
+                            config_metric("Latency", "p50"),
+                            config_latency_p99,
+                            config_metric("Latency", "Maximum", "Latency max"),
+                        ],
+                        width=12,
+                    ),
+                    aws_cloudwatch.GraphWidget(
+                        title="Handler steps p99 (ms)",
+                        left=[
+                            config_metric("AuthCheck", "p99"),
+                            config_metric("SecretFetch", "p99"),
+                            config_metric("Serialization", "p99"),
+                            config_metric("InitDuration", "p99"),
+                        ],
+                        width=12,
+                    ),
+                ],
+                [
+                    aws_cloudwatch.GraphWidget(
+                        title="Requests",
+                        left=[
+                            workshop_config_lambda.metric_invocations(
+                                period=Duration.minutes(1), statistic="Sum"
+                            ),
+                            config_metric("ColdStart", "Sum", "Cold starts"),
+                            config_metric("AuthFailure", "Sum", "Auth failures"),
+                            config_metric("Error", "Sum", "Errors"),
+                            config_throttles,
+                        ],
+                        width=12,
+                    ),
+                    aws_cloudwatch.GraphWidget(
+                        title="Secret cache hit rate",
+                        left=[config_metric("SecretCacheHit", "Average", "Hit rate")],
+                        left_y_axis=aws_cloudwatch.YAxisProps(min=0, max=1),
+                        width=12,
+                    ),
+                ],
+            ],
+        )
+
+        CfnOutput(
+            self,
+            "WorkshopConfigDashboardUrl",
+            value=(
+                f"https://{self.region}.console.aws.amazon.com/cloudwatch/home"
+                f"?region={self.region}#dashboards:name="
+                f"{config_dashboard.dashboard_name}"
+            ),
+            description="CloudWatch dashboard of the workshop config endpoint",
+        )
+
         CfnOutput(
             self,
             "WorkshopConfigUrl",
@@ -0,0 +1,425 @@
+"""
+Capacity planning for a workshop deployment.
+
+Sizes the database and the API Lambdas from the number of attendees the
+stack has to serve, using a simple concurrency model:
+
+- at peak, `peak_activity` of the attendees have a request in flight
+- a STAC search is one request, while a map view in the raster or vector
+  notebooks loads `SERVICE_FANOUT` tiles in parallel
+- each Lambda execution environment serves one request at a time and holds a
+  DB pool of `pool_size` connections, so a service can open at most
+  `reserved_concurrency * pool_size` connections
+
+The peak load sizes the database. Each service reserves `RESERVED_HEADROOM`
+times its peak concurrency, and at least `MIN_RESERVED_CONCURRENCY`
+executions, so bursts above the average peak aren't throttled; the rest of
+the account's concurrency stays unreserved for the config Lambda, the custom
+resources and anything else in the account.
+
+Every client connection goes through PgBouncer, which multiplexes them onto a
+small pool of Postgres backends. The plan is checked against both limits:
+PgBouncer's `max_client_conn` and the instance's `max_connections`.
+
+With read replicas, the STAC API and the raster tiles connect straight to a
+replica, and a second raster function on the primary registers searches. The
+connections of the reading services then count against the `max_connections`
+of their replica instead of PgBouncer.
+
+Print the plan for the current configuration with:
+    python infrastructure/capacity.py
+"""
+
+import math
+from dataclasses import dataclass
+
+# memory (MiB) and vCPUs of the RDS instance classes that can be configured
+INSTANCE_SIZES = {
+    "t3.micro": (1024, 2),
+    "t3.small": (2048, 2),
+    "t3.medium": (4096, 2),
+    "t3.large": (8192, 2),
+    "t3.xlarge": (16384, 4),
+    "t3.2xlarge": (32768, 8),
+    "t4g.micro": (1024, 2),
+    "t4g.small": (2048, 2),
+    "t4g.medium": (4096, 2),
+    "t4g.large": (8192, 2),
+    "t4g.xlarge": (16384, 4),
+    "t4g.2xlarge": (32768, 8),
+    "m6g.large": (8192, 2),
+    "m6g.xlarge": (16384, 4),
+    "m6g.2xlarge": (32768, 8),
+    "m6g.4xlarge": (65536, 16),
+    "r6g.large": (16384, 2),
+    "r6g.xlarge": (32768, 4),
+    "r6g.2xlarge": (65536, 8),
+}
+
+# instance classes the planner picks from, smallest first
+PLANNER_INSTANCE_CLASSES = (
+    "t4g.micro",
+    "t4g.small",
+    "t4g.medium",
+    "t4g.large",
+    "t4g.xlarge",
+    "t4g.2xlarge",
+    "m6g.4xlarge",
+)
+
+SERVICES = ("stac", "raster", "vector")
+
+# the raster function on the primary that registers searches, next to the
+# one reading tiles from a replica
+RASTER_WRITER = "raster-writer"
+
+# services that read from a replica, in the order app.py assigns them
+REPLICA_SERVICES = ("stac", "raster")
+
+# parallel requests per active attendee
+SERVICE_FANOUT = {"stac": 1, "raster": 6, "vector": 6, RASTER_WRITER: 1}
+
+# share of a request's time spent waiting on the database; raster tiles mostly
+# read COGs from S3
+SERVICE_DB_SHARE = {"stac": 0.5, "raster": 0.1, "vector": 0.3, RASTER_WRITER: 0.5}
+
+# DB connections each Lambda execution environment keeps (DB_MIN_CONN_SIZE,
+# DB_MAX_CONN_SIZE); one request at a time needs one connection
+SERVICE_POOL = {
+    "stac": (0, 1),
+    "raster": (1, 1),
+    "vector": (1, 1),
+    RASTER_WRITER: (1, 1),
+}
+
+# short pgstac queries that one vCPU keeps up with
+QUERIES_PER_VCPU = 8
+
+# PgBouncer settings of eoapi-cdk's PgStacDatabase
+PGBOUNCER_MAX_CLIENT_CONN = 1000
+PGBOUNCER_SERVER_POOL = 20 + 5  # default_pool_size + reserve_pool_size
+
+# connections kept free on the instance: RDS superuser slots, the pgstac
+# bootstrapper and instructor sessions
+RESERVED_CONNECTIONS = 10
+
+# Lambda keeps this much of the account concurrency unreserved
+UNRESERVED_LAMBDA_CONCURRENCY = 100
+
+# reserved executions per execution at peak, for bursts above the average
+RESERVED_HEADROOM = 2.0
+
+# reserved executions of a service, however small the workshop
+MIN_RESERVED_CONCURRENCY = 10
+
+BASE_MEMORY_MIB = 1024
+MEMORY_PER_ATTENDEE_MIB = 16
+
+# each attendee loads a collection of Sentinel-2 items in 02-database.ipynb
+BASE_STORAGE_GB = 5
+ITEMS_PER_ATTENDEE = 2000
+ITEM_SIZE_KB = 8
+INDEX_OVERHEAD = 2.0
+
+
+class CapacityError(ValueError):
+    """Raised when a deployment can't serve the expected attendees."""
+
+
+def replica_index(service: str, read_replicas: int) -> int | None:
+    """Replica `service` reads from, or None if it goes through PgBouncer."""
+    if not read_replicas or service not in REPLICA_SERVICES:
+        return None
+    return REPLICA_SERVICES.index(service) % read_replicas
+
+
+def max_connections(instance_type: str) -> int:
+    """Postgres `max_connections` that eoapi-cdk configures for an instance."""
+    if instance_type not in INSTANCE_SIZES:
+        raise CapacityError(
+            f"Unknown instance type {instance_type}, expected one of "
+            f"{', '.join(INSTANCE_SIZES)}"
+        )
+    memory_mib, _ = INSTANCE_SIZES[instance_type]
+    # https://docs.aws.amazon.com/AmazonRDS/latest/UserGuide/CHAP_Limits.html#RDS_Limits.MaxConnections
+    return min(round(memory_mib * 1024 * 1024 / 9531392), 5000)
+
+
+@dataclass(frozen=True)
+class ServicePlan:
+    """Lambda concurrency and DB pool of one API service."""
+
+    name: str
+    peak_concurrency: int
+    reserved_concurrency: int
+    min_pool_size: int
+    pool_size: int
+
+    @property
+    def max_connections(self) -> int:
+        return self.reserved_concurrency * self.pool_size
+
+    @property
+    def api_env(self) -> dict[str, str]:
+        return {
+            "DB_MIN_CONN_SIZE": str(self.min_pool_size),
+            "DB_MAX_CONN_SIZE": str(self.pool_size),
+        }
+
+
+@dataclass(frozen=True)
+class CapacityPlan:
+    """Sizing of a deployment for an expected number of attendees."""
+
+    attendees: int
+    peak_activity: float
+    db_instance_type: str
+    db_allocated_storage: int
+    services: dict[str, ServicePlan]
+    notebook_connections: int
+    lambda_account_concurrency: int
+    read_replicas: int = 0
+    replica_instance_type: str = ""
+
+    @property
+    def client_connections(self) -> int:
+        """Connections that can be opened to PgBouncer at the same time."""
+        return (
+            sum(
+                service.max_connections
+                for name, service in self.services.items()
+                if replica_index(name, self.read_replicas) is None
+            )
+            + self.notebook_connections
+            + RESERVED_CONNECTIONS
+        )
+
+    @property
+    def replica_connections(self) -> list[int]:
+        """Connections that can be opened to each read replica at the same time."""
+        connections = [RESERVED_CONNECTIONS] * self.read_replicas
+        for name, service in self.services.items():
+            index = replica_index(name, self.read_replicas)
+            if index is not None:
+                connections[index] += service.max_connections
+        return connections
+
+    @property
+    def replica_max_connections(self) -> int:
+        return max_connections(self.replica_instance_type or self.db_instance_type)
+
+    @property
+    def server_connections(self) -> int:
+        """
+        Postgres backends PgBouncer and the reserved sessions can open.
+
+        PgBouncer's server pool doesn't grow with the attendees, and it fits
+        the `max_connections` of every instance class in `INSTANCE_SIZES`; it
+        is only checked in case the pool is raised.
+        """
+        return PGBOUNCER_SERVER_POOL + RESERVED_CONNECTIONS
+
+    @property
+    def max_connections(self) -> int:
+        return max_connections(self.db_instance_type)
+
+    @property
+    def reserved_concurrency(self) -> int:
+        return sum(service.reserved_concurrency for service in self.services.values())
+
+    @property
+    def db_load(self) -> float:
+        return peak_db_load(self.services)
+
+    def problems(self) -> list[str]:
+        """Limits that the planned deployment exceeds."""
+        memory_mib, vcpus = INSTANCE_SIZES[self.db_instance_type]
+        problems = []
+        if self.client_connections > PGBOUNCER_MAX_CLIENT_CONN:
+            problems.append(
+                f"{self.client_connections} client connections exceed PgBouncer's "
+                f"max_client_conn of {PGBOUNCER_MAX_CLIENT_CONN}; lower "
+                "expected_attendees, peak_activity or notebook_db_max_conn_size"
+            )
+        for index, connections in enumerate(self.replica_connections):
+            if connections > self.replica_max_connections:
+                problems.append(
+                    f"{connections} connections to read replica {index} exceed "
+                    f"its max_connections of {self.replica_max_connections}; use a "
+                    "larger db_replica_instance_type or more db_read_replicas"
+                )
+        if self.server_connections > self.max_connections:
+            problems.append(
+                f"{self.server_connections} database connections exceed "
+                f"max_connections of {self.max_connections} on "
+                f"{self.db_instance_type}; use a larger db_instance_type"
+            )
+        if math.ceil(self.db_load / QUERIES_PER_VCPU) > vcpus:
+            problems.append(
+                f"{self.db_load:.0f} concurrent queries need more than the "
+                f"{vcpus} vCPUs of {self.db_instance_type}; use a larger "
+                "db_instance_type"
+            )
+        if self.db_allocated_storage < required_storage(self.attendees):
+            problems.append(
+                f"{self.attendees} attendees need at least "
+                f"{required_storage(self.attendees)} GB of storage; raise "
+                "db_allocated_storage"
+            )
+        if required_memory(self.attendees) > memory_mib:
+            problems.append(
+                f"{self.attendees} attendees need more than the {memory_mib} MiB "
+                f"of {self.db_instance_type}; use a larger db_instance_type"
+            )
+        available = self.lambda_account_concurrency - UNRESERVED_LAMBDA_CONCURRENCY
+        if self.reserved_concurrency > available:
+            problems.append(
+                f"{self.reserved_concurrency} reserved Lambda executions exceed the "
+                f"{available} available in the account; request a higher "
+                "concurrency quota and set lambda_account_concurrency"
+            )
+        return problems
+
+    def report(self) -> str:
+        memory_mib, vcpus = INSTANCE_SIZES[self.db_instance_type]
+        lines = [
+            f"Capacity plan for {self.attendees} attendees "
+            f"({self.peak_activity:.0%} active at peak)",
+            f"  database: {self.db_instance_type} ({vcpus} vCPUs, {memory_mib} MiB), "
+            f"{self.db_allocated_storage} GB, max_connections {self.max_connections}",
+        ]
+        for name, service in self.services.items():
+            index = replica_index(name, self.read_replicas)
+            lines.append(
+                f"  {name + ':':<14} {service.reserved_concurrency} reserved "
+                f"executions (peak {service.peak_concurrency}) x "
+                f"{service.pool_size} connections = {service.max_connections}"
+                + (f" on replica {index}" if index is not None else "")
+            )
+        lines += [
+            f"  notebooks: {self.notebook_connections} connections",
+            f"  PgBouncer clients: {self.client_connections} / "
+            f"{PGBOUNCER_MAX_CLIENT_CONN}",
+        ]
+        lines += [
+            f"  replica {index} connections: {connections} / "
+            f"{self.replica_max_connections}"
+            for index, connections in enumerate(self.replica_connections)
+        ]
+        lines += [
+            f"  Postgres backends: {self.server_connections} / {self.max_connections}",
+            f"  peak queries: {self.db_load:.1f} "
+            f"({QUERIES_PER_VCPU} per vCPU, {vcpus} vCPUs)",
+        ]
+        problems = self.problems()
+        if problems:
+            lines.append("Problems:")
+            lines += [f"  - {problem}" for problem in problems]
+        return "\n".join(lines)
+
+    def check(self):
+        """Raise a `CapacityError` with the sizing report if a limit is exceeded."""
+        if self.problems():
+            raise CapacityError(self.report())
+
+
+def required_memory(attendees: int) -> int:
+    return BASE_MEMORY_MIB + MEMORY_PER_ATTENDEE_MIB * attendees
+
+
+def required_storage(attendees: int) -> int:
+    data_gb = attendees * ITEMS_PER_ATTENDEE * ITEM_SIZE_KB / 1024**2
+    return math.ceil(BASE_STORAGE_GB + data_gb * INDEX_OVERHEAD)
+
+
+def peak_db_load(services: dict[str, ServicePlan]) -> float:
+    """Queries running on Postgres at peak; PgBouncer queues the rest."""
+    load = sum(
+        service.peak_concurrency * SERVICE_DB_SHARE[name]
+        for name, service in services.items()
+    )
+    return min(load, PGBOUNCER_SERVER_POOL)
+
+
+def select_instance_type(attendees: int, services: dict[str, ServicePlan]) -> str:
+    """Smallest instance class that fits the load of `attendees`."""
+    load = peak_db_load(services)
+    for instance_type in PLANNER_INSTANCE_CLASSES:
+        memory_mib, vcpus = INSTANCE_SIZES[instance_type]
+        if (
+            math.ceil(load / QUERIES_PER_VCPU) <= vcpus
+            and required_memory(attendees) <= memory_mib
+            and PGBOUNCER_SERVER_POOL + RESERVED_CONNECTIONS
+            <= max_connections(instance_type)
+        ):
+            return instance_type
+    return PLANNER_INSTANCE_CLASSES[-1]
+
+
+def plan_services(
+    attendees: int, peak_activity: float, read_replicas: int = 0
+) -> dict[str, ServicePlan]:
+    """Peak and reserved concurrency of the services."""
+    active = math.ceil(attendees * peak_activity)
+    names = SERVICES + ((RASTER_WRITER,) if read_replicas else ())
+    services = {}
+    for name in names:
+        peak = max(active * SERVICE_FANOUT[name], 1)
+        services[name] = ServicePlan(
+            name=name,
+            peak_concurrency=peak,
+            reserved_concurrency=max(
+                math.ceil(peak * RESERVED_HEADROOM), MIN_RESERVED_CONCURRENCY
+            ),
+            min_pool_size=SERVICE_POOL[name][0],
+            pool_size=SERVICE_POOL[name][1],
+        )
+    return services
+
+
+def plan_capacity(
+    attendees: int,
+    peak_activity: float = 0.1,
+    notebook_db_max_conn_size: int = 1,
+    db_instance_type: str | None = None,
+    db_allocated_storage: int | None = None,
+    lambda_account_concurrency: int = 1000,
+    read_replicas: int = 0,
+    replica_instance_type: str | None = None,
+) -> CapacityPlan:
+    """
+    Size a deployment for `attendees`.
+
+    Args:
+        attendees: Number of attendees working through the notebooks.
+        peak_activity: Fraction of attendees with a request in flight at peak.
+        notebook_db_max_conn_size: DB connections each notebook kernel opens.
+        db_instance_type: Instance class to check instead of picking one.
+        db_allocated_storage: Storage (GB) to check instead of deriving it.
+        lambda_account_concurrency: Lambda concurrency quota of the account.
+        read_replicas: Number of read replicas of the database.
+        replica_instance_type: Instance class of the replicas, if not the
+            primary's.
+
+    Returns:
+        CapacityPlan: The plan; call `check()` to validate it
+    """
+    services = plan_services(attendees, peak_activity, read_replicas)
+    return CapacityPlan(
+        attendees=attendees,
+        peak_activity=peak_activity,
+        db_instance_type=db_instance_type or select_instance_type(attendees, services),
+        db_allocated_storage=db_allocated_storage or required_storage(attendees),
+        services=services,
+        notebook_connections=attendees * notebook_db_max_conn_size,
+        lambda_account_concurrency=lambda_account_concurrency,
+        read_replicas=read_replicas,
+        replica_instance_type=replica_instance_type or "",
+    )
+
+
+if __name__ == "__main__":
+    from config import AppConfig
+
+    plan = AppConfig().capacity_plan()
+    print(plan.report() if plan else "expected_attendees is not set")
@@ -1,5 +1,6 @@
 import secrets
 
+from capacity import CapacityPlan, plan_capacity
 from pydantic import Field, field_validator
 from pydantic_settings import (
     BaseSettings,
@@ -39,6 +40,23 @@ class AppConfig(BaseSettings):
 
     pgstac_version: str = Field(description="pgstac version", default="0.9.8")
 
+    expected_attendees: int = Field(
+        description=(
+            "Number of attendees to size the deployment for. If set, the "
+            "database, DB pools and Lambda reserved concurrency are derived from "
+            "it and synth fails when they can't serve the attendees."
+        ),
+        default=0,
+    )
+    peak_activity: float = Field(
+        description="Fraction of attendees with a request in flight at peak",
+        default=0.1,
+    )
+    lambda_account_concurrency: int = Field(
+        description="Lambda concurrent executions quota of the AWS account",
+        default=1000,
+    )
+
     db_instance_type: str = Field(
         description="Database instance type", default="t4g.small"
     )
@@ -48,11 +66,91 @@ class AppConfig(BaseSettings):
     public_db_subnet: bool = Field(
         description="Whether to put the database in a public subnet", default=True
     )
+    notebook_db_max_conn_size: int = Field(
+        description="Maximum connections in the pool of each notebook PgstacDB",
+        default=1,
+    )
+    pgstac_tuning: bool = Field(
+        description=(
+            "Apply pgstac_tuning/tuning.sql (queryables, search settings and "
+            "indexes for the notebook searches) after the pgstac bootstrap"
+        ),
+        default=True,
+    )
+    db_read_replicas: int = Field(
+        description=(
+            "Number of read replicas of the database. The STAC API and the raster "
+            "API tiles read from them; notebooks, search registration and the "
+            "vector API use the primary."
+        ),
+        default=0,
+    )
+    db_replica_instance_type: str = Field(
+        description="Instance type of the read replicas. Defaults to the primary's.",
+        default="",
+    )
+
+    raster_api_env: dict[str, str] = Field(
+        description=(
+            "Extra environment of the raster API, e.g. the GDAL and "
+            "MOSAIC_CONCURRENCY settings scripts/tiler_autotune.py recommends"
+        ),
+        default_factory=dict,
+    )
+
+    collection_ttl_days: float = Field(
+        description=(
+            "Days without changes after which an attendee collection, and its "
+            "items partitions, is purged by a scheduled job. 0 disables the job."
+        ),
+        default=30,
+    )
+    collection_ttl_pattern: str = Field(
+        description="LIKE pattern of the collection ids the purge expires",
+        default="%-sentinel-2-c1-l2a",
+    )
+    collection_ttl_keyword: str = Field(
+        description="Collections with this keyword are expired by the purge too",
+        default="eoapi-workshop-attendee",
+    )
+    collection_purge_schedule: str = Field(
+        description="EventBridge schedule expression of the collection purge",
+        default="cron(0 6 * * ? *)",
+    )
+
+    cdn_enabled: bool = Field(
+        description=(
+            "Put a CloudFront distribution in front of the STAC, raster and "
+            "vector APIs that caches tiles and metadata"
+        ),
+        default=False,
+    )
+    cdn_certificate_arn: str = Field(
+        description=(
+            "ARN of an ACM certificate in us-east-1 for the CDN custom domains. "
+            "Defaults to certificate_arn."
+        ),
+        default="",
+    )
+    cdn_tile_ttl: int = Field(
+        description="Seconds the CDN caches tiles and tilejson", default=86400
+    )
+    cdn_metadata_ttl: int = Field(
+        description="Seconds the CDN caches GET searches and collections", default=60
+    )
 
     workshop_token: str = Field(
         description="Bearer token for workshop config Lambda. Auto-generated if not provided.",
         default="",
     )
+    config_secret_cache_ttl: int = Field(
+        description="Seconds the workshop config Lambda caches the pgstac secret",
+        default=300,
+    )
+    config_latency_alarm_ms: int = Field(
+        description="p99 latency (ms) of the workshop config Lambda that raises an alarm",
+        default=1000,
+    )
 
     model_config = SettingsConfigDict(
         env_file=".env", yaml_file="config.yaml", extra="allow"
@@ -63,6 +161,35 @@ class AppConfig(BaseSettings):
         """Generate a random workshop token if not provided."""
         return v or secrets.token_urlsafe(32)
 
+    def capacity_plan(self) -> CapacityPlan | None:
+        """
+        Size the deployment for `expected_attendees`.
+
+        An explicitly configured `db_instance_type` or `db_allocated_storage` is
+        checked instead of derived.
+        """
+        if not self.expected_attendees:
+            return None
+
+        return plan_capacity(
+            self.expected_attendees,
+            peak_activity=self.peak_activity,
+            notebook_db_max_conn_size=self.notebook_db_max_conn_size,
+            db_instance_type=(
+                self.db_instance_type
+                if "db_instance_type" in self.model_fields_set
+                else None
+            ),
+            db_allocated_storage=(
+                self.db_allocated_storage
+                if "db_allocated_storage" in self.model_fields_set
+                else None
+            ),
+            lambda_account_concurrency=self.lambda_account_concurrency,
+            read_replicas=self.db_read_replicas,
+            replica_instance_type=self.db_replica_instance_type or None,
+        )
+
     def build_service_name(self, service_id: str) -> str:
         return f"{self.project}-{service_id}"
 
@@ -0,0 +1,105 @@
+"""
+CloudWatch embedded metric format (EMF) records for the workshop Lambdas.
+
+Usage:
+    metrics = Metrics("EoapiWorkshop", {"Service": "workshop-config"})
+    with metrics.timer("SecretFetch"):
+        ...
+    metrics.put("ColdStart", 1)
+    metrics.flush()
+
+A `Metrics` object collects the values of one invocation and `flush` hands a
+single EMF record to its sink. On Lambda the default sink prints the record
+as a JSON line, and CloudWatch Logs extracts the metrics from it. Set
+`METRICS_SINK=off` to discard records, or pass any callable (e.g.
+`list.append`) as the sink to inspect them in tests.
+"""
+
+import json
+import os
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+
+
+def stdout_sink(record: dict):
+    print(json.dumps(record))
+
+
+def discard_sink(record: dict):
+    pass
+
+
+SINKS = {"stdout": stdout_sink, "off": discard_sink}
+
+
+def default_sink() -> Callable[[dict], None]:
+    """The sink named by `METRICS_SINK` ("stdout" or "off")."""
+    name = os.environ.get("METRICS_SINK", "stdout")
+    if name not in SINKS:
+        raise ValueError(f"METRICS_SINK must be one of {list(SINKS)}, not {name}")
+    return SINKS[name]
+
+
+class Metrics:
+    """Metrics and properties of one invocation, emitted as one EMF record."""
+
+    def __init__(
+        self,
+        namespace: str,
+        dimensions: dict[str, str] | None = None,
+        sink: Callable[[dict], None] | None = None,
+        clock=time.perf_counter,
+    ):
+        self.namespace = namespace
+        self.dimensions = dimensions or {}
+        self.sink = sink or default_sink()
+        self.clock = clock
+        self.values: dict[str, float] = {}
+        self.units: dict[str, str] = {}
+        self.properties: dict = {}
+
+    def put(self, name: str, value: float, unit: str = "Count"):
+        self.values[name] = value
+        self.units[name] = unit
+
+    def set_property(self, name: str, value):
+        """Add a value to the record that is searchable but not a metric."""
+        self.properties[name] = value
+
+    @contextmanager
+    def timer(self, name: str):
+        """Record the duration of the block as `name`, in milliseconds."""
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.put(name, round((self.clock() - start) * 1000, 3), "Milliseconds")
+
+    def to_emf(self) -> dict:
+        return {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": self.namespace,
+                        "Dimensions": [list(self.dimensions)],
+                        "Metrics": [
+                            {"Name": name, "Unit": self.units[name]}
+                            for name in self.values
+                        ],
+                    }
+                ],
+            },
+            **self.dimensions,
+            **self.properties,
+            **self.values,
+        }
+
+    def flush(self):
+        """Emit the collected values and start over."""
+        if self.values:
+            self.sink(self.to_emf())
+        self.values = {}
+        self.units = {}
+        self.properties = {}
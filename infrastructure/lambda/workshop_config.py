@@ -4,14 +4,32 @@ and API endpoints.
 
 This function:
 1. Validates bearer token authorization
-2. Fetches database credentials from AWS Secrets Manager
-3. Returns all environment variables needed for workshop notebooks
+2. Fetches database credentials from AWS Secrets Manager (cached in-process)
+3. Returns all environment variables needed for workshop notebooks, pointing
+   the database connection at PgBouncer when it is deployed
+
+The secret is cached for SECRET_CACHE_TTL_SECONDS together with the serialized
+response body, so warm invocations do not call Secrets Manager. When the TTL
+expires the secret is re-read and the body is only rebuilt if the secret
+version changed (e.g. after a rotation). Clients that get an authentication
+failure from the database can call the endpoint with `?refresh=true` to force
+a refresh (limited to once every SECRET_MIN_REFRESH_SECONDS).
+
+Every invocation emits one CloudWatch embedded metric format record (see
+`metrics.py`) with the handler latency, the auth check, secret fetch and
+serialization timers, the module init time and a cold start flag. Set
+METRICS_SINK=off to discard the records when running locally.
 """
 
 import json
 import os
+import time
 
-import boto3
+# module initialization, including the boto3 import, is timed as InitDuration
+INIT_STARTED = time.perf_counter()
+
+import boto3  # noqa: E402
+from metrics import Metrics, discard_sink  # noqa: E402
 
 # Initialize AWS clients
 secrets_client = boto3.client("secretsmanager")
@@ -23,79 +41,220 @@ STAC_API_ENDPOINT = os.environ.get("STAC_API_ENDPOINT", "")
 TITILER_PGSTAC_API_ENDPOINT = os.environ.get("TITILER_PGSTAC_API_ENDPOINT", "")
 TIPG_API_ENDPOINT = os.environ.get("TIPG_API_ENDPOINT", "")
 
+# PgBouncer endpoint and connection hints for notebook clients
+PGBOUNCER_HOST = os.environ.get("PGBOUNCER_HOST", "")
+PGBOUNCER_PORT = os.environ.get("PGBOUNCER_PORT", "5432")
+PGBOUNCER_POOL_MODE = os.environ.get("PGBOUNCER_POOL_MODE", "")
+CLIENT_MAX_CONNECTIONS = os.environ.get("CLIENT_MAX_CONNECTIONS", "1")
+# read replicas, for sessions that only read
+READER_HOSTS = [host for host in os.environ.get("READER_HOSTS", "").split(",") if host]
 
-def handler(event, context):
+SECRET_CACHE_TTL_SECONDS = float(os.environ.get("SECRET_CACHE_TTL_SECONDS", "300"))
+SECRET_MIN_REFRESH_SECONDS = float(os.environ.get("SECRET_MIN_REFRESH_SECONDS", "10"))
+
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "EoapiWorkshop")
+METRICS_SERVICE = os.environ.get("METRICS_SERVICE", "workshop-config")
+
+RESPONSE_HEADERS = {
+    "Content-Type": "application/json",
+    "Access-Control-Allow-Origin": "*",
+}
+
+
+def build_response(status_code: int, body: str) -> dict:
+    """Build an API Gateway proxy response from an already serialized body."""
+    return {
+        "statusCode": status_code,
+        "headers": RESPONSE_HEADERS,
+        "body": body,
+    }
+
+
+MISSING_AUTH_RESPONSE = build_response(
+    401, json.dumps({"error": "Missing or invalid Authorization header"})
+)
+INVALID_TOKEN_RESPONSE = build_response(401, json.dumps({"error": "Invalid token"}))
+FAILURE_RESPONSE = build_response(
+    500, json.dumps({"error": "Failed to retrieve configuration"})
+)
+
+
+def build_config(secret_data: dict) -> dict:
     """
-    Lambda handler to return workshop configuration.
+    Build the configuration payload returned to workshop notebooks.
 
-    Expects Authorization header with Bearer token.
-    Returns JSON with database credentials and API endpoints.
+    If PGBOUNCER_HOST is set the notebooks are handed the pooled endpoint
+    instead of the host in the secret, together with client-side pool hints
+    that keep the number of server connections per kernel bounded. Notebooks
+    load and delete items, so `pghost` is always the primary; read replicas
+    are listed in `pgreader_hosts` and only accept read-only sessions with
+    `pgstac.readonly` on.
+    """
+    pooled = bool(PGBOUNCER_HOST)
+    return {
+        "pghost": PGBOUNCER_HOST if pooled else secret_data.get("host"),
+        "pgport": PGBOUNCER_PORT if pooled else str(secret_data.get("port")),
+        "pgdatabase": secret_data.get("dbname"),
+        "pguser": secret_data.get("username"),
+        "pgpassword": secret_data.get("password"),
+        "pgbouncer": pooled,
+        "pool_mode": PGBOUNCER_POOL_MODE if pooled else None,
+        "db_max_conn_size": CLIENT_MAX_CONNECTIONS,
+        "pgreader_hosts": READER_HOSTS,
+        "stac_api_endpoint": STAC_API_ENDPOINT,
+        "titiler_pgstac_api_endpoint": TITILER_PGSTAC_API_ENDPOINT,
+        "tipg_api_endpoint": TIPG_API_ENDPOINT,
+    }
+
+
+class ConfigCache:
+    """
+    In-process cache of the pgstac secret and the serialized config response.
+
+    The Secrets Manager client and clock are injectable so the cache can be
+    exercised with a stubbed boto3 client.
     """
 
-    # Extract authorization header
-    headers = event.get("headers", {})
-    # Handle case-insensitive header lookup
-    auth_header = None
+    def __init__(
+        self,
+        client,
+        secret_arn: str,
+        ttl: float = SECRET_CACHE_TTL_SECONDS,
+        min_refresh_interval: float = SECRET_MIN_REFRESH_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.client = client
+        self.secret_arn = secret_arn
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.clock = clock
+        self.version_id: str | None = None
+        self.response: dict | None = None
+        self.expires_at = 0.0
+        self.fetched_at: float | None = None
+
+    def get_response(
+        self, force_refresh: bool = False, metrics: Metrics | None = None
+    ) -> dict:
+        """
+        Return the cached 200 response, fetching the secret when required.
+
+        Args:
+            force_refresh: Re-read the secret even if the cache is still fresh,
+                e.g. because a client reported an authentication failure. Forced
+                refreshes are ignored if the secret was fetched less than
+                `min_refresh_interval` seconds ago.
+            metrics: Records whether the cache was hit and, on a miss, the
+                SecretFetch and Serialization timers.
+
+        Returns:
+            dict: API Gateway proxy response with a pre-serialized body
+        """
+        metrics = metrics or Metrics(METRICS_NAMESPACE, sink=discard_sink)
+        now = self.clock()
+        if self.response is not None:
+            fresh = now < self.expires_at
+            recently_fetched = (
+                self.fetched_at is not None
+                and now - self.fetched_at < self.min_refresh_interval
+            )
+            if (fresh and not force_refresh) or (force_refresh and recently_fetched):
+                metrics.put("SecretCacheHit", 1)
+                return self.response
+
+        metrics.put("SecretCacheHit", 0)
+        try:
+            self.refresh(now, metrics)
+        except Exception as e:
+            # serve the last known configuration rather than failing the burst,
+            # and don't retry on every invocation while Secrets Manager is down
+            if self.response is None:
+                raise
+            self.expires_at = now + self.min_refresh_interval
+            print(f"Error refreshing secret, serving cached configuration: {e}")
+        return self.response
+
+    def refresh(self, now: float, metrics: Metrics) -> None:
+        """Read the current secret version and rebuild the response if it changed."""
+        with metrics.timer("SecretFetch"):
+            secret_response = self.client.get_secret_value(SecretId=self.secret_arn)
+        version_id = secret_response.get("VersionId")
+
+        if self.response is None or version_id is None or version_id != self.version_id:
+            with metrics.timer("Serialization"):
+                secret_data = json.loads(secret_response["SecretString"])
+                self.response = build_response(
+                    200, json.dumps(build_config(secret_data))
+                )
+            self.version_id = version_id
+
+        self.fetched_at = now
+        self.expires_at = now + self.ttl
+
+
+config_cache = ConfigCache(secrets_client, PGSTAC_SECRET_ARN)
+
+INIT_DURATION_MS = (time.perf_counter() - INIT_STARTED) * 1000
+cold_start = True
+
+
+def get_authorization_header(headers: dict) -> str | None:
+    """Case-insensitive lookup of the Authorization header."""
     for key, value in headers.items():
         if key.lower() == "authorization":
-            auth_header = value
-            break
-
-    # Validate bearer token
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return {
-            "statusCode": 401,
-            "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
-            },
-            "body": json.dumps({"error": "Missing or invalid Authorization header"}),
-        }
-
-    token = auth_header.replace("Bearer ", "")
-    if token != WORKSHOP_TOKEN:
-        return {
-            "statusCode": 401,
-            "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
-            },
-            "body": json.dumps({"error": "Invalid token"}),
-        }
+            return value
+    return None
+
+
+def wants_refresh(event: dict) -> bool:
+    """Whether the client asked for the credentials to be re-read."""
+    params = event.get("queryStringParameters") or {}
+    return str(params.get("refresh", "")).lower() in ("1", "true", "yes")
+
+
+def respond(event: dict, metrics: Metrics) -> dict:
+    """Check the bearer token and return the configuration response."""
+    with metrics.timer("AuthCheck"):
+        auth_header = get_authorization_header(event.get("headers") or {})
+        if not auth_header or not auth_header.startswith("Bearer "):
+            return MISSING_AUTH_RESPONSE
+
+        token = auth_header.replace("Bearer ", "")
+        if token != WORKSHOP_TOKEN:
+            return INVALID_TOKEN_RESPONSE
 
     try:
-        # Fetch database credentials from Secrets Manager
-        secret_response = secrets_client.get_secret_value(SecretId=PGSTAC_SECRET_ARN)
-        secret_data = json.loads(secret_response["SecretString"])
-
-        # Build response with all environment variables
-        config = {
-            "pghost": secret_data.get("host"),
-            "pgport": str(secret_data.get("port")),
-            "pgdatabase": secret_data.get("dbname"),
-            "pguser": secret_data.get("username"),
-            "pgpassword": secret_data.get("password"),
-            "stac_api_endpoint": STAC_API_ENDPOINT,
-            "titiler_pgstac_api_endpoint": TITILER_PGSTAC_API_ENDPOINT,
-            "tipg_api_endpoint": TIPG_API_ENDPOINT,
-        }
-
-        return {
-            "statusCode": 200,
-            "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
-            },
-            "body": json.dumps(config),
-        }
+        return config_cache.get_response(
+            force_refresh=wants_refresh(event), metrics=metrics
+        )
 
     except Exception as e:
         print(f"Error fetching configuration: {str(e)}")
-        return {
-            "statusCode": 500,
-            "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
-            },
-            "body": json.dumps({"error": "Failed to retrieve configuration"}),
-        }
+        return FAILURE_RESPONSE
+
+
+def handler(event, context):
+    """
+    Lambda handler to return workshop configuration.
+
+    Expects Authorization header with Bearer token.
+    Returns JSON with database credentials and API endpoints.
+    """
+    global cold_start
+
+    metrics = Metrics(METRICS_NAMESPACE, {"Service": METRICS_SERVICE})
+    metrics.put("ColdStart", int(cold_start))
+    if cold_start:
+        metrics.put("InitDuration", round(INIT_DURATION_MS, 3), "Milliseconds")
+        cold_start = False
+
+    with metrics.timer("Latency"):
+        response = respond(event, metrics)
+
+    status_code = response["statusCode"]
+    metrics.put("AuthFailure", int(status_code == 401))
+    metrics.put("Error", int(status_code >= 500))
+    metrics.set_property("StatusCode", status_code)
+    metrics.set_property("RequestId", getattr(context, "aws_request_id", None))
+    metrics.flush()
+    return response
@@ -0,0 +1,52 @@
+"""
+Scheduled handler that purges expired attendee collections, see `purge.py`.
+
+Runs as the database admin, directly against the RDS instance rather than
+through PgBouncer: dropping partitions, `REFRESH MATERIALIZED VIEW` and
+`VACUUM` need their own session.
+"""
+
+import json
+import os
+
+import boto3
+import psycopg
+from purge import purge, report
+
+secrets_client = boto3.client("secretsmanager")
+
+ADMIN_SECRET_ARN = os.environ["ADMIN_SECRET_ARN"]
+PGSTAC_SECRET_ARN = os.environ["PGSTAC_SECRET_ARN"]
+
+MAX_AGE_DAYS = float(os.environ["MAX_AGE_DAYS"])
+ID_PATTERN = os.environ["ID_PATTERN"]
+KEYWORD = os.environ["KEYWORD"]
+
+
+def get_secret(secret_arn: str) -> dict:
+    response = secrets_client.get_secret_value(SecretId=secret_arn)
+    return json.loads(response["SecretString"])
+
+
+def handler(event, context):
+    admin = get_secret(ADMIN_SECRET_ARN)
+    dbname = get_secret(PGSTAC_SECRET_ARN)["dbname"]
+
+    with psycopg.connect(
+        host=admin["host"],
+        port=admin["port"],
+        dbname=dbname,
+        user=admin["username"],
+        password=admin["password"],
+        connect_timeout=10,
+        autocommit=True,
+    ) as conn:
+        stats = purge(
+            conn,
+            MAX_AGE_DAYS,
+            pattern=ID_PATTERN,
+            keyword=KEYWORD,
+            dry_run=bool(event.get("dry_run")),
+        )
+    print(stats)
+    return report(stats)
@@ -0,0 +1,241 @@
+"""
+Expire attendee collections and drop their items partitions.
+
+Every attendee creates a `{username}-sentinel-2-c1-l2a` collection in
+02-database.ipynb, and every collection gets its own items partition
+(`_items_{key}`, plus monthly sub-partitions for large collections). A
+collection expires when its id matches `pattern` or it has the `keyword`
+tag, and it hasn't changed for `max_age_days`: the last time pgstac updated
+the statistics of one of its partitions, or its `updated` field for a
+collection without items.
+
+Expired collections are purged one transaction each, by deleting the
+collection row: pgstac's delete trigger then drops its partition tree, which
+frees the rows and indexes at once instead of deleting, and later vacuuming,
+the items row by row, and removes the partition statistics.
+
+The `partitions` and `partition_steps` views pgstac plans searches with are
+then refreshed, and the catalog tables vacuumed and analyzed.
+
+Usage (with the PG* environment variables of the database admin or owner):
+    python infrastructure/pgstac_purge/purge.py --max-age-days 7 --dry-run
+    python infrastructure/pgstac_purge/purge.py --max-age-days 7
+"""
+
+import argparse
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import timedelta
+
+import psycopg
+
+# Collections created in 02-database.ipynb
+DEFAULT_PATTERN = "%-sentinel-2-c1-l2a"
+DEFAULT_KEYWORD = "eoapi-workshop-attendee"
+
+# Dropping a partition locks the items table; give up on a collection rather
+# than queue the API reads behind the lock
+LOCK_TIMEOUT = "5s"
+
+EXPIRED_COLLECTIONS = """
+WITH candidates AS (
+    SELECT key, id, content
+    FROM collections
+    WHERE id LIKE %(pattern)s OR content->'keywords' ? %(keyword)s
+), ages AS (
+    SELECT
+        c.key,
+        c.id,
+        greatest(
+            (
+                SELECT max(s.last_updated)
+                FROM partition_sys_meta m
+                JOIN partition_stats s USING (partition)
+                WHERE m.collection = c.id
+            ),
+            (c.content->>'updated')::timestamptz
+        ) AS last_updated
+    FROM candidates c
+)
+SELECT key, id, last_updated FROM ages
+WHERE last_updated < now() - %(max_age)s
+ORDER BY last_updated;
+"""
+
+PARTITION_SIZE = """
+SELECT
+    (SELECT count(*) FROM items WHERE collection = %(collection)s),
+    (
+        SELECT sum(pg_total_relation_size(relid))
+        FROM pg_partition_tree(%(partition)s::regclass)
+    );
+"""
+
+
+@dataclass
+class PurgedCollection:
+    id: str
+    last_updated: str
+    rows: int = 0
+    bytes: int = 0
+
+
+@dataclass
+class PurgeStats:
+    """Collections, rows and space a purge reclaimed."""
+
+    collections: list[PurgedCollection] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+    dry_run: bool = False
+    elapsed: float = 0.0
+
+    @property
+    def rows(self) -> int:
+        return sum(collection.rows for collection in self.collections)
+
+    @property
+    def bytes(self) -> int:
+        return sum(collection.bytes for collection in self.collections)
+
+    def __str__(self) -> str:
+        verb = "would purge" if self.dry_run else "purged"
+        summary = (
+            f"{verb} {len(self.collections)} collections, {self.rows} items "
+            f"({self.bytes / 1e6:.1f} MB) in {self.elapsed:.1f}s"
+        )
+        if self.skipped:
+            summary += f"; {len(self.skipped)} locked, left for the next run"
+        return summary
+
+
+def expired_collections(
+    conn: psycopg.Connection, max_age_days: float, pattern: str, keyword: str
+) -> list[tuple[int, str, str]]:
+    """The key, id and last update of the collections to purge."""
+    rows = conn.execute(
+        EXPIRED_COLLECTIONS,
+        {
+            "pattern": pattern,
+            "keyword": keyword,
+            "max_age": timedelta(days=max_age_days),
+        },
+    ).fetchall()
+    return [(key, id, last_updated.isoformat()) for key, id, last_updated in rows]
+
+
+def measure_collection(
+    conn: psycopg.Connection, key: int, collection: PurgedCollection
+):
+    """Count the items and size of the partitions of a collection."""
+    partition = f"_items_{key}"
+    # collections without items have no partition
+    if conn.execute("SELECT to_regclass(%s);", [partition]).fetchone()[0] is None:
+        return
+    rows, size = conn.execute(
+        PARTITION_SIZE, {"collection": collection.id, "partition": partition}
+    ).fetchone()
+    collection.rows, collection.bytes = rows, int(size or 0)
+
+
+def purge_collection(conn: psycopg.Connection, key: int, collection: PurgedCollection):
+    """Drop the items partitions of a collection, then the collection."""
+    with conn.transaction():
+        conn.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}';")
+        measure_collection(conn, key, collection)
+        # the collection_delete_trigger of pgstac drops the partition tree
+        # before the foreign key would delete the items one by one
+        conn.execute("DELETE FROM collections WHERE key = %s;", [key])
+
+
+def refresh_statistics(conn: psycopg.Connection):
+    """Rebuild pgstac's partition views and the planner statistics."""
+    conn.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY partitions;")
+    conn.execute("REFRESH MATERIALIZED VIEW partition_steps;")
+    conn.execute("VACUUM (ANALYZE) collections, partition_stats;")
+    conn.execute("ANALYZE items;")
+
+
+def purge(
+    conn: psycopg.Connection,
+    max_age_days: float,
+    pattern: str = DEFAULT_PATTERN,
+    keyword: str = DEFAULT_KEYWORD,
+    dry_run: bool = False,
+) -> PurgeStats:
+    """
+    Purge the expired attendee collections.
+
+    Args:
+        conn: Autocommit connection as the database admin or pgstac owner.
+        max_age_days: Days without changes after which a collection expires.
+        pattern: `LIKE` pattern of the collection ids to expire.
+        keyword: Collections with this keyword expire too.
+        dry_run: Only report what would be purged.
+
+    Returns:
+        PurgeStats: The purged collections with their rows and size
+    """
+    conn.execute("SET search_path TO pgstac, public;")
+    stats = PurgeStats(dry_run=dry_run)
+    start = time.perf_counter()
+    for key, id, last_updated in expired_collections(
+        conn, max_age_days, pattern, keyword
+    ):
+        collection = PurgedCollection(id=id, last_updated=last_updated)
+        if dry_run:
+            measure_collection(conn, key, collection)
+        else:
+            try:
+                purge_collection(conn, key, collection)
+            except psycopg.errors.LockNotAvailable:
+                stats.skipped.append(id)
+                continue
+        stats.collections.append(collection)
+        print(
+            f"{'expired' if dry_run else 'purged'} {id} (last updated "
+            f"{last_updated}): {collection.rows} items, "
+            f"{collection.bytes / 1e6:.1f} MB"
+        )
+
+    if stats.collections and not dry_run:
+        refresh_statistics(conn)
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def report(stats: PurgeStats) -> dict:
+    """The purge as JSON, for logs and the scheduled job's result."""
+    return {
+        **asdict(stats),
+        "rows": stats.rows,
+        "bytes": stats.bytes,
+        "elapsed": round(stats.elapsed, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--dsn", default="", help="connection string; PG* variables if empty"
+    )
+    parser.add_argument("--max-age-days", type=float, default=30)
+    parser.add_argument("--pattern", default=DEFAULT_PATTERN)
+    parser.add_argument("--keyword", default=DEFAULT_KEYWORD)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--json", action="store_true", help="print a JSON report")
+    args = parser.parse_args()
+
+    with psycopg.connect(args.dsn, autocommit=True) as conn:
+        stats = purge(
+            conn,
+            args.max_age_days,
+            pattern=args.pattern,
+            keyword=args.keyword,
+            dry_run=args.dry_run,
+        )
+    print(json.dumps(report(stats), indent=2) if args.json else stats)
+
+
+if __name__ == "__main__":
+    main()
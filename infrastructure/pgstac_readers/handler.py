@@ -0,0 +1,66 @@
+"""
+Custom resource handler that creates the login role of the read replicas.
+
+Roles are replicated, so the role is created on the primary, as the database
+admin, and used on the replicas. It can only read pgstac, and its sessions run
+with `pgstac.readonly` on: pgstac searches then skip caching searches and
+their statistics, writes that a replica would reject. RDS parameter groups
+don't accept custom settings like `pgstac.readonly`, hence the role setting.
+"""
+
+import json
+import os
+
+import boto3
+import psycopg
+from psycopg import sql
+
+secrets_client = boto3.client("secretsmanager")
+
+ADMIN_SECRET_ARN = os.environ["ADMIN_SECRET_ARN"]
+PGSTAC_SECRET_ARN = os.environ["PGSTAC_SECRET_ARN"]
+READER_SECRET_ARN = os.environ["READER_SECRET_ARN"]
+
+
+def get_secret(secret_arn: str) -> dict:
+    response = secrets_client.get_secret_value(SecretId=secret_arn)
+    return json.loads(response["SecretString"])
+
+
+def create_reader_role():
+    admin = get_secret(ADMIN_SECRET_ARN)
+    reader = get_secret(READER_SECRET_ARN)
+    dbname = get_secret(PGSTAC_SECRET_ARN)["dbname"]
+    role = sql.Identifier(reader["username"])
+
+    with psycopg.connect(
+        host=admin["host"],
+        port=admin["port"],
+        dbname=dbname,
+        user=admin["username"],
+        password=admin["password"],
+        connect_timeout=10,
+        autocommit=True,
+    ) as conn:
+        exists = conn.execute(
+            "SELECT 1 FROM pg_roles WHERE rolname = %s;", [reader["username"]]
+        ).fetchone()
+        conn.execute(
+            sql.SQL("{} ROLE {} LOGIN PASSWORD {};").format(
+                sql.SQL("ALTER" if exists else "CREATE"),
+                role,
+                sql.Literal(reader["password"]),
+            )
+        )
+        conn.execute(sql.SQL("GRANT pgstac_read TO {};").format(role))
+        conn.execute(
+            sql.SQL("ALTER ROLE {} SET search_path TO pgstac, public;").format(role)
+        )
+        conn.execute(sql.SQL("ALTER ROLE {} SET pgstac.readonly TO true;").format(role))
+
+
+def handler(event, context):
+    print(f"{event['RequestType']} pgstac reader role")
+    if event["RequestType"] in ("Create", "Update"):
+        create_reader_role()
+    return {"PhysicalResourceId": "pgstac-readers"}
@@ -0,0 +1,54 @@
+"""
+Custom resource handler that applies `tuning.sql` to the pgstac database.
+
+Runs after eoapi-cdk's bootstrapper has installed pgstac, on every deploy that
+changes `tuning.sql` (the stack passes its hash as a resource property). The
+SQL is applied as the database admin, directly against the RDS instance
+rather than through PgBouncer, since repartitioning a large collection can
+take longer than a pooled transaction should.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import boto3
+import psycopg
+
+secrets_client = boto3.client("secretsmanager")
+
+ADMIN_SECRET_ARN = os.environ["ADMIN_SECRET_ARN"]
+PGSTAC_SECRET_ARN = os.environ["PGSTAC_SECRET_ARN"]
+
+TUNING_SQL = Path(__file__).parent / "tuning.sql"
+
+
+def get_secret(secret_arn: str) -> dict:
+    response = secrets_client.get_secret_value(SecretId=secret_arn)
+    return json.loads(response["SecretString"])
+
+
+def apply_tuning():
+    admin = get_secret(ADMIN_SECRET_ARN)
+    # the admin secret points at the `postgres` database; pgstac lives in the
+    # database of the pgstac user
+    dbname = get_secret(PGSTAC_SECRET_ARN)["dbname"]
+
+    with psycopg.connect(
+        host=admin["host"],
+        port=admin["port"],
+        dbname=dbname,
+        user=admin["username"],
+        password=admin["password"],
+        connect_timeout=10,
+        autocommit=True,
+    ) as conn:
+        conn.add_notice_handler(lambda notice: print(notice.message_primary))
+        conn.execute(TUNING_SQL.read_text())
+
+
+def handler(event, context):
+    print(f"{event['RequestType']} pgstac tuning")
+    if event["RequestType"] in ("Create", "Update"):
+        apply_tuning()
+    return {"PhysicalResourceId": "pgstac-tuning"}
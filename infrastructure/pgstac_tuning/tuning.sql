@@ -0,0 +1,64 @@
+-- pgstac tuning for the workshop query patterns.
+--
+-- The notebooks search attendee collections by bbox and datetime range with
+-- an `eo:cloud_cover < 10` filter, through stac-fastapi (`/search`) and
+-- titiler-pgstac (`/searches/register`). This file is idempotent; it is
+-- applied by the pgstac-tuning custom resource of the CDK stack and by the
+-- pgstac-tuning service of docker-compose.
+
+SET search_path TO pgstac, public;
+
+-- As a queryable with a float wrapper, `eo:cloud_cover < 10` compiles to
+-- `to_float(content->'properties'->'eo:cloud_cover') < 10` instead of a jsonb
+-- comparison, and the BTREE index type makes pgstac build a matching index
+-- on every items partition (now and for collections created later).
+UPDATE queryables SET
+    definition = '{"title": "Cloud Cover", "type": "number", "minimum": 0, "maximum": 100}',
+    property_wrapper = 'to_float',
+    property_index_type = 'BTREE'
+WHERE name = 'eo:cloud_cover'
+    AND collection_ids IS NULL
+    AND property_index_type IS DISTINCT FROM 'BTREE';
+
+INSERT INTO queryables (name, definition, property_wrapper, property_index_type)
+SELECT
+    'eo:cloud_cover',
+    '{"title": "Cloud Cover", "type": "number", "minimum": 0, "maximum": 100}',
+    'to_float',
+    'BTREE'
+WHERE NOT EXISTS (
+    SELECT 1 FROM queryables
+    WHERE name = 'eo:cloud_cover' AND collection_ids IS NULL
+);
+
+-- Count matches exactly when the planner estimates a small result (attendee
+-- collections) and fall back to the estimate for large ones, instead of
+-- never returning numberMatched.
+INSERT INTO pgstac_settings (name, value) VALUES
+    ('context', 'auto'),
+    ('context_estimated_count', '10000'),
+    ('context_estimated_cost', '100000'),
+    ('context_stats_ttl', '1 day')
+ON CONFLICT (name) DO UPDATE SET value = excluded.value;
+
+-- Every collection is its own partition. Attendee collections hold a few
+-- hundred items, so splitting them by time would only add partitions for the
+-- planner to consider; collections that grow past a million items are
+-- partitioned by month so datetime ranges prune to a few partitions.
+DO $$
+DECLARE
+    c record;
+BEGIN
+    FOR c IN
+        SELECT p.collection
+        FROM partition_sys_meta p
+        JOIN collections ON collections.id = p.collection
+        WHERE collections.partition_trunc IS NULL
+        GROUP BY p.collection
+        HAVING sum(greatest(p.reltuples, 0)) > 1000000
+    LOOP
+        RAISE NOTICE 'Partitioning % by month', c.collection;
+        PERFORM repartition(c.collection, 'month');
+    END LOOP;
+END
+$$;
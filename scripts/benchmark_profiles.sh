@@ -0,0 +1,50 @@
+#!/usr/bin/env bash
+#
+# Benchmark the default docker-compose stack against the performance profile.
+#
+# Starts each profile, warms it up, runs scripts/loadtest.py against it and
+# prints the p95 latency change of the performance profile, and a markdown
+# table of both for PERFORMANCE.md. Arguments are passed to loadtest.py, e.g.
+#
+#   scripts/benchmark_profiles.sh --attendees 50 --duration 120 --collection my-collection
+#
+# Reports are written to $OUTPUT_DIR (default: benchmarks/).
+
+set -euo pipefail
+
+cd "$(dirname "$0")/.."
+OUTPUT_DIR=${OUTPUT_DIR:-benchmarks}
+mkdir -p "$OUTPUT_DIR"
+
+# long-running services; the one-shot loaders exit, which `up --wait` reports
+# as a failure, so they aren't waited on
+SERVICES=(database stac-fastapi titiler-pgstac tipg)
+PERFORMANCE_SERVICES=(pgbouncer tile-cache)
+
+run_profile() {
+    local name=$1
+    shift
+    echo "=== $name profile"
+    # returns once the one-shot services the APIs depend on have completed
+    docker compose "$@" up -d
+    docker compose "$@" up -d --wait --no-deps "${WAIT_SERVICES[@]}"
+    # the first requests pay for cold caches in both profiles
+    python scripts/warmup.py --rounds 1 > /dev/null || true
+    python scripts/loadtest.py ${LOADTEST_ARGS[@]+"${LOADTEST_ARGS[@]}"} \
+        --output "$OUTPUT_DIR/$name.json" \
+        ${BASELINE:+--baseline "$BASELINE"}
+    docker compose "$@" down
+}
+
+LOADTEST_ARGS=("$@")
+
+BASELINE=""
+WAIT_SERVICES=("${SERVICES[@]}")
+run_profile default -f docker-compose.yml
+
+BASELINE="$OUTPUT_DIR/default.json"
+WAIT_SERVICES=("${SERVICES[@]}" "${PERFORMANCE_SERVICES[@]}")
+run_profile performance -f docker-compose.yml -f docker-compose.performance.yml
+
+python scripts/benchmark_table.py "$OUTPUT_DIR/default.json" "$OUTPUT_DIR/performance.json" |
+    tee "$OUTPUT_DIR/results.md"
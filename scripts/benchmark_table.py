@@ -0,0 +1,69 @@
+"""
+Markdown table comparing two `loadtest.py` reports.
+
+`benchmark_profiles.sh` writes the table for the default and performance
+docker-compose profiles to benchmarks/results.md, in the format of the results
+table in PERFORMANCE.md.
+
+Usage:
+    python scripts/benchmark_table.py benchmarks/default.json benchmarks/performance.json
+"""
+
+import argparse
+import json
+import os
+import platform
+from pathlib import Path
+
+
+def change(before: float, after: float) -> str:
+    return f"{(after - before) / before:+.0%}" if before else "n/a"
+
+
+def markdown_table(default: dict, performance: dict) -> str:
+    config = performance.get("config", {})
+    collection = config.get("collection")
+    lines = [
+        f"{config.get('attendees', '?')} attendees for "
+        f"{config.get('duration_s', '?')} s searching "
+        f"{f'`{collection}`' if collection else 'all collections'}, on "
+        f"{platform.node()} ({platform.system()} {platform.machine()}, "
+        f"{os.cpu_count()} CPUs).",
+        "",
+        "| Endpoint | rps default | rps performance | p50 ms default | "
+        "p50 ms performance | p95 ms default | p95 ms performance | p95 change | "
+        "errors default | errors performance |",
+        "|---|--:|--:|--:|--:|--:|--:|--:|--:|--:|",
+    ]
+    for name, after in performance["endpoints"].items():
+        before = default["endpoints"].get(name)
+        if before is None:
+            continue
+        lines.append(
+            f"| `{name}` | {before['throughput_rps']:.1f} | "
+            f"{after['throughput_rps']:.1f} | {before['p50_ms']} | "
+            f"{after['p50_ms']} | {before['p95_ms']} | {after['p95_ms']} | "
+            f"{change(before['p95_ms'], after['p95_ms'])} | "
+            f"{before['error_rate']:.1%} | {after['error_rate']:.1%} |"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("default", type=Path, help="report of the default profile")
+    parser.add_argument(
+        "performance", type=Path, help="report of the performance profile"
+    )
+    args = parser.parse_args()
+
+    print(
+        markdown_table(
+            json.loads(args.default.read_text()),
+            json.loads(args.performance.read_text()),
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark `workshop_cogs.harvest_cogs` against synthetic COGs.
+
+Writes Sentinel-2 like scenes of COGs to a directory, serves them over HTTP
+with range requests and a per-request delay like S3's (`scripts/cog_server.py`)
+and harvests items from them with a growing number of worker threads. The
+first run with the GDAL defaults and a single worker is the baseline of
+opening the files one at a time.
+
+Usage:
+    python scripts/cog_harvest_benchmark.py --scenes 50 --latency 0.02
+
+    # compare with an earlier run
+    python scripts/cog_harvest_benchmark.py --output run.json
+    python scripts/cog_harvest_benchmark.py --baseline run.json
+
+The report lists items and files per second and the requests and bytes the
+server sent, per configuration.
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "docs"))
+
+from cog_server import serve, write_synthetic_scenes  # noqa: E402
+from workshop_cogs import HEADER_ONLY_ENV, harvest_cogs  # noqa: E402
+
+
+def run_config(server, urls: list[str], workers: int, gdal_env: dict) -> dict:
+    server.stats.reset()
+    start = time.perf_counter()
+    items = list(harvest_cogs(urls, workers=workers, gdal_env=gdal_env))
+    elapsed = time.perf_counter() - start
+    return {
+        "items": len(items),
+        "files": len(urls),
+        "elapsed_s": round(elapsed, 3),
+        "items_per_s": round(len(items) / elapsed, 1),
+        "files_per_s": round(len(urls) / elapsed, 1),
+        "requests": server.stats.requests,
+        "bytes": server.stats.bytes,
+    }
+
+
+def run(args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        root = args.directory or Path(tmp)
+        paths = write_synthetic_scenes(root, args.scenes, args.size)
+        file_bytes = sum(path.stat().st_size for path in paths)
+
+        configs = {"gdal defaults, 1 worker": (1, {})}
+        for workers in args.workers:
+            configs[f"header-only, {workers} workers"] = (workers, HEADER_ONLY_ENV)
+
+        report = {
+            "config": {
+                "scenes": args.scenes,
+                "files": len(paths),
+                "file_bytes": file_bytes,
+                "latency_s": args.latency,
+            },
+            "runs": {},
+        }
+        with serve(root, latency=args.latency) as server:
+            for run_index, (name, (workers, gdal_env)) in enumerate(configs.items()):
+                print(f"Harvesting with {name}")
+                # a query string per run keeps GDAL from reusing cached headers
+                urls = [f"{server.url(path)}?run={run_index}" for path in paths]
+                report["runs"][name] = run_config(server, urls, workers, gdal_env)
+    return report
+
+
+def print_report(report: dict, baseline: dict | None = None):
+    config = report["config"]
+    print(
+        f"\n{config['files']} files in {config['scenes']} scenes "
+        f"({config['file_bytes'] / 1e6:.1f} MB), {config['latency_s']}s latency"
+    )
+    header = f"{'configuration':<28}{'items/s':>9}{'files/s':>9}"
+    header += f"{'requests':>10}{'KB/file':>9}"
+    if baseline:
+        header += f"{'Δfiles/s':>10}"
+    print(header)
+    for name, stats in report["runs"].items():
+        line = (
+            f"{name:<28}{stats['items_per_s']:>9}{stats['files_per_s']:>9}"
+            f"{stats['requests']:>10}{stats['bytes'] / stats['files'] / 1e3:>9.1f}"
+        )
+        previous = (baseline or {}).get("runs", {}).get(name)
+        if previous:
+            change = (stats["files_per_s"] - previous["files_per_s"]) / previous[
+                "files_per_s"
+            ]
+            line += f"{change:>+10.0%}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenes", type=int, default=50)
+    parser.add_argument("--size", type=int, default=1024, help="pixels per side")
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="seconds added per request"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[1, 8, 32],
+        help="worker counts to benchmark",
+    )
+    parser.add_argument(
+        "--directory",
+        type=Path,
+        help="keep the COGs here between runs instead of a temporary directory",
+    )
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument(
+        "--baseline", type=Path, help="earlier JSON report to compare files/s to"
+    )
+    args = parser.parse_args()
+
+    report = run(args)
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    print_report(report, baseline)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Local HTTP server for synthetic Cloud Optimized GeoTIFFs.
+
+Serves a directory with HTTP range requests, the way GDAL reads COGs from S3,
+and adds a fixed delay per request to mimic object storage latency. The
+server counts requests and bytes sent, so benchmarks can report how much of
+each file was read.
+
+Usage:
+    python scripts/cog_server.py --scenes 20 --latency 0.02 /tmp/cogs
+
+    # or from another script
+    from cog_server import serve, write_synthetic_scenes
+    hrefs = write_synthetic_scenes(root, scenes=20)
+    with serve(root, latency=0.02) as server:
+        urls = [server.url(href) for href in hrefs]
+"""
+
+import argparse
+import multiprocessing
+import re
+import time
+from contextlib import contextmanager
+from datetime import UTC, datetime, timedelta
+from functools import partial
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+
+# Sentinel-2 like scenes: 10m bands over a 1 x 1 degree area in UTM zone 13N
+SCENE_BANDS = ("B02", "B03", "B04", "B08")
+SCENE_EPSG = 32613
+SCENE_ORIGIN = (399960.0, 4500000.0)
+SCENE_START = datetime(2025, 4, 1, tzinfo=UTC)
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """Static file handler that answers `Range: bytes=start-end` requests."""
+
+    protocol_version = "HTTP/1.1"
+
+    def __init__(self, *args, stats: "ServerStats", latency: float, **kwargs):
+        self.stats = stats
+        self.latency = latency
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_head(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+        path = Path(self.translate_path(self.path))
+        if not path.is_file():
+            # count misses too: GDAL probes for sidecar files unless told not to
+            self.stats.add(0)
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return None
+
+        size = path.stat().st_size
+        start, end = 0, size - 1
+        match = RANGE_PATTERN.match(self.headers.get("Range", ""))
+        if match and match.group(1):
+            start = int(match.group(1))
+            end = min(int(match.group(2) or end), size - 1)
+        elif match and match.group(2):
+            start = max(size - int(match.group(2)), 0)
+        if start > end:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
+
+        f = open(path, "rb")
+        f.seek(start)
+        self.send_response(HTTPStatus.PARTIAL_CONTENT if match else HTTPStatus.OK)
+        self.send_header("Content-Type", "image/tiff")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        if match:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        self._remaining = end - start + 1
+        return f
+
+    def copyfile(self, source, outputfile):
+        sent = 0
+        while self._remaining > 0:
+            chunk = source.read(min(self._remaining, 1 << 16))
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            self._remaining -= len(chunk)
+            sent += len(chunk)
+        self.stats.add(sent)
+
+    def do_HEAD(self):
+        f = self.send_head()
+        if f:
+            f.close()
+            self.stats.add(0)
+
+
+class ServerStats:
+    """Requests and bytes sent by the server process."""
+
+    def __init__(self, context=multiprocessing):
+        self._requests = context.Value("q", 0)
+        self._bytes = context.Value("q", 0)
+
+    @property
+    def requests(self) -> int:
+        return self._requests.value
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes.value
+
+    def reset(self):
+        with self._requests.get_lock(), self._bytes.get_lock():
+            self._requests.value = 0
+            self._bytes.value = 0
+
+    def add(self, nbytes: int):
+        with self._requests.get_lock(), self._bytes.get_lock():
+            self._requests.value += 1
+            self._bytes.value += nbytes
+
+
+class CogServer:
+    def __init__(self, endpoint: str, root: Path, stats: ServerStats):
+        self.endpoint = endpoint
+        self.root = root
+        self.stats = stats
+
+    def url(self, path: str | Path) -> str:
+        """URL of a file under the served directory."""
+        return f"{self.endpoint}/{Path(path).relative_to(self.root).as_posix()}"
+
+
+def run_server(
+    root: Path, latency: float, host: str, port: int, stats: ServerStats, ready
+):
+    handler = partial(
+        RangeRequestHandler, directory=str(root), stats=stats, latency=latency
+    )
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    ready.send(httpd.server_address[1])
+    httpd.serve_forever()
+
+
+@contextmanager
+def serve(
+    root: str | Path, latency: float = 0.0, port: int = 0, host: str = "127.0.0.1"
+):
+    """
+    Serve `root` on localhost from a child process.
+
+    The server runs in its own process, like a remote object store, so GDAL
+    calls that hold the GIL in this process can't stall it. Listen on
+    `host="0.0.0.0"` to serve containers too.
+    """
+    root = Path(root).resolve()
+    context = multiprocessing.get_context("spawn")
+    stats = ServerStats(context)
+    ready, child_ready = context.Pipe()
+    process = context.Process(
+        target=run_server,
+        args=(root, latency, host, port, stats, child_ready),
+        daemon=True,
+    )
+    process.start()
+    try:
+        port = ready.recv()
+        yield CogServer(f"http://127.0.0.1:{port}", root, stats)
+    finally:
+        process.terminate()
+        process.join()
+
+
+def write_cog(path: Path, data: np.ndarray, transform, epsg: int, **options):
+    """Write `data` (bands, height, width) as a COG."""
+    import rasterio
+
+    count, height, width = data.shape
+    path.parent.mkdir(parents=True, exist_ok=True)
+    profile = {
+        "driver": "COG",
+        "width": width,
+        "height": height,
+        "count": count,
+        "dtype": data.dtype.name,
+        "crs": f"EPSG:{epsg}",
+        "transform": transform,
+        "nodata": 0,
+        "compress": "deflate",
+        "blocksize": 256,
+        **options,
+    }
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data)
+
+
+def write_synthetic_scenes(
+    root: str | Path,
+    scenes: int = 10,
+    size: int = 1024,
+    bands: tuple[str, ...] = SCENE_BANDS,
+    seed: int = 0,
+) -> list[Path]:
+    """
+    Write Sentinel-2 like scenes of single-band uint16 COGs.
+
+    Scene `i` is written to `{root}/SYN_{i}_{yyyymmdd}/{band}.tif`, next to
+    scene `i - 1` and one day later, the layout of the sentinel-cogs bucket.
+    Existing files are kept.
+
+    Returns:
+        list[Path]: The COGs, sorted like an S3 listing
+    """
+    from rasterio.transform import from_origin
+
+    root = Path(root)
+    rng = np.random.default_rng(seed)
+    resolution = 10.0 * 10980 / size
+    paths = []
+    for i in range(scenes):
+        day = SCENE_START + timedelta(days=i)
+        scene = root / f"SYN_{i:04d}_{day:%Y%m%d}"
+        x = SCENE_ORIGIN[0] + (i % 8) * size * resolution
+        y = SCENE_ORIGIN[1] - (i // 8) * size * resolution
+        transform = from_origin(x, y, resolution, resolution)
+        for band in bands:
+            path = scene / f"{band}.tif"
+            if not path.exists():
+                # smooth fields compress like real imagery, unlike white noise
+                field = rng.normal(size=(size // 64, size // 64)).cumsum(axis=0)
+                data = np.kron(field, np.ones((64, 64)))
+                data = (data - data.min()) / (np.ptp(data) or 1) * 10000 + 1
+                write_cog(
+                    path, data.astype("uint16")[np.newaxis], transform, SCENE_EPSG
+                )
+            paths.append(path)
+    return sorted(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("root", type=Path, help="directory to write and serve")
+    parser.add_argument("--scenes", type=int, default=0, help="scenes to write")
+    parser.add_argument("--size", type=int, default=1024, help="pixels per side")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument(
+        "--host", default="127.0.0.1", help="0.0.0.0 to serve containers too"
+    )
+    args = parser.parse_args()
+
+    if args.scenes:
+        paths = write_synthetic_scenes(args.root, args.scenes, args.size)
+        print(f"{len(paths)} COGs in {args.root}")
+
+    with serve(args.root, args.latency, args.port, args.host) as server:
+        print(f"Serving {args.root} on {server.endpoint} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(60)
+                print(
+                    f"{server.stats.requests} requests, "
+                    f"{server.stats.bytes / 1e6:.1f} MB sent"
+                )
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env bash
+#
+# Bulk load the Level III Ecoregions of North America into features.ecoregions.
+#
+#   scripts/ecoregions.sh snapshot [FILE]  # needs GDAL and network access, run once
+#   scripts/ecoregions.sh load [FILE]      # needs psql, connects with the PG* variables
+#
+# `snapshot` converts the upstream shapefile to a gzipped SQL file of COPY
+# statements (data/ecoregions.sql.gz by default) and records its SHA-256 next
+# to it; commit both so that nothing downloads the shapefile again. It does
+# nothing when the file already exists. `load` refuses a missing file or one
+# that doesn't match that checksum, streams it into Postgres without GDAL or
+# network access, then runs ecoregions.sql to build the indexed, clustered
+# table and the simplified zoom band views. Set FORCE=1 to reload a database
+# that already has the data.
+
+set -euo pipefail
+
+SOURCE=/vsizip/vsicurl/https://dmap-prod-oms-edc.s3.us-east-1.amazonaws.com/ORD/Ecoregions/cec_na/NA_CEC_Eco_Level3.zip/NA_CEC_Eco_Level3.shp
+SCRIPT_DIR=$(cd "$(dirname "$0")" && pwd)
+SNAPSHOT=${2:-$SCRIPT_DIR/../data/ecoregions.sql.gz}
+
+snapshot() {
+    if [ -f "$SNAPSHOT" ]; then
+        echo "$SNAPSHOT already exists. Skipping."
+        return
+    fi
+    # -simplify is in the units of the source's Lambert azimuthal equal-area
+    # projection: 100 m is about a pixel at zoom 10 and keeps the snapshot
+    # small. The deployed table has always been loaded with it.
+    ogr2ogr -f PGDump /vsistdout/ "$SOURCE" \
+        -nln ecoregions_import \
+        -t_srs EPSG:4326 \
+        -nlt PROMOTE_TO_MULTI \
+        -simplify 100 \
+        -lco SCHEMA=features \
+        -lco CREATE_SCHEMA=OFF \
+        -lco DROP_TABLE=IF_EXISTS \
+        -lco SPATIAL_INDEX=NONE \
+        -lco GEOMETRY_NAME=geom \
+        -lco FID=id \
+        -lco PRECISION=NO |
+        gzip -9 --no-name > "$SNAPSHOT.tmp"
+    mv "$SNAPSHOT.tmp" "$SNAPSHOT"
+    (cd "$(dirname "$SNAPSHOT")" && sha256sum "$(basename "$SNAPSHOT")" > "$(basename "$SNAPSHOT").sha256")
+    echo "Wrote $SNAPSHOT and $SNAPSHOT.sha256"
+}
+
+load() {
+    until pg_isready -q; do
+        sleep 1
+    done
+
+    loaded=$(psql -tAc "SELECT to_regclass('features.ecoregions_z4_7') IS NOT NULL")
+    if [ "${FORCE:-0}" != "1" ] && [ "$loaded" = "t" ]; then
+        echo "features.ecoregions already loaded. Skipping."
+        return
+    fi
+
+    if [ ! -f "$SNAPSHOT" ]; then
+        echo "$SNAPSHOT doesn't exist. Create it with \`$0 snapshot\`," \
+            "which needs GDAL and network access." >&2
+        exit 1
+    fi
+    (cd "$(dirname "$SNAPSHOT")" && sha256sum --check --quiet "$(basename "$SNAPSHOT").sha256")
+
+    start=$(date +%s)
+    psql -v ON_ERROR_STOP=1 -qc "CREATE SCHEMA IF NOT EXISTS features;"
+    gunzip -c "$SNAPSHOT" | psql -v ON_ERROR_STOP=1 -q
+    psql -v ON_ERROR_STOP=1 -q -f "$SCRIPT_DIR/ecoregions.sql"
+    echo "Loaded features.ecoregions in $(($(date +%s) - start))s"
+}
+
+case "${1:-}" in
+snapshot) snapshot ;;
+load) load ;;
+*)
+    echo "usage: $0 {snapshot|load} [FILE]" >&2
+    exit 2
+    ;;
+esac
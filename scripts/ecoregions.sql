@@ -0,0 +1,80 @@
+-- Build features.ecoregions from the features.ecoregions_import table loaded
+-- from the snapshot, plus simplified copies for low zoom vector tiles.
+--
+-- tipg exposes every table and materialized view in the features schema:
+--   features.ecoregions_z0_3  zoom 0-3, simplified to 0.1 degrees
+--   features.ecoregions_z4_7  zoom 4-7, simplified to 0.01 degrees
+--   features.ecoregions       zoom 8+, as loaded (simplified to 100 m)
+--
+-- The ecoregions tile the continent, so the bands are simplified as a
+-- coverage with ST_CoverageSimplify (PostGIS 3.4 with GEOS 3.12 or newer):
+-- the edge two neighbours share is simplified once, and no slivers or gaps
+-- open between them. Older versions fall back to simplifying each polygon on
+-- its own with ST_SimplifyPreserveTopology, which leaves slivers along shared
+-- edges at low zooms.
+
+BEGIN;
+
+SET LOCAL maintenance_work_mem = '256MB';
+
+-- also drops the zoom band views of a previous load
+DROP TABLE IF EXISTS features.ecoregions CASCADE;
+
+CREATE TABLE features.ecoregions AS
+SELECT * FROM features.ecoregions_import;
+
+ALTER TABLE features.ecoregions ADD PRIMARY KEY (id);
+CREATE INDEX ecoregions_geom_idx ON features.ecoregions USING gist (geom);
+
+-- store neighbouring polygons together so tile queries read fewer pages
+CLUSTER features.ecoregions USING ecoregions_geom_idx;
+
+DROP TABLE features.ecoregions_import;
+
+DO $$
+DECLARE
+    band record;
+    columns text;
+    simplify text;
+BEGIN
+    SELECT string_agg(quote_ident(column_name), ', ' ORDER BY ordinal_position)
+    INTO columns
+    FROM information_schema.columns
+    WHERE table_schema = 'features'
+        AND table_name = 'ecoregions'
+        AND column_name <> 'geom';
+
+    IF to_regprocedure('st_coveragesimplify(geometry, float8, boolean)') IS NOT NULL
+        AND string_to_array(split_part(postgis_geos_version(), '-', 1), '.')::int[]
+            >= '{3,12}'
+    THEN
+        simplify := 'ST_CoverageSimplify(geom, %s) OVER ()';
+    ELSE
+        RAISE NOTICE 'ST_CoverageSimplify needs GEOS 3.12, the zoom bands are '
+            'simplified per polygon and have slivers along shared edges';
+        simplify := 'ST_SimplifyPreserveTopology(geom, %s)';
+    END IF;
+
+    FOR band IN
+        SELECT * FROM (
+            VALUES ('ecoregions_z0_3', 0.1), ('ecoregions_z4_7', 0.01)
+        ) AS bands (name, tolerance)
+    LOOP
+        EXECUTE format(
+            'CREATE MATERIALIZED VIEW features.%I AS
+            SELECT %s,
+                ST_Multi(%s)::geometry(MultiPolygon, 4326) AS geom
+            FROM features.ecoregions',
+            band.name, columns, format(simplify, band.tolerance)
+        );
+        EXECUTE format('CREATE UNIQUE INDEX ON features.%I (id)', band.name);
+        EXECUTE format('CREATE INDEX ON features.%I USING gist (geom)', band.name);
+    END LOOP;
+END
+$$;
+
+COMMIT;
+
+ANALYZE features.ecoregions;
+ANALYZE features.ecoregions_z0_3;
+ANALYZE features.ecoregions_z4_7;
@@ -0,0 +1,187 @@
+"""
+Benchmark reading a whole tipg collection into Python.
+
+Compares the hand-written way of pulling a collection, following the `next`
+links of GeoJSON pages and keeping every feature, with
+`workshop_features.iter_record_batches`, which streams `geojsonseq` pages into
+Arrow record batches while the next pages download.
+
+Each configuration runs in a fresh process, so its peak memory (max RSS) is
+measured on its own.
+
+Usage (against the local docker-compose stack):
+    python scripts/features_benchmark.py --collection features.ecoregions
+
+    # compare with an earlier run
+    python scripts/features_benchmark.py --output run.json
+    python scripts/features_benchmark.py --baseline run.json
+
+The tipg endpoint is read from `TIPG_API_ENDPOINT` or `--endpoint`.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "docs"))
+
+from loadtest import DEFAULT_ENDPOINTS, VECTOR_COLLECTION  # noqa: E402
+
+
+def read_geojson_pages(collection_id: str, page_size: int) -> tuple[int, int]:
+    """Follow the `next` links of GeoJSON pages and keep every feature."""
+    from shapely.geometry import shape
+    from workshop_setup import get_client
+
+    client = get_client("vector")
+    features = []
+    nbytes = 0
+    url = f"/collections/{collection_id}/items"
+    params = {"f": "geojson", "limit": page_size}
+    while url:
+        response = client.get(url, params=params)
+        response.raise_for_status()
+        nbytes += len(response.content)
+        page = response.json()
+        # what GeoDataFrame.from_features does for each feature
+        features.extend(
+            (feature["properties"], shape(feature["geometry"]))
+            for feature in page["features"]
+        )
+        url = next(
+            (link["href"] for link in page.get("links", []) if link["rel"] == "next"),
+            None,
+        )
+        params = None
+    return len(features), nbytes
+
+
+def read_record_batches(
+    collection_id: str, page_size: int, prefetch: int
+) -> tuple[int, int]:
+    """Stream the collection as record batches, keeping none of them."""
+    from workshop_features import iter_record_batches
+
+    rows = nbytes = 0
+    for batch in iter_record_batches(collection_id, page_size, prefetch):
+        rows += batch.num_rows
+        nbytes += batch.nbytes
+    return rows, nbytes
+
+
+def run_config(config: dict, results):
+    """Run one configuration and send its timing and peak memory back."""
+    import workshop_features  # noqa: F401
+    from workshop_setup import get_client
+
+    # leave imports and the client's TLS setup out of the measurement
+    get_client("vector")
+    start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if config["reader"] == "geojson":
+        rows, nbytes = read_geojson_pages(config["collection"], config["page_size"])
+    else:
+        rows, nbytes = read_record_batches(
+            config["collection"], config["page_size"], config["prefetch"]
+        )
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.send(
+        {
+            "rows": rows,
+            "bytes": nbytes,
+            "elapsed_s": round(elapsed, 3),
+            "rows_per_s": round(rows / elapsed, 1),
+            "peak_rss_mb": round(peak_rss / 1024, 1),
+            "peak_rss_increase_mb": round((peak_rss - start_rss) / 1024, 1),
+        }
+    )
+
+
+def run(args: argparse.Namespace) -> dict:
+    # the child processes read the endpoint from the environment
+    os.environ["TIPG_API_ENDPOINT"] = args.endpoint
+
+    configs = {
+        f"geojson next links, limit {args.page_size}": {"reader": "geojson"},
+    }
+    for prefetch in args.prefetch:
+        configs[f"geojsonseq batches, prefetch {prefetch}"] = {
+            "reader": "batches",
+            "prefetch": prefetch,
+        }
+
+    context = multiprocessing.get_context("spawn")
+    report = {
+        "config": {
+            "collection": args.collection,
+            "page_size": args.page_size,
+            "endpoint": args.endpoint,
+        },
+        "runs": {},
+    }
+    for name, config in configs.items():
+        print(f"Reading {args.collection} with {name}")
+        config.update(collection=args.collection, page_size=args.page_size)
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=run_config, args=(config, sender))
+        process.start()
+        report["runs"][name] = receiver.recv()
+        process.join()
+    return report
+
+
+def print_report(report: dict, baseline: dict | None = None):
+    header = f"{'configuration':<36}{'rows':>8}{'rows/s':>10}{'peak MB':>9}"
+    header += f"{'+MB':>8}"
+    if baseline:
+        header += f"{'Δrows/s':>9}"
+    print(header)
+    for name, stats in report["runs"].items():
+        line = (
+            f"{name:<36}{stats['rows']:>8}{stats['rows_per_s']:>10}"
+            f"{stats['peak_rss_mb']:>9}{stats['peak_rss_increase_mb']:>8}"
+        )
+        previous = (baseline or {}).get("runs", {}).get(name)
+        if previous:
+            change = (stats["rows_per_s"] - previous["rows_per_s"]) / previous[
+                "rows_per_s"
+            ]
+            line += f"{change:>+9.0%}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--collection", default=VECTOR_COLLECTION)
+    parser.add_argument("--endpoint", default=DEFAULT_ENDPOINTS["vector"])
+    parser.add_argument("--page-size", type=int, default=2000)
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        nargs="+",
+        default=[0, 1, 2],
+        help="prefetch depths to benchmark",
+    )
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument(
+        "--baseline", type=Path, help="earlier JSON report to compare rows/s to"
+    )
+    args = parser.parse_args()
+
+    report = run(args)
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    print_report(report, baseline)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Build docs/land_mask.npz, the land cells `sample_land_points` draws from.
+
+Rasterizes land polygons to a global grid of `--resolution` degree cells and
+keeps the cells that lie entirely on land, so any point inside one of them is
+on land. The mask is stored as packed bits (about 11 KB at 0.25°).
+
+Usage:
+    python scripts/land_mask.py
+    python scripts/land_mask.py --source ne_110m_land.shp --resolution 0.25
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import shapely
+
+SOURCE = (
+    "/vsizip/vsicurl/https://naciscdn.org/naturalearth/110m/physical/ne_110m_land.zip"
+)
+OUTPUT = Path(__file__).resolve().parents[1] / "docs" / "land_mask.npz"
+
+
+def land_mask(land, resolution: float) -> np.ndarray:
+    """Boolean (rows, columns) grid from 90°S and 180°W of cells within `land`."""
+    shapely.prepare(land)
+    lons = np.arange(-180, 180, resolution)
+    lats = np.arange(-90, 90, resolution)
+    x, y = np.meshgrid(lons, lats)
+    cells = shapely.box(
+        x.ravel(), y.ravel(), x.ravel() + resolution, y.ravel() + resolution
+    )
+    return shapely.contains(land, cells).reshape(x.shape)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--source", default=SOURCE, help="land or country polygons")
+    parser.add_argument("--resolution", type=float, default=0.25, help="degrees")
+    parser.add_argument("--output", type=Path, default=OUTPUT)
+    args = parser.parse_args()
+
+    import geopandas as gpd
+
+    land = shapely.union_all(gpd.read_file(args.source).geometry.values)
+    mask = land_mask(land, args.resolution)
+    np.savez_compressed(
+        args.output,
+        bits=np.packbits(mask, axis=None),
+        shape=np.array(mask.shape),
+        resolution=np.array(args.resolution),
+    )
+    print(f"Wrote {args.output}: {mask.sum()} of {mask.size} cells on land")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+Workshop load test for the STAC, raster and vector APIs.
+
+Simulates N attendees working through the notebooks at the same time. Each
+attendee is placed at a point from `workshop_setup.sample_land_points` and
+repeatedly runs the notebook traffic mix:
+
+- stac-fastapi: `/search` with a CQL2 `eo:cloud_cover` filter
+- titiler-pgstac: `/searches/register` followed by WebMercatorQuad tiles
+- tipg: `/collections/features.ecoregions/items` and vector tiles
+
+Usage (against the local docker-compose stack):
+    python scripts/loadtest.py --attendees 50 --duration 120 --output run.json
+
+    # compare with an earlier run
+    python scripts/loadtest.py --attendees 50 --baseline run.json
+
+Latency percentiles, throughput and error rates are reported per endpoint and
+written as JSON.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "docs"))
+
+from workshop_setup import sample_land_points  # noqa: E402
+
+DEFAULT_ENDPOINTS = {
+    "stac": os.environ.get("STAC_API_ENDPOINT", "http://localhost:8081"),
+    "raster": os.environ.get("TITILER_PGSTAC_API_ENDPOINT", "http://localhost:8082"),
+    "vector": os.environ.get("TIPG_API_ENDPOINT", "http://localhost:8083"),
+}
+
+VECTOR_COLLECTION = "features.ecoregions"
+
+CLOUD_COVER_FILTER = {
+    "op": "lt",
+    "args": [{"property": "eo:cloud_cover"}, 10],
+}
+
+RENDER_PARAMS = (
+    ("assets", "red"),
+    ("assets", "green"),
+    ("assets", "blue"),
+    ("color_formula", "Gamma RGB 3.0 Saturation 1.2 Sigmoidal RGB 15 0.35"),
+)
+
+
+def tile_for_point(lon: float, lat: float, zoom: int) -> tuple[int, int, int]:
+    """WebMercatorQuad tile (z, x, y) containing a point."""
+    lat = max(min(lat, 85.0511), -85.0511)
+    n = 2**zoom
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return zoom, min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_around_point(
+    lon: float, lat: float, zoom: int, radius: int = 1
+) -> list[tuple[int, int, int]]:
+    """The tile containing a point and its neighbours, like a map viewport."""
+    z, x, y = tile_for_point(lon, lat, zoom)
+    n = 2**z
+    return [
+        (z, (x + dx) % n, y + dy)
+        for dy in range(-radius, radius + 1)
+        for dx in range(-radius, radius + 1)
+        if 0 <= y + dy < n
+    ]
+
+
+class Recorder:
+    """Collects latencies and errors per endpoint."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.started = time.perf_counter()
+        self.finished = None
+
+    async def request(
+        self,
+        client: httpx.AsyncClient,
+        name: str,
+        method: str,
+        url: str,
+        tile: bool = False,
+        **kwargs,
+    ) -> httpx.Response | None:
+        """
+        Send a request and record its latency under `name`.
+
+        Any 4xx or 5xx response counts as an error, except the 404 that a
+        `tile` request gets for an area without data.
+        """
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            await response.aread()
+        except httpx.HTTPError:
+            self.latencies[name].append(time.perf_counter() - start)
+            self.errors[name] += 1
+            return None
+
+        self.latencies[name].append(time.perf_counter() - start)
+        if response.status_code >= 400 and not (tile and response.status_code == 404):
+            self.errors[name] += 1
+        return response
+
+    def report(self) -> dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        endpoints = {}
+        for name, latencies in sorted(self.latencies.items()):
+            values = np.array(latencies) * 1000
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            endpoints[name] = {
+                "requests": len(values),
+                "errors": self.errors[name],
+                "error_rate": self.errors[name] / len(values),
+                "throughput_rps": len(values) / elapsed,
+                "p50_ms": round(float(p50), 1),
+                "p95_ms": round(float(p95), 1),
+                "p99_ms": round(float(p99), 1),
+                "max_ms": round(float(values.max()), 1),
+            }
+        return {"elapsed_s": round(elapsed, 1), "endpoints": endpoints}
+
+
+async def attendee(
+    recorder: Recorder,
+    endpoints: dict,
+    point: tuple[float, float],
+    args: argparse.Namespace,
+    deadline: float,
+):
+    """Run the notebook traffic mix for one attendee until `deadline`."""
+    lon, lat = point
+    bbox = [lon - 2, lat - 2, lon + 2, lat + 2]
+    search = {
+        "bbox": bbox,
+        "datetime": args.datetime,
+        "filter": CLOUD_COVER_FILTER,
+        "filter-lang": "cql2-json",
+        "limit": 10,
+    }
+    if args.collection:
+        search["collections"] = [args.collection]
+
+    async with httpx.AsyncClient(timeout=args.timeout) as client:
+        while time.perf_counter() < deadline:
+            await recorder.request(
+                client,
+                "stac:/search",
+                "POST",
+                f"{endpoints['stac']}/search",
+                json=search,
+            )
+            await asyncio.sleep(random.expovariate(1 / args.think_time))
+
+            register = await recorder.request(
+                client,
+                "raster:/searches/register",
+                "POST",
+                f"{endpoints['raster']}/searches/register",
+                json={k: v for k, v in search.items() if k != "limit"},
+            )
+            if register is not None and register.status_code == 200:
+                search_id = register.json()["id"]
+                await asyncio.gather(
+                    *[
+                        recorder.request(
+                            client,
+                            "raster:/searches/{id}/tiles",
+                            "GET",
+                            f"{endpoints['raster']}/searches/{search_id}/tiles/"
+                            f"WebMercatorQuad/{z}/{x}/{y}",
+                            tile=True,
+                            params=RENDER_PARAMS,
+                        )
+                        for z, x, y in tiles_around_point(lon, lat, args.zoom)
+                    ]
+                )
+            await asyncio.sleep(random.expovariate(1 / args.think_time))
+
+            await recorder.request(
+                client,
+                "vector:/collections/{id}/items",
+                "GET",
+                f"{endpoints['vector']}/collections/{VECTOR_COLLECTION}/items",
+                params={"bbox": ",".join(map(str, bbox)), "limit": 10},
+            )
+            await asyncio.gather(
+                *[
+                    recorder.request(
+                        client,
+                        "vector:/collections/{id}/tiles",
+                        "GET",
+                        f"{endpoints['vector']}/collections/{VECTOR_COLLECTION}/tiles/"
+                        f"WebMercatorQuad/{z}/{x}/{y}",
+                        tile=True,
+                    )
+                    for z, x, y in tiles_around_point(lon, lat, args.zoom - 3)
+                ]
+            )
+            await asyncio.sleep(random.expovariate(1 / args.think_time))
+
+
+async def run(args: argparse.Namespace) -> dict:
+    endpoints = {
+        "stac": args.stac_endpoint,
+        "raster": args.raster_endpoint,
+        "vector": args.vector_endpoint,
+    }
+    points = sample_land_points(args.attendees, min_distance=100)
+    recorder = Recorder()
+    deadline = time.perf_counter() + args.duration
+
+    async def start_attendee(i: int, point):
+        # spread attendee start times over the ramp-up period
+        await asyncio.sleep(args.ramp_up * i / args.attendees)
+        await attendee(recorder, endpoints, point, args, deadline)
+
+    await asyncio.gather(
+        *[start_attendee(i, tuple(point)) for i, point in enumerate(points)]
+    )
+    recorder.finished = time.perf_counter()
+
+    report = recorder.report()
+    report["config"] = {
+        "attendees": args.attendees,
+        "duration_s": args.duration,
+        "ramp_up_s": args.ramp_up,
+        "think_time_s": args.think_time,
+        "zoom": args.zoom,
+        "collection": args.collection,
+        "endpoints": endpoints,
+    }
+    return report
+
+
+def print_report(report: dict, baseline: dict | None = None):
+    header = f"{'endpoint':<34}{'requests':>9}{'errors':>8}{'rps':>8}"
+    header += f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    if baseline:
+        header += f"{'Δp95':>9}"
+    print(header)
+    for name, stats in report["endpoints"].items():
+        line = (
+            f"{name:<34}{stats['requests']:>9}{stats['errors']:>8}"
+            f"{stats['throughput_rps']:>8.1f}{stats['p50_ms']:>9}"
+            f"{stats['p95_ms']:>9}{stats['p99_ms']:>9}"
+        )
+        previous = (baseline or {}).get("endpoints", {}).get(name)
+        if previous and previous["p95_ms"]:
+            change = (stats["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"]
+            line += f"{change:>+9.0%}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--attendees", type=int, default=25)
+    parser.add_argument("--duration", type=float, default=60, help="seconds")
+    parser.add_argument("--ramp-up", type=float, default=10, help="seconds")
+    parser.add_argument(
+        "--think-time", type=float, default=1.0, help="mean seconds between steps"
+    )
+    parser.add_argument("--zoom", type=int, default=10, help="raster tile zoom")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument(
+        "--collection", help="STAC collection to search, e.g. an attendee collection"
+    )
+    parser.add_argument(
+        "--datetime", default="2025-01-01T00:00:00Z/2025-04-18T00:00:00Z"
+    )
+    parser.add_argument("--stac-endpoint", default=DEFAULT_ENDPOINTS["stac"])
+    parser.add_argument("--raster-endpoint", default=DEFAULT_ENDPOINTS["raster"])
+    parser.add_argument("--vector-endpoint", default=DEFAULT_ENDPOINTS["vector"])
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument(
+        "--baseline", type=Path, help="earlier JSON report to compare p95 latency to"
+    )
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    print_report(report, baseline)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Run the workshop notebooks headless and time every cell and API/DB call.
+
+Executes the notebooks in order in one kernel per notebook, the way an
+attendee works through them. The widgets the notebooks ask attendees to fill
+in (`username_input`, `lat_input`, `lon_input`) are set from `--username`,
+`--lon` and `--lat` right after the cell that creates them.
+
+`docs/workshop_timing.py` is loaded before the first cell. It records the
+wall time of each httpx and pystac-client request and each pgstac query and
+`Loader` call, and the runner assigns the calls to the cells they ran in.
+
+Upstream STAC APIs (earth-search) are served from a `workshop_cache` fixture
+file, so runs against the local docker-compose stack don't depend on them.
+Record the fixtures once with `--record`, then replay them:
+    python scripts/notebook_benchmark.py --record
+    python scripts/notebook_benchmark.py --output run.json
+
+    # compare with an earlier run
+    python scripts/notebook_benchmark.py --baseline run.json
+
+The database and API endpoints are read from the PG* and *_ENDPOINT
+environment variables, as in the notebooks.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import nbformat
+import numpy as np
+from nbclient import NotebookClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "docs"))
+
+from loadtest import DEFAULT_ENDPOINTS  # noqa: E402
+
+ROOT = Path(__file__).resolve().parents[1]
+DOCS = ROOT / "docs"
+
+# notebooks that run against the stack; 01-stac_metadata reads S3 and
+# roda.sentinel-hub.com directly and can't be replayed from fixtures
+DEFAULT_NOTEBOOKS = (
+    "02-database.ipynb",
+    "03-stac_fastapi_pgstac.ipynb",
+    "04-titiler_pgstac.ipynb",
+    "05-tipg.ipynb",
+)
+
+DEFAULT_FIXTURES = ROOT / "data" / "notebook-fixtures.sqlite"
+
+PRELUDE = """\
+import workshop_timing
+
+workshop_timing.instrument()
+"""
+
+INJECTED_TAG = "injected-by-notebook-benchmark"
+
+
+def injected_cell(source: str) -> nbformat.NotebookNode:
+    cell = nbformat.v4.new_code_cell(source)
+    cell.metadata["tags"] = [INJECTED_TAG]
+    return cell
+
+
+def prepare_notebook(path: Path, widgets: dict) -> nbformat.NotebookNode:
+    """Read a notebook, add the timing prelude and the widget values."""
+    nb = nbformat.read(path, as_version=4)
+    cells = [injected_cell(PRELUDE)]
+    for index, cell in enumerate(nb.cells):
+        cell.metadata["benchmark_index"] = index
+        cells.append(cell)
+        if cell.cell_type != "code":
+            continue
+        values = [
+            f"{name}.value = {value!r}"
+            for name, value in widgets.items()
+            if re.search(rf"^{name}\s*=", cell.source, re.MULTILINE)
+        ]
+        if values:
+            cells.append(injected_cell("\n".join(values)))
+    nb.cells = cells
+    return nb
+
+
+def read_calls(log_path: Path) -> list[dict]:
+    if not log_path.exists():
+        return []
+    return [json.loads(line) for line in log_path.read_text().splitlines() if line]
+
+
+def summarize_calls(calls: list[dict]) -> dict:
+    """Count, total and p50/max time per call name."""
+    by_name = defaultdict(list)
+    for call in calls:
+        by_name[(call["kind"], call["name"])].append(call["elapsed_ms"])
+    return {
+        f"{kind}: {name}": {
+            "count": len(values),
+            "total_ms": round(float(np.sum(values)), 1),
+            "p50_ms": round(float(np.median(values)), 1),
+            "max_ms": round(float(np.max(values)), 1),
+        }
+        for (kind, name), values in sorted(
+            by_name.items(), key=lambda entry: -sum(entry[1])
+        )
+    }
+
+
+def run_notebook(path: Path, args: argparse.Namespace, log_path: Path) -> dict:
+    """Execute a notebook and return the timing of its cells and calls."""
+    widgets = {
+        "username_input": args.username,
+        "lat_input": args.lat,
+        "lon_input": args.lon,
+    }
+    nb = prepare_notebook(path, widgets)
+    log_path.write_text("")
+
+    cells = []
+    windows = {}
+
+    def on_cell_start(cell, cell_index):
+        windows[cell_index] = (time.time(), time.perf_counter())
+
+    def on_cell_executed(cell, cell_index, execute_reply):
+        if INJECTED_TAG in cell.metadata.get("tags", []):
+            return
+        start, started = windows[cell_index]
+        elapsed = time.perf_counter() - started
+        content = execute_reply["content"]
+        lines = cell.source.strip().splitlines()
+        cells.append(
+            {
+                "index": cell.metadata["benchmark_index"],
+                "source": lines[0][:60] if lines else "",
+                "status": content["status"],
+                "error": content.get("ename"),
+                "start": start,
+                "end": start + elapsed,
+                "elapsed_ms": round(elapsed * 1000, 1),
+            }
+        )
+
+    client = NotebookClient(
+        nb,
+        timeout=args.timeout,
+        kernel_name=args.kernel,
+        allow_errors=True,
+        resources={"metadata": {"path": str(DOCS)}},
+        on_cell_start=on_cell_start,
+        on_cell_executed=on_cell_executed,
+    )
+    start = time.perf_counter()
+    client.execute()
+    elapsed = time.perf_counter() - start
+
+    calls = read_calls(log_path)
+    for cell in cells:
+        cell_calls = [
+            call for call in calls if cell["start"] <= call["start"] <= cell["end"]
+        ]
+        cell["calls"] = [
+            {key: call[key] for key in ("kind", "name", "elapsed_ms")}
+            for call in cell_calls
+        ]
+        cell["calls_ms"] = round(sum(call["elapsed_ms"] for call in cell_calls), 1)
+        del cell["start"], cell["end"]
+
+    return {
+        "elapsed_s": round(elapsed, 1),
+        "errors": sum(cell["status"] != "ok" for cell in cells),
+        "cells": cells,
+        "calls": summarize_calls(calls),
+    }
+
+
+def run(args: argparse.Namespace) -> dict:
+    for variable, service in (
+        ("STAC_API_ENDPOINT", "stac"),
+        ("TITILER_PGSTAC_API_ENDPOINT", "raster"),
+        ("TIPG_API_ENDPOINT", "vector"),
+    ):
+        os.environ.setdefault(variable, DEFAULT_ENDPOINTS[service])
+
+    # the kernels inherit this environment
+    os.environ["WORKSHOP_HTTP_CACHE"] = str(args.fixtures)
+    os.environ["WORKSHOP_HTTP_CACHE_MODE"] = "record" if args.record else "replay"
+
+    report = {"notebooks": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = Path(tmp) / "calls.jsonl"
+        os.environ["WORKSHOP_TIMING_LOG"] = str(log_path)
+        for notebook in args.notebooks:
+            print(f"Running {notebook}")
+            report["notebooks"][notebook] = run_notebook(
+                DOCS / notebook, args, log_path
+            )
+
+    report["config"] = {
+        "username": args.username,
+        "lon": args.lon,
+        "lat": args.lat,
+        "fixtures": str(args.fixtures),
+        "mode": os.environ["WORKSHOP_HTTP_CACHE_MODE"],
+        "endpoints": {
+            variable: os.environ[variable]
+            for variable in (
+                "STAC_API_ENDPOINT",
+                "TITILER_PGSTAC_API_ENDPOINT",
+                "TIPG_API_ENDPOINT",
+            )
+        },
+    }
+    return report
+
+
+def print_report(report: dict, baseline: dict | None = None):
+    for notebook, result in report["notebooks"].items():
+        previous = (baseline or {}).get("notebooks", {}).get(notebook, {})
+        previous_cells = {cell["index"]: cell for cell in previous.get("cells", [])}
+
+        print(f"\n{notebook}: {result['elapsed_s']}s, {result['errors']} errors")
+        header = f"{'cell':>5}  {'source':<60}{'ms':>10}{'calls ms':>10}"
+        if baseline:
+            header += f"{'Δ':>8}"
+        print(header)
+        for cell in result["cells"]:
+            line = (
+                f"{cell['index']:>5}  {cell['source']:<60}"
+                f"{cell['elapsed_ms']:>10}{cell['calls_ms']:>10}"
+            )
+            before = previous_cells.get(cell["index"])
+            if before and before["elapsed_ms"]:
+                change = (cell["elapsed_ms"] - before["elapsed_ms"]) / before[
+                    "elapsed_ms"
+                ]
+                line += f"{change:>+8.0%}"
+            if cell["status"] != "ok":
+                line += f"  {cell['error']}"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "notebooks",
+        nargs="*",
+        default=list(DEFAULT_NOTEBOOKS),
+        help="notebooks in docs/ to run, in order",
+    )
+    parser.add_argument("--username", default="benchmark")
+    parser.add_argument("--lon", type=float, default=-105.27)
+    parser.add_argument("--lat", type=float, default=40.01)
+    parser.add_argument(
+        "--fixtures",
+        type=Path,
+        default=DEFAULT_FIXTURES,
+        help="workshop_cache file with the upstream STAC API responses",
+    )
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        help="fetch upstream requests missing from the fixtures and store them",
+    )
+    parser.add_argument("--kernel", default="python3")
+    parser.add_argument("--timeout", type=int, default=600, help="seconds per cell")
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument(
+        "--baseline", type=Path, help="earlier JSON report to compare cell times to"
+    )
+    args = parser.parse_args()
+
+    report = run(args)
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    print_report(report, baseline)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    errors = sum(result["errors"] for result in report["notebooks"].values())
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
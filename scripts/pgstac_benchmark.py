@@ -0,0 +1,367 @@
+"""
+EXPLAIN-based benchmark of the notebook searches against pgstac.
+
+Loads synthetic Sentinel-2-like items into collections of growing size
+(`--items`) and runs the queries behind the notebook searches directly in the
+database, for a sample of regions:
+
+- stac:/search: `search()` with a bbox, a datetime range and the
+  `eo:cloud_cover < 10` filter, as sent by stac-fastapi
+- raster:/searches/register: `search_query()`, as called by titiler-pgstac
+- raster:tile: `xyzsearch()` for a zoom 7 tile of the registered search
+
+Each query is timed over `--repeat` runs and the item query of the search is
+run with `EXPLAIN (ANALYZE, BUFFERS)` to record planning and execution time,
+shared buffers and the scans the planner picked.
+
+Usage (against the local docker-compose stack, before and after tuning):
+    PGSTAC_TUNING=off docker compose up -d
+    python scripts/pgstac_benchmark.py --items 1000 10000 100000 --output before.json
+    docker compose run --rm pgstac-tuning
+    python scripts/pgstac_benchmark.py --items 1000 10000 100000 --baseline before.json
+
+The database connection is configured with the PG* environment variables.
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import UTC, datetime, timedelta
+from itertools import batched
+from pathlib import Path
+
+import numpy as np
+import psycopg
+from psycopg.types.json import Jsonb
+from pypgstac.db import PgstacDB
+from pypgstac.load import Loader, Methods
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "docs"))
+
+from loadtest import CLOUD_COVER_FILTER, tile_for_point  # noqa: E402
+from workshop_ingest import close_db  # noqa: E402
+from workshop_setup import sample_land_points  # noqa: E402
+
+COLLECTION_PREFIX = "pgstac-benchmark"
+
+ITEMS_START = datetime(2024, 1, 1, tzinfo=UTC)
+ITEMS_DAYS = 730
+
+# Sentinel-2 tiles are about 1 x 1 degree
+FOOTPRINT_SIZE = 1.0
+
+RASTER_ZOOM = 7
+
+
+def synthetic_collection(collection_id: str) -> dict:
+    return {
+        "type": "Collection",
+        "stac_version": "1.0.0",
+        "id": collection_id,
+        "description": "Synthetic items for scripts/pgstac_benchmark.py",
+        "license": "proprietary",
+        "extent": {
+            "spatial": {"bbox": [[-180, -90, 180, 90]]},
+            "temporal": {
+                "interval": [
+                    [
+                        ITEMS_START.isoformat(),
+                        (ITEMS_START + timedelta(days=ITEMS_DAYS)).isoformat(),
+                    ]
+                ]
+            },
+        },
+        "links": [],
+    }
+
+
+def synthetic_items(collection_id: str, n: int, rng: np.random.Generator):
+    """Items scattered around land points, with random dates and cloud cover."""
+    anchors = sample_land_points(64, min_distance=200, rng=rng)
+    for i in range(n):
+        lon, lat = anchors[i % len(anchors)] + rng.uniform(-5, 5, 2)
+        lon = float(np.clip(lon, -180, 180 - FOOTPRINT_SIZE))
+        lat = float(np.clip(lat, -85, 85 - FOOTPRINT_SIZE))
+        west, south = lon, lat
+        east, north = lon + FOOTPRINT_SIZE, lat + FOOTPRINT_SIZE
+        dt = ITEMS_START + timedelta(seconds=float(rng.uniform(0, ITEMS_DAYS * 86400)))
+        yield {
+            "type": "Feature",
+            "stac_version": "1.0.0",
+            "id": f"{collection_id}-{i:07d}",
+            "collection": collection_id,
+            "bbox": [west, south, east, north],
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [
+                    [
+                        [west, south],
+                        [east, south],
+                        [east, north],
+                        [west, north],
+                        [west, south],
+                    ]
+                ],
+            },
+            "properties": {
+                "datetime": dt.isoformat(),
+                "eo:cloud_cover": round(float(rng.uniform(0, 100)), 2),
+                "platform": "sentinel-2a",
+            },
+            "assets": {
+                band: {
+                    "href": f"s3://pgstac-benchmark/{collection_id}/{i}/{band}.tif",
+                    "type": "image/tiff; application=geotiff; profile=cloud-optimized",
+                }
+                for band in ("red", "green", "blue")
+            },
+            "links": [],
+        }
+
+
+def prepare_collection(conn: psycopg.Connection, size: int, seed: int) -> str:
+    """Create a collection with `size` synthetic items unless it already exists."""
+    collection_id = f"{COLLECTION_PREFIX}-{size}"
+    (count,) = conn.execute(
+        "SELECT count(*) FROM items WHERE collection = %s", (collection_id,)
+    ).fetchone()
+    if count == size:
+        return collection_id
+
+    print(f"Loading {size} items into {collection_id}")
+    if conn.execute(
+        "SELECT 1 FROM collections WHERE id = %s", (collection_id,)
+    ).fetchone():
+        conn.execute("SELECT delete_collection(%s)", (collection_id,))
+
+    db = PgstacDB()
+    try:
+        loader = Loader(db)
+        loader.load_collections(
+            iter([synthetic_collection(collection_id)]), insert_mode=Methods.upsert
+        )
+        items = synthetic_items(collection_id, size, np.random.default_rng(seed))
+        for batch in batched(items, 10000):
+            loader.load_items(iter(batch), insert_mode=Methods.insert)
+    finally:
+        close_db(db)
+
+    conn.execute("ANALYZE items")
+    return collection_id
+
+
+def timed(conn: psycopg.Connection, query: str, params, repeat: int) -> list[float]:
+    """Run a query `repeat` times and return the latencies in ms."""
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(query, params).fetchall()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def explain_search(conn: psycopg.Connection, search: dict) -> dict:
+    """`EXPLAIN ANALYZE` the item query that `search()` runs for `search`."""
+    where, orderby = conn.execute(
+        "SELECT stac_search_to_where(%s), sort_sqlorderby(%s)",
+        (Jsonb(search), Jsonb(search)),
+    ).fetchone()
+    ((plan,),) = conn.execute(
+        "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) "
+        f"SELECT id FROM items WHERE {where} ORDER BY {orderby} "
+        f"LIMIT {search['limit'] + 1}"
+    ).fetchall()
+    plan = plan[0]
+
+    scans = set()
+    nodes = [plan["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        nodes += node.get("Plans", [])
+        if "Scan" in node["Node Type"]:
+            relation = node.get("Index Name") or node.get("Relation Name", "?")
+            scans.add(f"{node['Node Type']} on {relation}")
+    return {
+        "planning_ms": plan["Planning Time"],
+        "execution_ms": plan["Execution Time"],
+        "shared_buffers": plan["Plan"].get("Shared Hit Blocks", 0)
+        + plan["Plan"].get("Shared Read Blocks", 0),
+        "scans": sorted(scans),
+    }
+
+
+def summarize(latencies: list[float], explains: list[dict] | None = None) -> dict:
+    values = np.array(latencies)
+    stats = {
+        "runs": len(values),
+        "p50_ms": round(float(np.median(values)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+    }
+    if explains:
+        stats["planning_ms"] = round(
+            float(np.median([e["planning_ms"] for e in explains])), 2
+        )
+        stats["execution_ms"] = round(
+            float(np.median([e["execution_ms"] for e in explains])), 2
+        )
+        stats["shared_buffers"] = int(
+            np.median([e["shared_buffers"] for e in explains])
+        )
+        stats["scans"] = sorted({scan for e in explains for scan in e["scans"]})
+    return stats
+
+
+def benchmark_collection(
+    conn: psycopg.Connection, collection_id: str, args: argparse.Namespace
+) -> dict:
+    searches = []
+    for lon, lat in sample_land_points(
+        args.regions, min_distance=500, rng=np.random.default_rng(args.seed)
+    ):
+        searches.append(
+            {
+                "collections": [collection_id],
+                "bbox": [lon - 2, lat - 2, lon + 2, lat + 2],
+                "datetime": args.datetime,
+                "filter": CLOUD_COVER_FILTER,
+                "filter-lang": "cql2-json",
+                "limit": 10,
+            }
+        )
+
+    latencies = {"stac:/search": [], "raster:/searches/register": [], "raster:tile": []}
+    explains = []
+    for search in searches:
+        explains.append(explain_search(conn, search))
+        latencies["stac:/search"] += timed(
+            conn, "SELECT search(%s)", (Jsonb(search),), args.repeat
+        )
+
+        register = {k: v for k, v in search.items() if k != "limit"}
+        metadata = Jsonb({"type": "mosaic"})
+        latencies["raster:/searches/register"] += timed(
+            conn,
+            "SELECT hash FROM search_query(%s, false, %s)",
+            (Jsonb(register), metadata),
+            args.repeat,
+        )
+        (search_hash,) = conn.execute(
+            "SELECT hash FROM search_query(%s, false, %s)",
+            (Jsonb(register), metadata),
+        ).fetchone()
+
+        lon = (search["bbox"][0] + search["bbox"][2]) / 2
+        lat = (search["bbox"][1] + search["bbox"][3]) / 2
+        z, x, y = tile_for_point(lon, lat, RASTER_ZOOM)
+        latencies["raster:tile"] += timed(
+            conn,
+            "SELECT xyzsearch(%s, %s, %s, %s)",
+            (x, y, z, search_hash),
+            args.repeat,
+        )
+
+    return {
+        "stac:/search": summarize(latencies["stac:/search"], explains),
+        "raster:/searches/register": summarize(latencies["raster:/searches/register"]),
+        "raster:tile": summarize(latencies["raster:tile"]),
+    }
+
+
+def database_settings(conn: psycopg.Connection) -> dict:
+    """The pgstac settings and queryables that the tuning changes."""
+    settings = dict(
+        conn.execute(
+            "SELECT name, value FROM pgstac_settings WHERE name LIKE 'context%'"
+        ).fetchall()
+    )
+    queryables = [
+        f"{name} ({wrapper}, {index_type})"
+        for name, wrapper, index_type in conn.execute(
+            "SELECT name, property_wrapper, property_index_type FROM queryables "
+            "ORDER BY name"
+        ).fetchall()
+    ]
+    return {"settings": settings, "queryables": queryables}
+
+
+def run(args: argparse.Namespace) -> dict:
+    report = {"sizes": {}}
+    with psycopg.connect(autocommit=True) as conn:
+        conn.execute("SET search_path TO pgstac, public")
+        report["database"] = database_settings(conn)
+        for size in args.items:
+            collection_id = prepare_collection(conn, size, args.seed)
+            print(f"Benchmarking {collection_id}")
+            report["sizes"][str(size)] = benchmark_collection(conn, collection_id, args)
+        if args.cleanup:
+            for size in args.items:
+                conn.execute(
+                    "SELECT delete_collection(%s)", (f"{COLLECTION_PREFIX}-{size}",)
+                )
+
+    report["config"] = {
+        "items": args.items,
+        "regions": args.regions,
+        "repeat": args.repeat,
+        "datetime": args.datetime,
+    }
+    return report
+
+
+def print_report(report: dict, baseline: dict | None = None):
+    header = f"{'items':>8}  {'query':<28}{'p50 ms':>9}{'p95 ms':>9}"
+    header += f"{'plan ms':>9}{'exec ms':>9}{'buffers':>9}"
+    if baseline:
+        header += f"{'Δp50':>8}"
+    print(header)
+    for size, queries in report["sizes"].items():
+        for name, stats in queries.items():
+            line = (
+                f"{size:>8}  {name:<28}{stats['p50_ms']:>9}{stats['p95_ms']:>9}"
+                f"{stats.get('planning_ms', ''):>9}{stats.get('execution_ms', ''):>9}"
+                f"{stats.get('shared_buffers', ''):>9}"
+            )
+            previous = (baseline or {}).get("sizes", {}).get(size, {}).get(name)
+            if previous:
+                change = (stats["p50_ms"] - previous["p50_ms"]) / previous["p50_ms"]
+                line += f"{change:>+8.0%}"
+            print(line)
+            if "scans" in stats:
+                print(f"{'':>10}scans: {', '.join(stats['scans'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--items",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="collection sizes to benchmark",
+    )
+    parser.add_argument("--regions", type=int, default=10, help="regions to search")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per query")
+    parser.add_argument(
+        "--datetime", default="2025-01-01T00:00:00Z/2025-04-18T00:00:00Z"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--cleanup", action="store_true", help="delete the collections afterwards"
+    )
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument(
+        "--baseline", type=Path, help="earlier JSON report to compare p50 latency to"
+    )
+    args = parser.parse_args()
+
+    report = run(args)
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    print_report(report, baseline)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env bash
+#
+# Snapshot the pgstac and features schemas, and restore them into a new database.
+#
+#   scripts/seed_snapshot.sh dump [FILE]     # needs pg_dump, connects with the PG* variables
+#   scripts/seed_snapshot.sh restore [FILE]  # needs pg_restore, connects with the PG* variables
+#
+# `dump` writes the collections, items, registered searches and
+# features.ecoregions of a database to a compressed custom-format dump
+# (data/pgstac-seed.dump by default), without pgstac's caches. `restore`
+# replaces the pgstac and features schemas of a database with the dump, with
+# one pg_restore job per CPU, and analyzes the restored tables. The
+# docker-compose database runs `restore` on its first start when the dump
+# exists, see docker/seed/999_seed.sh.
+
+set -euo pipefail
+
+SCRIPT_DIR=$(cd "$(dirname "$0")" && pwd)
+SNAPSHOT=${2:-$SCRIPT_DIR/../data/pgstac-seed.dump}
+JOBS=${JOBS:-$(nproc)}
+
+dump() {
+    until pg_isready -q; do
+        sleep 1
+    done
+
+    start=$(date +%s)
+    pg_dump --format=custom --compress=9 \
+        --schema=pgstac \
+        --schema=features \
+        --exclude-table-data=pgstac.format_item_cache \
+        --exclude-table-data=pgstac.search_wheres \
+        --exclude-table-data=pgstac.query_queue_history \
+        --exclude-table-data='pgstac.items_staging*' \
+        --file="$SNAPSHOT.tmp"
+    mv "$SNAPSHOT.tmp" "$SNAPSHOT"
+    echo "Wrote $SNAPSHOT ($(du -h "$SNAPSHOT" | cut -f1)) in $(($(date +%s) - start))s"
+}
+
+restore() {
+    start=$(date +%s)
+    # pgstac was just installed by the image; the dump brings its own, with
+    # the data, grants and settings of the snapshotted database
+    psql -v ON_ERROR_STOP=1 -qc "DROP SCHEMA IF EXISTS pgstac, features CASCADE;"
+    pg_restore --jobs="$JOBS" --exit-on-error --dbname="$PGDATABASE" "$SNAPSHOT"
+    # pg_restore doesn't carry over planner statistics
+    vacuumdb --analyze-only --jobs="$JOBS" --quiet --dbname="$PGDATABASE"
+
+    summary=$(psql -tAc "
+        SELECT format('%s collections, %s items',
+            (SELECT count(*) FROM pgstac.collections),
+            (SELECT count(*) FROM pgstac.items))")
+    echo "Restored $SNAPSHOT ($summary) in $(($(date +%s) - start))s with $JOBS jobs"
+}
+
+case "${1:-}" in
+dump) dump ;;
+restore) restore ;;
+*)
+    echo "usage: $0 {dump|restore} [FILE]" >&2
+    exit 2
+    ;;
+esac
@@ -0,0 +1,491 @@
+"""
+Autotune the GDAL and titiler settings of titiler-pgstac for mosaic tiles.
+
+Writes Sentinel-2 like scenes of COGs, serves them over HTTP with range
+requests and a per-request delay like S3's (`scripts/cog_server.py`), loads
+one item per scene into pgstac and registers a mosaic of them. Each
+configuration then runs in a fresh titiler-pgstac container, the image of
+docker-compose.yml, which renders the same map viewports twice: cold, right
+after start, and warm, with GDAL's caches filled.
+
+The settings are swept one at a time, starting from the docker-compose
+values: each candidate value is tried with the best values found so far for
+the other settings, and kept if it lowers the tile p95 by more than
+`--min-gain`.
+
+Usage (with the docker-compose database running):
+    python scripts/tiler_autotune.py --scenes 16 --latency 0.03
+
+    # compare with an earlier run
+    python scripts/tiler_autotune.py --output run.json
+    python scripts/tiler_autotune.py --baseline run.json
+
+The report lists the cold and warm tile latency and the requests and bytes
+read per tile of each configuration, then the recommended settings for
+`raster_api_env` in config.yaml and for the titiler-pgstac service in
+docker-compose.yml. The database is configured with the PG* environment
+variables; the container reaches it and the COG server through
+`host.docker.internal`.
+"""
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime
+from pathlib import Path
+
+import httpx
+import numpy as np
+from pypgstac.db import PgstacDB
+from pypgstac.load import Loader, Methods
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "docs"))
+
+from cog_server import serve, write_synthetic_scenes  # noqa: E402
+from loadtest import tiles_around_point  # noqa: E402
+from workshop_ingest import close_db  # noqa: E402
+
+COLLECTION_ID = "tiler-autotune"
+
+IMAGE = "ghcr.io/stac-utils/titiler-pgstac:3.0.0"
+CONTAINER_NAME = "tiler-autotune"
+
+# titiler-pgstac environment of docker-compose.yml that isn't swept
+BASE_ENV = {
+    "CPL_TMPDIR": "/tmp",
+    "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+    "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES",
+    # the COG server only speaks HTTP/1.1, so HTTP/2 multiplexing can't be
+    # measured here; it stays at the compose values and isn't recommended
+    "GDAL_HTTP_MULTIPLEX": "YES",
+    "GDAL_HTTP_VERSION": "2",
+    "VSI_CACHE": "TRUE",
+    "DB_MIN_CONN_SIZE": "1",
+}
+
+# Swept settings in sweep order; the first value is the docker-compose one
+SETTINGS = {
+    "GDAL_CACHEMAX": ["75%", "64", "256"],
+    "GDAL_INGESTED_BYTES_AT_OPEN": ["32768", "16384", "65536"],
+    "VSI_CACHE_SIZE": ["536870912", "5000000", "50000000"],
+    "MOSAIC_CONCURRENCY": ["1", "2", "4", "8"],
+    "DB_MAX_CONN_SIZE": ["10", "1", "4"],
+}
+
+# The Lambda pools come from the capacity plan (see infrastructure/capacity.py)
+LAMBDA_EXCLUDED = ("DB_MAX_CONN_SIZE",)
+
+# True color of the synthetic bands
+RENDER_PARAMS = (
+    ("assets", "B04"),
+    ("assets", "B03"),
+    ("assets", "B02"),
+    ("rescale", "1,10000"),
+)
+
+
+def scene_items(paths: list[Path], href) -> list[dict]:
+    """One item per scene directory, with a COG asset per band."""
+    import rasterio
+    from rasterio.warp import transform_bounds
+
+    scenes: dict[Path, list[Path]] = {}
+    for path in paths:
+        scenes.setdefault(path.parent, []).append(path)
+
+    items = []
+    for scene, bands in sorted(scenes.items()):
+        with rasterio.open(bands[0]) as src:
+            west, south, east, north = transform_bounds(
+                src.crs, "EPSG:4326", *src.bounds
+            )
+        # scenes are named SYN_{index}_{yyyymmdd}
+        day = datetime.strptime(scene.name.split("_")[2], "%Y%m%d")
+        items.append(
+            {
+                "type": "Feature",
+                "stac_version": "1.0.0",
+                "id": scene.name,
+                "collection": COLLECTION_ID,
+                "bbox": [west, south, east, north],
+                "geometry": {
+                    "type": "Polygon",
+                    "coordinates": [
+                        [
+                            [west, south],
+                            [east, south],
+                            [east, north],
+                            [west, north],
+                            [west, south],
+                        ]
+                    ],
+                },
+                "properties": {"datetime": day.replace(tzinfo=UTC).isoformat()},
+                "assets": {
+                    path.stem: {
+                        "href": href(path),
+                        "type": "image/tiff; application=geotiff; "
+                        "profile=cloud-optimized",
+                        "roles": ["data"],
+                    }
+                    for path in bands
+                },
+                "links": [],
+            }
+        )
+    return items
+
+
+def load_items(items: list[dict]):
+    """Replace the items of the autotune collection."""
+    bboxes = np.array([item["bbox"] for item in items])
+    dates = sorted(item["properties"]["datetime"] for item in items)
+    collection = {
+        "type": "Collection",
+        "stac_version": "1.0.0",
+        "id": COLLECTION_ID,
+        "description": "Synthetic scenes for scripts/tiler_autotune.py",
+        "license": "proprietary",
+        "extent": {
+            "spatial": {
+                "bbox": [[*bboxes[:, :2].min(axis=0), *bboxes[:, 2:].max(axis=0)]]
+            },
+            "temporal": {"interval": [[dates[0], dates[-1]]]},
+        },
+        "links": [],
+    }
+    db = PgstacDB()
+    try:
+        loader = Loader(db)
+        loader.load_collections(iter([collection]), insert_mode=Methods.upsert)
+        loader.load_items(iter(items), insert_mode=Methods.upsert)
+    finally:
+        close_db(db)
+
+
+def tile_bounds(z: int, x: int, y: int) -> tuple[float, float, float, float]:
+    """West, south, east and north of a WebMercatorQuad tile."""
+    n = 2**z
+
+    def lat(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y)
+
+
+def sample_tiles(
+    items: list[dict], zooms: list[int], viewports: int, seed: int
+) -> list[tuple[int, int, int]]:
+    """3 x 3 tile viewports around random points of the mosaic, per zoom."""
+    rng = np.random.default_rng(seed)
+    bboxes = np.array([item["bbox"] for item in items])
+    tiles = []
+    for zoom in zooms:
+        for index in rng.integers(len(items), size=viewports):
+            west, south, east, north = bboxes[index]
+            lon, lat = rng.uniform(west, east), rng.uniform(south, north)
+            tiles.extend(tiles_around_point(lon, lat, zoom))
+
+    def covered(tile) -> bool:
+        # tiles off the mosaic are answered with a 404 without reading data
+        west, south, east, north = tile_bounds(*tile)
+        return bool(
+            (
+                (bboxes[:, 0] < east)
+                & (bboxes[:, 2] > west)
+                & (bboxes[:, 1] < north)
+                & (bboxes[:, 3] > south)
+            ).any()
+        )
+
+    return [tile for tile in dict.fromkeys(tiles) if covered(tile)]
+
+
+def start_titiler(args: argparse.Namespace, env: dict[str, str]):
+    """Start titiler-pgstac with `env` and wait until it answers."""
+    container_env = {
+        **BASE_ENV,
+        **env,
+        "PGHOST": args.db_host,
+        "PGPORT": str(args.db_port),
+        "PGUSER": os.environ.get("PGUSER", "username"),
+        "PGPASSWORD": os.environ.get("PGPASSWORD", "password"),
+        "PGDATABASE": os.environ.get("PGDATABASE", "postgis"),
+    }
+    subprocess.run(
+        [
+            "docker",
+            "run",
+            "--rm",
+            "--detach",
+            "--name",
+            CONTAINER_NAME,
+            "--platform",
+            "linux/amd64",
+            "--publish",
+            f"{args.port}:8082",
+            "--add-host",
+            "host.docker.internal:host-gateway",
+            *(
+                arg
+                for key, value in container_env.items()
+                for arg in ("-e", f"{key}={value}")
+            ),
+            args.image,
+            "uvicorn",
+            "titiler.pgstac.main:app",
+            "--host",
+            "0.0.0.0",
+            "--port",
+            "8082",
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{endpoint(args)}/healthz").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.5)
+    stop_titiler()
+    raise TimeoutError(f"titiler-pgstac didn't start in {args.startup_timeout}s")
+
+
+def stop_titiler():
+    subprocess.run(
+        ["docker", "rm", "--force", CONTAINER_NAME],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def endpoint(args: argparse.Namespace) -> str:
+    return f"http://127.0.0.1:{args.port}"
+
+
+def fetch_tiles(
+    client: httpx.Client, url: str, tiles: list, concurrency: int
+) -> tuple[list[float], int]:
+    """Render the tiles, `concurrency` at a time, like a map loading a view."""
+
+    def fetch(tile) -> tuple[float, bool]:
+        z, x, y = tile
+        start = time.perf_counter()
+        response = client.get(f"{url}/{z}/{x}/{y}.png", params=RENDER_PARAMS)
+        return (time.perf_counter() - start) * 1000, response.status_code == 200
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(fetch, tiles))
+    latencies = [latency for latency, ok in results]
+    return latencies, sum(not ok for latency, ok in results)
+
+
+def run_config(
+    args: argparse.Namespace, server, env: dict[str, str], tiles: list
+) -> dict:
+    """Cold and warm tile latency, and the bytes read, of one configuration."""
+    start_titiler(args, env)
+    try:
+        with httpx.Client(timeout=args.timeout) as client:
+            response = client.post(
+                f"{endpoint(args)}/searches/register",
+                json={"collections": [COLLECTION_ID]},
+            )
+            response.raise_for_status()
+            url = (
+                f"{endpoint(args)}/searches/{response.json()['id']}"
+                "/tiles/WebMercatorQuad"
+            )
+
+            stats = {"env": env}
+            latencies = []
+            for name in ("cold", "warm"):
+                server.stats.reset()
+                pass_latencies, errors = fetch_tiles(
+                    client, url, tiles, args.concurrency
+                )
+                latencies += pass_latencies
+                stats[name] = {
+                    "p50_ms": round(float(np.percentile(pass_latencies, 50)), 1),
+                    "p95_ms": round(float(np.percentile(pass_latencies, 95)), 1),
+                    "errors": errors,
+                    "requests_per_tile": round(server.stats.requests / len(tiles), 2),
+                    "kb_per_tile": round(server.stats.bytes / len(tiles) / 1e3, 1),
+                }
+    finally:
+        stop_titiler()
+
+    errors = stats["cold"]["errors"] + stats["warm"]["errors"]
+    # a configuration that fails tiles never wins
+    stats["tile_p95_ms"] = (
+        round(float(np.percentile(latencies, 95)), 1) if not errors else math.inf
+    )
+    return stats
+
+
+def sweep(args: argparse.Namespace, server, tiles: list) -> dict:
+    """Coordinate descent over SETTINGS, from the docker-compose values."""
+    runs = {}
+
+    def measure(name: str, env: dict[str, str]) -> float:
+        print(f"Rendering {len(tiles)} tiles with {name}")
+        runs[name] = run_config(args, server, env, tiles)
+        return runs[name]["tile_p95_ms"]
+
+    best = {setting: values[0] for setting, values in SETTINGS.items()}
+    best_score = measure("docker-compose defaults", best)
+    for setting, values in SETTINGS.items():
+        for value in values[1:]:
+            candidate = {**best, setting: value}
+            score = measure(f"{setting}={value}", candidate)
+            if score < best_score * (1 - args.min_gain):
+                best, best_score = candidate, score
+    return {"runs": runs, "best": best}
+
+
+def run(args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        root = args.directory or Path(tmp)
+        paths = write_synthetic_scenes(root, args.scenes, args.size)
+
+        with serve(
+            root, latency=args.latency, port=args.cog_port, host="0.0.0.0"
+        ) as server:
+
+            def href(path: Path) -> str:
+                # as the container sees the server
+                relative = path.resolve().relative_to(server.root).as_posix()
+                return f"http://{args.cog_host}:{args.cog_port}/{relative}"
+
+            items = scene_items(paths, href)
+            load_items(items)
+            tiles = sample_tiles(items, args.zooms, args.viewports, args.seed)
+
+            report = {
+                "config": {
+                    "scenes": args.scenes,
+                    "files": len(paths),
+                    "tiles": len(tiles),
+                    "zooms": args.zooms,
+                    "latency_s": args.latency,
+                    "concurrency": args.concurrency,
+                    "image": args.image,
+                },
+                **sweep(args, server, tiles),
+            }
+    return report
+
+
+def print_report(report: dict, baseline: dict | None = None):
+    config = report["config"]
+    print(
+        f"\n{config['tiles']} tiles over {config['scenes']} scenes "
+        f"({config['files']} COGs), {config['latency_s']}s latency, "
+        f"{config['concurrency']} tiles at a time"
+    )
+    header = f"{'configuration':<36}{'cold p50':>9}{'cold p95':>9}{'warm p50':>9}"
+    header += f"{'warm p95':>9}{'req/tile':>9}{'KB/tile':>9}{'errors':>7}"
+    if baseline:
+        header += f"{'Δp95':>7}"
+    print(header)
+    for name, stats in report["runs"].items():
+        cold, warm = stats["cold"], stats["warm"]
+        line = (
+            f"{name:<36}{cold['p50_ms']:>9}{cold['p95_ms']:>9}{warm['p50_ms']:>9}"
+            f"{warm['p95_ms']:>9}{cold['requests_per_tile']:>9}"
+            f"{cold['kb_per_tile']:>9}{cold['errors'] + warm['errors']:>7}"
+        )
+        previous = (baseline or {}).get("runs", {}).get(name)
+        if previous and previous["tile_p95_ms"] and math.isfinite(stats["tile_p95_ms"]):
+            change = (stats["tile_p95_ms"] - previous["tile_p95_ms"]) / previous[
+                "tile_p95_ms"
+            ]
+            line += f"{change:>+7.0%}"
+        print(line)
+
+    best = report["best"]
+    print("\nRecommended raster_api_env in config.yaml:\n\nraster_api_env:")
+    for key, value in best.items():
+        if key not in LAMBDA_EXCLUDED:
+            print(f'  {key}: "{value}"')
+    print("\nRecommended titiler-pgstac environment in docker-compose.yml:\n")
+    for key, value in best.items():
+        print(f"      - {key}={value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenes", type=int, default=16)
+    parser.add_argument("--size", type=int, default=1024, help="pixels per side")
+    parser.add_argument(
+        "--latency", type=float, default=0.03, help="seconds added per request"
+    )
+    parser.add_argument("--zooms", type=int, nargs="+", default=[8, 10, 12])
+    parser.add_argument(
+        "--viewports", type=int, default=4, help="3 x 3 tile viewports per zoom"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=6, help="tiles requested at a time"
+    )
+    parser.add_argument(
+        "--min-gain",
+        type=float,
+        default=0.05,
+        help="relative p95 improvement a setting needs to be kept",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--image", default=IMAGE, help="titiler-pgstac image")
+    parser.add_argument("--port", type=int, default=8092, help="titiler-pgstac port")
+    parser.add_argument("--cog-port", type=int, default=8091)
+    parser.add_argument(
+        "--cog-host",
+        default="host.docker.internal",
+        help="host name of the COG server in the container",
+    )
+    parser.add_argument(
+        "--db-host",
+        default="host.docker.internal",
+        help="host name of the database in the container",
+    )
+    parser.add_argument(
+        "--db-port",
+        type=int,
+        default=5439,
+        help="port of the database in the container",
+    )
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument(
+        "--directory",
+        type=Path,
+        help="keep the COGs here between runs instead of a temporary directory",
+    )
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument(
+        "--baseline", type=Path, help="earlier JSON report to compare the p95 to"
+    )
+    args = parser.parse_args()
+
+    report = run(args)
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    print_report(report, baseline)
+    if args.output:
+        # JSON has no infinity; failed configurations get a null p95
+        for stats in report["runs"].values():
+            if not math.isfinite(stats["tile_p95_ms"]):
+                stats["tile_p95_ms"] = None
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Warm up the STAC, raster and vector APIs before a workshop session.
+
+Sends the requests attendees make first, with bounded concurrency, so Lambda
+SnapStart restores, first database connections, pgstac caches and GDAL/VSI
+caches are paid for before the session starts:
+
+- all APIs: landing page, `/conformance` and `/collections`
+- stac-fastapi: `/search` over a sample of regions
+- titiler-pgstac: `/searches/register`, tilejson and low zoom tiles per region
+- tipg: `/collections/features.ecoregions` tilejson and low zoom vector tiles
+
+The requests are repeated for `--rounds` rounds. Requests whose latency in the
+last round is still an outlier (slower than `--cold-factor` times the median
+of the same kind of request, or slower than `--slow` seconds) are reported as
+cold and the script exits with status 1.
+
+Usage:
+    python scripts/warmup.py --regions 10 --concurrency 8
+
+    # deployed stack
+    python scripts/warmup.py \\
+        --stac-endpoint https://{PROJECT}-stac.eoapi.dev \\
+        --raster-endpoint https://{PROJECT}-raster.eoapi.dev \\
+        --vector-endpoint https://{PROJECT}-vector.eoapi.dev
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "docs"))
+
+from loadtest import (  # noqa: E402
+    CLOUD_COVER_FILTER,
+    DEFAULT_ENDPOINTS,
+    RENDER_PARAMS,
+    VECTOR_COLLECTION,
+    tiles_around_point,
+)
+from workshop_setup import sample_land_points  # noqa: E402
+
+
+class WarmupRun:
+    """Sends warm-up requests with bounded concurrency and records latencies."""
+
+    def __init__(self, client: httpx.AsyncClient, concurrency: int):
+        self.client = client
+        self.semaphore = asyncio.Semaphore(concurrency)
+        # (kind, url) -> latency per round
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def request(
+        self, kind: str, method: str, url: str, **kwargs
+    ) -> httpx.Response | None:
+        async with self.semaphore:
+            start = time.perf_counter()
+            try:
+                response = await self.client.request(method, url, **kwargs)
+                await response.aread()
+            except httpx.HTTPError:
+                response = None
+            elapsed = time.perf_counter() - start
+
+        key = (kind, str(httpx.URL(url, params=kwargs.get("params"))))
+        if "json" in kwargs:
+            key = (kind, f"{key[1]} {json.dumps(kwargs['json'], sort_keys=True)}")
+        self.latencies[key].append(elapsed)
+        # tiles outside of the data footprint are valid 404/204 answers
+        if response is None or (
+            response.status_code >= 400 and response.status_code != 404
+        ):
+            self.errors[key] += 1
+            return None
+        return response
+
+    async def warm_round(self, endpoints: dict, searches: list[dict], args):
+        stac = endpoints["stac"]
+        raster = endpoints["raster"]
+        vector = endpoints["vector"]
+
+        # metadata and searches; search registration returns the ids that the
+        # raster tile requests need
+        metadata = [
+            self.request(f"{service}:{path or '/'}", "GET", f"{endpoint}{path}")
+            for service, endpoint in endpoints.items()
+            for path in ("", "/conformance", "/collections")
+        ]
+        stac_searches = [
+            self.request("stac:/search", "POST", f"{stac}/search", json=search)
+            for search in searches
+        ]
+        registrations = [
+            self.request(
+                "raster:/searches/register",
+                "POST",
+                f"{raster}/searches/register",
+                json={k: v for k, v in search.items() if k != "limit"},
+            )
+            for search in searches
+        ]
+        responses = await asyncio.gather(*metadata, *stac_searches, *registrations)
+        registered = [
+            (response.json()["id"], search)
+            for response, search in zip(responses[-len(registrations) :], searches)
+            if response is not None and response.status_code == 200
+        ]
+
+        # tilejson and low zoom tiles
+        tiles = []
+        for search_id, search in registered:
+            lon = (search["bbox"][0] + search["bbox"][2]) / 2
+            lat = (search["bbox"][1] + search["bbox"][3]) / 2
+            tiles.append(
+                self.request(
+                    "raster:/searches/{id}/tilejson.json",
+                    "GET",
+                    f"{raster}/searches/{search_id}/WebMercatorQuad/tilejson.json",
+                    params=RENDER_PARAMS,
+                )
+            )
+            tiles += [
+                self.request(
+                    "raster:/searches/{id}/tiles",
+                    "GET",
+                    f"{raster}/searches/{search_id}/tiles/WebMercatorQuad/{z}/{x}/{y}",
+                    params=RENDER_PARAMS,
+                )
+                for z, x, y in tiles_around_point(lon, lat, args.raster_zoom)
+            ]
+
+        vector_collection = f"{vector}/collections/{VECTOR_COLLECTION}"
+        tiles.append(
+            self.request(
+                "vector:/collections/{id}/tilejson.json",
+                "GET",
+                f"{vector_collection}/WebMercatorQuad/tilejson.json",
+            )
+        )
+        tiles += [
+            self.request(
+                "vector:/collections/{id}/tiles",
+                "GET",
+                f"{vector_collection}/tiles/WebMercatorQuad/{z}/{x}/{y}",
+            )
+            for z in range(args.vector_max_zoom + 1)
+            for x in range(2**z)
+            for y in range(2**z)
+        ]
+        await asyncio.gather(*tiles)
+
+    def cold_requests(self, cold_factor: float, slow: float) -> list[dict]:
+        """Requests that were still latency outliers in the last round."""
+        last_by_kind = defaultdict(list)
+        for (kind, _), latencies in self.latencies.items():
+            last_by_kind[kind].append(latencies[-1])
+        medians = {
+            kind: float(np.median(values)) for kind, values in last_by_kind.items()
+        }
+
+        cold = []
+        for (kind, url), latencies in self.latencies.items():
+            last = latencies[-1]
+            if last > slow or last > cold_factor * medians[kind]:
+                cold.append(
+                    {
+                        "kind": kind,
+                        "url": url,
+                        "first_s": round(latencies[0], 3),
+                        "last_s": round(last, 3),
+                        "median_s": round(medians[kind], 3),
+                    }
+                )
+        return sorted(cold, key=lambda request: -request["last_s"])
+
+    def summary(self) -> dict:
+        """Per kind of request: count, errors and first/last round p50/max."""
+        by_kind = defaultdict(list)
+        for (kind, _), latencies in self.latencies.items():
+            by_kind[kind].append(latencies)
+
+        summary = {}
+        for kind, runs in sorted(by_kind.items()):
+            first = np.array([latencies[0] for latencies in runs]) * 1000
+            last = np.array([latencies[-1] for latencies in runs]) * 1000
+            summary[kind] = {
+                "requests": len(runs),
+                "errors": sum(
+                    self.errors[key] for key in self.latencies if key[0] == kind
+                ),
+                "first_p50_ms": round(float(np.median(first)), 1),
+                "first_max_ms": round(float(first.max()), 1),
+                "last_p50_ms": round(float(np.median(last)), 1),
+                "last_max_ms": round(float(last.max()), 1),
+            }
+        return summary
+
+
+async def run(args: argparse.Namespace) -> dict:
+    endpoints = {
+        "stac": args.stac_endpoint.rstrip("/"),
+        "raster": args.raster_endpoint.rstrip("/"),
+        "vector": args.vector_endpoint.rstrip("/"),
+    }
+    searches = []
+    for lon, lat in sample_land_points(args.regions, min_distance=500):
+        search = {
+            "bbox": [lon - 2, lat - 2, lon + 2, lat + 2],
+            "datetime": args.datetime,
+            "filter": CLOUD_COVER_FILTER,
+            "filter-lang": "cql2-json",
+            "limit": 10,
+        }
+        if args.collection:
+            search["collections"] = [args.collection]
+        searches.append(search)
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        warmup = WarmupRun(client, args.concurrency)
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            await warmup.warm_round(endpoints, searches, args)
+        elapsed = time.perf_counter() - start
+
+    return {
+        "elapsed_s": round(elapsed, 1),
+        "rounds": args.rounds,
+        "endpoints": endpoints,
+        "requests": warmup.summary(),
+        "cold": warmup.cold_requests(args.cold_factor, args.slow),
+    }
+
+
+def print_report(report: dict):
+    print(
+        f"{'request':<40}{'count':>7}{'errors':>8}"
+        f"{'first p50':>11}{'first max':>11}{'last p50':>10}{'last max':>10}"
+    )
+    for kind, stats in report["requests"].items():
+        print(
+            f"{kind:<40}{stats['requests']:>7}{stats['errors']:>8}"
+            f"{stats['first_p50_ms']:>11}{stats['first_max_ms']:>11}"
+            f"{stats['last_p50_ms']:>10}{stats['last_max_ms']:>10}"
+        )
+    print(f"\n{report['rounds']} rounds in {report['elapsed_s']}s")
+
+    if report["cold"]:
+        print(f"\n{len(report['cold'])} requests still cold after the last round:")
+        for request in report["cold"]:
+            print(
+                f"  {request['last_s'] * 1000:>8.0f} ms "
+                f"(median {request['median_s'] * 1000:.0f} ms)  {request['url']}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--regions", type=int, default=10, help="regions to search")
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="requests in flight at once"
+    )
+    parser.add_argument("--raster-zoom", type=int, default=7)
+    parser.add_argument(
+        "--vector-max-zoom", type=int, default=2, help="all vector tiles up to zoom"
+    )
+    parser.add_argument(
+        "--cold-factor",
+        type=float,
+        default=3.0,
+        help="flag requests slower than this multiple of their kind's median",
+    )
+    parser.add_argument(
+        "--slow", type=float, default=2.0, help="flag requests slower than seconds"
+    )
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument(
+        "--collection", help="STAC collection to search, e.g. an attendee collection"
+    )
+    parser.add_argument(
+        "--datetime", default="2025-01-01T00:00:00Z/2025-04-18T00:00:00Z"
+    )
+    parser.add_argument("--stac-endpoint", default=DEFAULT_ENDPOINTS["stac"])
+    parser.add_argument("--raster-endpoint", default=DEFAULT_ENDPOINTS["raster"])
+    parser.add_argument("--vector-endpoint", default=DEFAULT_ENDPOINTS["vector"])
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    sys.exit(1 if report["cold"] else 0)
+
+
+if __name__ == "__main__":
+    main()
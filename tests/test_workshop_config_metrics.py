@@ -0,0 +1,244 @@
+"""
+EMF records and secret cache of the workshop config Lambda (infrastructure/lambda).
+
+Run with:
+    uv run --with pytest --with boto3 pytest tests
+"""
+
+import importlib
+import json
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+INFRASTRUCTURE = Path(__file__).resolve().parents[1] / "infrastructure"
+sys.path.insert(0, str(INFRASTRUCTURE / "lambda"))
+
+import metrics  # noqa: E402
+
+TOKEN = "workshop-token"
+SECRET = {
+    "host": "db.example.com",
+    "port": 5432,
+    "dbname": "postgis",
+    "username": "pgstac",
+    "password": "secret",
+}
+
+# metrics the workshop config dashboard and alarms in app.py read
+DASHBOARD_METRICS = set(
+    re.findall(r'config_metric\(\s*"(\w+)"', (INFRASTRUCTURE / "app.py").read_text())
+)
+
+
+class StubSecretsClient:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls = 0
+
+    def get_secret_value(self, SecretId: str) -> dict:
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("Secrets Manager is unavailable")
+        return {"VersionId": "v1", "SecretString": json.dumps(SECRET)}
+
+
+class Clock:
+    """Advances by `step` seconds on every call."""
+
+    def __init__(self, step: float):
+        self.step = step
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        self.now += self.step
+        return self.now
+
+
+@pytest.fixture
+def records(monkeypatch) -> list[dict]:
+    """EMF records flushed to the default sink."""
+    records = []
+    monkeypatch.setitem(metrics.SINKS, "stdout", records.append)
+    monkeypatch.delenv("METRICS_SINK", raising=False)
+    return records
+
+
+@pytest.fixture
+def workshop_config(monkeypatch, records):
+    """A freshly initialized handler module, as on a cold start."""
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-west-2")
+    monkeypatch.setenv("PGSTAC_SECRET_ARN", "arn:aws:secretsmanager:pgstac")
+    monkeypatch.setenv("WORKSHOP_TOKEN", TOKEN)
+    monkeypatch.setenv("METRICS_SERVICE", "eoapi-workshop-config")
+    module = importlib.reload(importlib.import_module("workshop_config"))
+    module.config_cache.client = StubSecretsClient()
+    return module
+
+
+def event(token: str | None = TOKEN) -> dict:
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    return {"headers": headers, "queryStringParameters": None}
+
+
+class Context:
+    aws_request_id = "request-1"
+
+
+def metric_names(record: dict) -> set[str]:
+    (directive,) = record["_aws"]["CloudWatchMetrics"]
+    return {metric["Name"] for metric in directive["Metrics"]}
+
+
+def test_to_emf():
+    records = []
+    m = metrics.Metrics(
+        "EoapiWorkshop", {"Service": "config"}, sink=records.append, clock=Clock(0.25)
+    )
+    with m.timer("SecretFetch"):
+        pass
+    m.put("ColdStart", 1)
+    m.set_property("StatusCode", 200)
+    m.flush()
+
+    (record,) = records
+    assert record["_aws"]["CloudWatchMetrics"] == [
+        {
+            "Namespace": "EoapiWorkshop",
+            "Dimensions": [["Service"]],
+            "Metrics": [
+                {"Name": "SecretFetch", "Unit": "Milliseconds"},
+                {"Name": "ColdStart", "Unit": "Count"},
+            ],
+        }
+    ]
+    assert isinstance(record["_aws"]["Timestamp"], int)
+    assert record["Service"] == "config"
+    assert record["SecretFetch"] == 250.0
+    assert record["ColdStart"] == 1
+    assert record["StatusCode"] == 200
+
+    # values are reset, and an empty record isn't emitted
+    m.flush()
+    assert len(records) == 1
+
+
+def test_timer_records_failed_blocks():
+    records = []
+    m = metrics.Metrics("EoapiWorkshop", sink=records.append, clock=Clock(0.5))
+    with pytest.raises(RuntimeError), m.timer("SecretFetch"):
+        raise RuntimeError
+    assert m.values == {"SecretFetch": 500.0}
+    assert m.units == {"SecretFetch": "Milliseconds"}
+
+
+def test_default_sink(monkeypatch):
+    monkeypatch.setenv("METRICS_SINK", "off")
+    assert metrics.default_sink() is metrics.discard_sink
+    monkeypatch.setenv("METRICS_SINK", "cloudwatch")
+    with pytest.raises(ValueError):
+        metrics.default_sink()
+
+
+def test_handler_cold_then_warm(workshop_config, records):
+    cold = workshop_config.handler(event(), Context())
+    warm = workshop_config.handler(event(), Context())
+
+    assert cold["statusCode"] == warm["statusCode"] == 200
+    assert workshop_config.config_cache.client.calls == 1
+    cold_record, warm_record = records
+
+    assert cold_record["Service"] == "eoapi-workshop-config"
+    assert cold_record["ColdStart"] == 1
+    assert cold_record["InitDuration"] >= 0
+    assert cold_record["SecretCacheHit"] == 0
+    assert metric_names(cold_record) == {
+        "ColdStart",
+        "InitDuration",
+        "Latency",
+        "AuthCheck",
+        "SecretCacheHit",
+        "SecretFetch",
+        "Serialization",
+        "AuthFailure",
+        "Error",
+    }
+    assert cold_record["StatusCode"] == 200
+    assert cold_record["RequestId"] == "request-1"
+
+    assert warm_record["ColdStart"] == 0
+    assert warm_record["SecretCacheHit"] == 1
+    assert metric_names(warm_record) == {
+        "ColdStart",
+        "Latency",
+        "AuthCheck",
+        "SecretCacheHit",
+        "AuthFailure",
+        "Error",
+    }
+
+
+@pytest.mark.parametrize("token", [None, "wrong-token"])
+def test_handler_auth_failure(workshop_config, records, token):
+    response = workshop_config.handler(event(token), Context())
+
+    assert response["statusCode"] == 401
+    (record,) = records
+    assert record["AuthFailure"] == 1
+    assert record["Error"] == 0
+    assert record["StatusCode"] == 401
+    assert "SecretFetch" not in record
+    assert workshop_config.config_cache.client.calls == 0
+
+
+def test_handler_error(workshop_config, records):
+    workshop_config.config_cache.client = StubSecretsClient(fail=True)
+    response = workshop_config.handler(event(), Context())
+
+    assert response["statusCode"] == 500
+    (record,) = records
+    assert record["Error"] == 1
+    assert record["AuthFailure"] == 0
+
+
+def test_failed_refresh_backs_off(workshop_config):
+    client = StubSecretsClient()
+    clock = Clock(0)
+    cache = workshop_config.ConfigCache(
+        client, "arn", ttl=60, min_refresh_interval=10, clock=clock
+    )
+    response = cache.get_response()
+
+    # the secret expires while Secrets Manager is unavailable
+    client.fail = True
+    clock.now = 61
+    assert cache.get_response() is response
+    assert client.calls == 2
+    clock.now = 65
+    assert cache.get_response() is response
+    assert client.calls == 2
+    clock.now = 72
+    assert cache.get_response() is response
+    assert client.calls == 3
+
+
+def test_dashboard_metrics_are_emitted(workshop_config, records):
+    workshop_config.handler(event(), Context())
+    workshop_config.handler(event(), Context())
+    workshop_config.handler(event("wrong-token"), Context())
+
+    assert DASHBOARD_METRICS == {
+        "Latency",
+        "AuthCheck",
+        "SecretFetch",
+        "Serialization",
+        "InitDuration",
+        "ColdStart",
+        "SecretCacheHit",
+        "AuthFailure",
+        "Error",
+    }
+    emitted = set().union(*(metric_names(record) for record in records))
+    assert DASHBOARD_METRICS <= emitted